@@ -0,0 +1,84 @@
+"""Compare serial load/process/save with the staged decode/process/encode pipeline.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--count 24] [--size 2400x1600] [--stage-workers 2,2,2] [--quality 90]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+import numpy as np
+
+from editor.pipeline import recipe_pipeline
+from editor.recipe import apply_recipe, encode, parse_recipe, to_working_mode
+
+RECIPE = [
+    {"adjustment": "brightness", "value": 1.1},
+    {"filter": "sharpen"},
+    {"transform": "rotate", "params": {"angle": 90}},
+]
+
+
+def make_inputs(directory, count, width, height):
+    rng = np.random.default_rng(0)
+    paths = []
+    for index in range(count):
+        array = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        path = os.path.join(directory, f"input-{index:03d}.jpg")
+        Image.fromarray(array).save(path, quality=92)
+        paths.append(path)
+    return paths
+
+
+def run_serial(paths, output_dir, steps, quality):
+    """The same decode/recipe/encode work as the pipeline, one image at a time"""
+    for path in paths:
+        image = apply_recipe(to_working_mode(Image.open(path)), steps)
+        with open(os.path.join(output_dir, os.path.basename(path)), 'wb') as f:
+            f.write(encode(image, 'JPEG', quality))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=24)
+    parser.add_argument('--size', default='2400x1600')
+    parser.add_argument('--stage-workers', default='2,2,2', metavar='D,P,E')
+    parser.add_argument('--queue-size', type=int, default=4)
+    parser.add_argument('--quality', type=int, default=90)
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    workers = tuple(int(v) for v in args.stage_workers.split(','))
+    directory = tempfile.mkdtemp(prefix='bench-pipeline-')
+    try:
+        paths = make_inputs(directory, args.count, width, height)
+        serial_dir = os.path.join(directory, 'serial')
+        staged_dir = os.path.join(directory, 'staged')
+        os.makedirs(serial_dir)
+        os.makedirs(staged_dir)
+        print(f"{args.count} JPEGs of {width}x{height}, stage workers {workers}, queue {args.queue_size}")
+
+        steps = parse_recipe(RECIPE)
+        start = time.perf_counter()
+        run_serial(paths, serial_dir, steps, args.quality)
+        serial = time.perf_counter() - start
+        print(f"serial:    {serial:.2f} s ({args.count / serial:.1f} images/s)")
+
+        pipeline = recipe_pipeline(steps, 'JPEG', args.quality, workers=workers, queue_size=args.queue_size)
+        jobs = [(path, os.path.join(staged_dir, os.path.basename(path))) for path in paths]
+        errors = [error for _, _, error in pipeline.run(jobs) if error is not None]
+        print(f"pipelined: {pipeline.elapsed:.2f} s ({args.count / pipeline.elapsed:.1f} images/s), "
+              f"{serial / pipeline.elapsed:.2f}x, {len(errors)} errors")
+        print(pipeline.summary())
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
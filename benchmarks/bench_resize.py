@@ -0,0 +1,97 @@
+"""Benchmark ResizeEngine quality tiers against a plain LANCZOS resize.
+
+Usage:
+    python benchmarks/bench_resize.py [--size 8000x6000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+import numpy as np
+
+from editor.affine_transform import AffineTransformAccumulator
+from editor.resize_engine import ResizeEngine, QUALITY_TIERS
+
+RATIOS = (2, 3, 4, 6, 8, 10)
+
+
+def make_image(width, height):
+    """Noise with a gradient so resampling does real work"""
+    rng = np.random.default_rng(0)
+    array = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    array[:, :, 0] = np.linspace(0, 255, width, dtype=np.uint8)
+    return Image.fromarray(array)
+
+
+def check_equivalence():
+    """Queued pure scales must match ResizeEngine and queued crops must cut, not squash"""
+    image = make_image(80, 60)
+    pixels = np.asarray(image)
+    cases = []
+    for box in ((0, 0, 40, 30), (5, 5, 45, 35), (0, 0, 79, 60)):
+        accumulator = AffineTransformAccumulator(image.size)
+        accumulator.crop(box)
+        left, top, right, bottom = box
+        cases.append((f"crop {box}", accumulator.apply(image), pixels[top:bottom, left:right]))
+    accumulator = AffineTransformAccumulator(image.size)
+    accumulator.scale(0.5)
+    cases.append(("scale 0.5", accumulator.apply(image), np.asarray(ResizeEngine.resize(image, (40, 30)))))
+
+    for name, result, expected in cases:
+        result = np.asarray(result)
+        if result.shape != expected.shape or not np.array_equal(result, expected):
+            raise SystemExit(f"Equivalence check failed: {name}")
+    print(f"Equivalence: {len(cases)} cases match")
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', default='8000x6000', help='source size WxH (default 48 MP)')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    check_equivalence()
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    image = make_image(width, height)
+    print(f"Source: {width}x{height} ({width * height / 1e6:.1f} MP), best of {args.repeat}")
+
+    # Quality is compared on a smooth image; on noise every filter differs a lot
+    smooth = make_image(width // 8, height // 8).resize((width, height), Image.Resampling.BICUBIC)
+
+    header = f"{'ratio':>6} {'target':>11} " + " ".join(f"{tier:>10}" for tier in QUALITY_TIERS)
+    print(header + f" {'balanced':>9} {'fast':>6}  (speedup vs best)"
+          f" {'balanced':>9} {'fast':>6}  (mean error vs best)")
+    for ratio in RATIOS:
+        target = (width // ratio, height // ratio)
+        timings = {
+            tier: best_of(lambda: ResizeEngine.resize(image, target, tier), args.repeat)
+            for tier in QUALITY_TIERS
+        }
+        reference = np.asarray(ResizeEngine.resize(smooth, target, 'best'), dtype=np.float32)
+        errors = {
+            tier: np.abs(np.asarray(ResizeEngine.resize(smooth, target, tier), dtype=np.float32) - reference).mean()
+            for tier in ('balanced', 'fast')
+        }
+        row = f"{ratio:>5}x {target[0]:>5}x{target[1]:<5} "
+        row += " ".join(f"{timings[tier] * 1000:>8.1f}ms" for tier in QUALITY_TIERS)
+        row += f" {timings['best'] / timings['balanced']:>8.1f}x"
+        row += f" {timings['best'] / timings['fast']:>5.1f}x"
+        row += f" {' ' * 19}{errors['balanced']:>9.2f} {errors['fast']:>6.2f}"
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Measure time-to-first-paint of the editor window on the offscreen Qt platform.
+
+Each run launches a fresh interpreter, so the figure includes interpreter
+start, imports, window construction and the first paint event. Exits with
+status 1 when the median exceeds --budget, so it can gate CI.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--budget 1.0]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD_SCRIPT = r"""
+import json, os, sys, time
+sys.path.insert(0, os.getcwd())
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import QObject, QEvent
+from ui.enhanced_main_window import EnhancedMainWindow
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Paint:
+            deferred = [m for m in ('numpy', 'matplotlib', 'editor.enhanced_filters') if m in sys.modules]
+            print(json.dumps({'painted_at': time.time(), 'loaded_before_paint': deferred}), flush=True)
+            QApplication.instance().quit()
+        return False
+
+app = QApplication(sys.argv[:1])
+window = EnhancedMainWindow()
+first_paint = FirstPaint()
+window.installEventFilter(first_paint)
+window.show()
+app.exec()
+"""
+
+
+def measure_once():
+    """Seconds from process launch to the first paint event"""
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    launched_at = time.time()
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT], cwd=REPO_ROOT, env=env,
+        capture_output=True, text=True, timeout=120,
+    )
+    for line in output.stdout.splitlines():
+        if line.startswith('{'):
+            result = json.loads(line)
+            return result['painted_at'] - launched_at, result['loaded_before_paint']
+    raise RuntimeError(f"Window never painted:\n{output.stderr}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=1.0,
+                        help='maximum median time-to-first-paint in seconds')
+    args = parser.parse_args()
+
+    # Warm the OS file cache so the first run is comparable
+    measure_once()
+
+    timings = []
+    for run in range(args.runs):
+        seconds, loaded = measure_once()
+        timings.append(seconds)
+        print(f"run {run + 1}: {seconds * 1000:.0f} ms"
+              + (f" (loaded before paint: {', '.join(loaded)})" if loaded else ""))
+
+    median = statistics.median(timings)
+    print(f"median time-to-first-paint: {median * 1000:.0f} ms (budget {args.budget * 1000:.0f} ms)")
+    if median > args.budget:
+        print("FAIL: startup budget exceeded")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
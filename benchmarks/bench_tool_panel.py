@@ -0,0 +1,42 @@
+"""Measure EnhancedToolPanel construction time and widget count.
+
+Usage:
+    python benchmarks/bench_tool_panel.py [--repeat 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt6.QtWidgets import QApplication, QWidget
+
+from ui.enhanced_tool_panel import EnhancedToolPanel
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    timings = []
+    widget_count = 0
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        panel = EnhancedToolPanel()
+        timings.append(time.perf_counter() - start)
+        widget_count = len(panel.findChildren(QWidget))
+        panel.deleteLater()
+        app.processEvents()
+
+    print(f"construction: median {statistics.median(timings) * 1000:.2f} ms, "
+          f"min {min(timings) * 1000:.2f} ms over {args.repeat} runs")
+    print(f"widgets created at startup: {widget_count}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""Load-test the render service with concurrent clients on localhost.
+
+Starts a service on a free port (unless --url is given), then sends
+--requests renders from --clients threads. Only --unique distinct
+image/recipe combinations are used, so repeats exercise coalescing and
+the output cache.
+
+Usage:
+    python benchmarks/load_test_service.py [--clients 16] [--requests 200] [--unique 8]
+"""
+import argparse
+import asyncio
+import http.client
+import io
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, quote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+import numpy as np
+
+from editor.render_service import RenderService
+
+RECIPES = [
+    [{"adjustment": "brightness", "value": 1.2}],
+    [{"filter": "grayscale"}, {"transform": "rotate", "params": {"angle": 90}}],
+    [{"filter": "blur", "params": {"radius": 3}}, {"adjustment": "gamma", "value": 1.4}],
+    [{"transform": "scale", "params": {"factor": 0.5}}, {"filter": "sharpen"}],
+]
+
+
+def make_image_bytes(width, height, seed):
+    rng = np.random.default_rng(seed)
+    array = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(array).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def start_local_service(workers):
+    """Run a service on a background event loop; returns (url, stop)"""
+    loop = asyncio.new_event_loop()
+    service = RenderService(port=0, workers=workers)
+    ready = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(service.start())
+        ready.set()
+        loop.run_forever()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    ready.wait()
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(service.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+    return f"http://127.0.0.1:{service.port}", stop
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='existing service (default: start one locally)')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--unique', type=int, default=8, help='distinct image/recipe combinations')
+    parser.add_argument('--size', default='1600x1200', help='test image size WxH')
+    parser.add_argument('--workers', type=int, help='worker processes for a local service')
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    images = [make_image_bytes(width, height, seed) for seed in range(max(1, args.unique // len(RECIPES) + 1))]
+    jobs = [(images[i % len(images)], RECIPES[i % len(RECIPES)]) for i in range(args.unique)]
+
+    stop = None
+    url = args.url
+    if url is None:
+        url, stop = start_local_service(args.workers)
+    parts = urlsplit(url)
+    local = threading.local()
+
+    def send(index):
+        connection = getattr(local, 'connection', None)
+        if connection is None:
+            connection = local.connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=120)
+        body, steps = jobs[index % len(jobs)]
+        start = time.perf_counter()
+        connection.request('POST', f"/render?format=jpeg&steps={quote(json.dumps(steps))}", body=body)
+        response = connection.getresponse()
+        response.read()
+        return time.perf_counter() - start, response.status, response.getheader('X-Cache')
+
+    print(f"{url}: {args.requests} requests, {args.clients} clients, {len(jobs)} unique, {width}x{height}")
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            results = list(pool.map(send, range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+        latencies = [latency for latency, _, _ in results]
+        failed = sum(1 for _, status, _ in results if status != 200)
+        sources = {}
+        for _, _, source in results:
+            sources[source] = sources.get(source, 0) + 1
+        print(f"throughput {len(results) / elapsed:.1f} req/s over {elapsed:.2f} s, {failed} failed")
+        print(f"latency p50 {percentile(latencies, 0.50) * 1000:.0f} ms, "
+              f"p95 {percentile(latencies, 0.95) * 1000:.0f} ms, "
+              f"max {max(latencies) * 1000:.0f} ms")
+        print("responses: " + ", ".join(f"{key or 'error'} {count}" for key, count in sorted(sources.items(), key=str)))
+
+        connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=10)
+        connection.request('GET', '/stats')
+        print("service stats: " + connection.getresponse().read().decode('utf-8'))
+    finally:
+        if stop is not None:
+            stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+from PIL import Image
+import math
+
+from .resize_engine import ResizeEngine
+from .crop_view import CropView
+
+IDENTITY = (1.0, 0.0, 0.0, 0.0, 1.0, 0.0)
+
+# Steps that bring pixels stored with an EXIF orientation upright (as ImageOps.exif_transpose)
+EXIF_ORIENTATION_STEPS = {
+    1: (),
+    2: (('flip', {'direction': 'horizontal'}),),
+    3: (('rotate', {'angle': 180}),),
+    4: (('flip', {'direction': 'vertical'}),),
+    5: (('rotate', {'angle': 90}), ('flip', {'direction': 'vertical'})),
+    6: (('rotate', {'angle': 270}),),
+    7: (('rotate', {'angle': 270}), ('flip', {'direction': 'vertical'})),
+    8: (('rotate', {'angle': 90}),),
+}
+
+
+def orientation_steps(orientation):
+    """(transform_name, params) steps that apply an EXIF orientation"""
+    return list(EXIF_ORIENTATION_STEPS.get(orientation, ()))
+
+
+def _multiply(m1, m2):
+    """Compose two 2x3 affine matrices (m1 applied after m2)"""
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (
+        a1 * a2 + b1 * d2, a1 * b2 + b1 * e2, a1 * c2 + b1 * f2 + c1,
+        d1 * a2 + e1 * d2, d1 * b2 + e1 * e2, d1 * c2 + e1 * f2 + f1,
+    )
+
+
+def _invert(m):
+    """Invert a 2x3 affine matrix"""
+    a, b, c, d, e, f = m
+    det = a * e - b * d
+    if det == 0:
+        raise ValueError("Affine matrix is not invertible")
+    ia, ib, id_, ie = e / det, -b / det, -d / det, a / det
+    return (ia, ib, -(ia * c + ib * f), id_, ie, -(id_ * c + ie * f))
+
+
+def _map_point(m, x, y):
+    a, b, c, d, e, f = m
+    return a * x + b * y + c, d * x + e * y + f
+
+
+class AffineTransformAccumulator:
+    """Compose pending rotate/scale/flip/crop steps into one matrix.
+
+    The matrix maps source pixel coordinates to output coordinates, so a
+    straighten-then-scale-then-flip chain is resampled exactly once by
+    ``apply`` instead of once per step.
+    """
+
+    def __init__(self, source_size):
+        self.source_size = tuple(source_size)
+        self.reset()
+
+    def reset(self):
+        """Drop every pending step"""
+        self.matrix = IDENTITY
+        self.size = self.source_size
+        self.steps = []
+
+    def copy(self):
+        """Return an independent copy of the accumulator"""
+        other = AffineTransformAccumulator(self.source_size)
+        other.matrix = self.matrix
+        other.size = self.size
+        other.steps = list(self.steps)
+        return other
+
+    def add(self, transform_name, params):
+        """Queue a transform by name, mirroring EnhancedTransforms.apply"""
+        transform_map = {
+            'rotate': self.rotate,
+            'resize': self.resize,
+            'crop': self.crop,
+            'flip': self.flip,
+            'scale': self.scale,
+            'orient': self.orient,
+        }
+
+        if transform_name in transform_map:
+            transform_map[transform_name](**params)
+            return True
+        return False
+
+    def is_identity(self):
+        """Check if the pending steps cancel out"""
+        return (self.size == self.source_size and
+                all(abs(v - i) < 1e-9 for v, i in zip(self.matrix, IDENTITY)))
+
+    def _compose(self, step, size, record):
+        self.matrix = _multiply(step, self.matrix)
+        self.size = (max(1, int(size[0])), max(1, int(size[1])))
+        self.steps.append(record)
+
+    def rotate(self, angle):
+        """Rotate counter-clockwise by angle degrees, expanding the canvas"""
+        if angle % 360 == 0:
+            return
+        radians = math.radians(angle)
+        cos_a, sin_a = math.cos(radians), math.sin(radians)
+        # Snap quarter turns so they stay exact transposes
+        if abs(cos_a) < 1e-12:
+            cos_a = 0.0
+        if abs(sin_a) < 1e-12:
+            sin_a = 0.0
+        rotation = (cos_a, sin_a, 0.0, -sin_a, cos_a, 0.0)
+
+        w, h = self.size
+        corners = [_map_point(rotation, x, y) for x, y in ((0, 0), (w, 0), (0, h), (w, h))]
+        xs = [p[0] for p in corners]
+        ys = [p[1] for p in corners]
+        min_x, min_y = min(xs), min(ys)
+        new_size = (math.ceil(max(xs) - min_x - 1e-6), math.ceil(max(ys) - min_y - 1e-6))
+
+        step = (cos_a, sin_a, -min_x, -sin_a, cos_a, -min_y)
+        self._compose(step, new_size, ('rotate', {'angle': angle}))
+
+    def scale(self, factor):
+        """Scale uniformly by factor"""
+        if factor <= 0:
+            return
+        w, h = self.size
+        step = (factor, 0.0, 0.0, 0.0, factor, 0.0)
+        self._compose(step, (w * factor, h * factor), ('scale', {'factor': factor}))
+
+    def resize(self, size):
+        """Resize to an explicit (width, height)"""
+        if not (isinstance(size, (list, tuple)) and len(size) == 2):
+            return
+        w, h = self.size
+        sx, sy = size[0] / w, size[1] / h
+        step = (sx, 0.0, 0.0, 0.0, sy, 0.0)
+        self._compose(step, size, ('resize', {'size': tuple(size)}))
+
+    def flip(self, direction):
+        """Mirror horizontally or vertically"""
+        w, h = self.size
+        if direction.lower() == 'horizontal':
+            step = (-1.0, 0.0, float(w), 0.0, 1.0, 0.0)
+        elif direction.lower() == 'vertical':
+            step = (1.0, 0.0, 0.0, 0.0, -1.0, float(h))
+        else:
+            return
+        self._compose(step, (w, h), ('flip', {'direction': direction}))
+
+    def orient(self, orientation):
+        """Apply an EXIF orientation (quarter turns and flips, so still exact)"""
+        for transform_name, params in orientation_steps(orientation):
+            self.add(transform_name, params)
+
+    def crop(self, box):
+        """Crop to box given in the current (transformed) coordinates"""
+        if not (isinstance(box, (list, tuple)) and len(box) == 4):
+            return
+        w, h = self.size
+        left, top, right, bottom = box
+
+        # Validate coordinates
+        left = max(0, min(left, w))
+        top = max(0, min(top, h))
+        right = max(left + 1, min(right, w))
+        bottom = max(top + 1, min(bottom, h))
+
+        step = (1.0, 0.0, -float(left), 0.0, 1.0, -float(top))
+        self._compose(step, (right - left, bottom - top), ('crop', {'box': (left, top, right, bottom)}))
+
+    def _is_exact(self, matrix):
+        """True when the matrix only permutes whole pixels (quarter turns, flips, crops)"""
+        a, b, c, d, e, f = matrix
+        linear = (a, b, d, e)
+        if any(v not in (-1.0, 0.0, 1.0) for v in linear):
+            return False
+        return float(c).is_integer() and float(f).is_integer()
+
+    @staticmethod
+    def _is_pure_scale(matrix, size, source_size):
+        """True when the matrix scales the whole image into size (no crop folded in)"""
+        a, b, c, d, e, f = matrix
+        if b != 0 or d != 0 or c != 0 or f != 0 or a <= 0 or e <= 0:
+            return False
+        # A crop anchored at (0, 0) has the same matrix but an output at least
+        # one pixel short of the scaled source
+        width, height = source_size
+        return abs(size[0] - width * a) < 1 and abs(size[1] - height * e) < 1
+
+    def apply(self, image, resample=Image.Resampling.BICUBIC, fillcolor='white'):
+        """Resample image once through the accumulated matrix"""
+        if self.is_identity():
+            return image
+
+        matrix = self.matrix
+        size = self.size
+        if self._is_pure_scale(matrix, size, image.size):
+            # Pure scale: use the filtered resize path instead of point sampling
+            return ResizeEngine.resize(image, size)
+        if self._is_exact(matrix):
+            resample = Image.Resampling.NEAREST
+            if isinstance(image, CropView):
+                # Exact maps never sample outside the view, so read the parent directly
+                left, top = image.box[0], image.box[1]
+                matrix = _multiply(matrix, (1.0, 0.0, -float(left), 0.0, 1.0, -float(top)))
+                image = image.parent
+        else:
+            if isinstance(image, CropView):
+                image = image.materialize()
+            # Image.transform has no area filter, so pre-shrink large
+            # downscales with a box reduce and fold it into the matrix
+            net_scale = math.sqrt(abs(matrix[0] * matrix[4] - matrix[1] * matrix[3]))
+            if net_scale < 0.5:
+                factor = int(1.0 / net_scale)
+                if factor >= 2:
+                    image = image.reduce(factor)
+                    matrix = _multiply(matrix, (factor, 0.0, 0.0, 0.0, factor, 0.0))
+
+        if image.mode in ('RGBA', 'LA') and isinstance(fillcolor, str):
+            fillcolor = None
+        data = _invert(matrix)
+        return image.transform(size, Image.Transform.AFFINE, data,
+                               resample=resample, fillcolor=fillcolor)
+
+    def preview(self, proxy, straighten=0.0, fillcolor='white'):
+        """Render the pending steps on a downscaled proxy of the source.
+
+        ``straighten`` is an extra, not yet queued rotation so an
+        interactive slider can be previewed without touching the queue.
+        """
+        ratio = proxy.width / self.source_size[0]
+        accumulator = self.copy()
+        if straighten:
+            accumulator.rotate(straighten)
+
+        to_proxy = (ratio, 0.0, 0.0, 0.0, ratio, 0.0)
+        from_proxy = (1.0 / ratio, 0.0, 0.0, 0.0, 1.0 / ratio, 0.0)
+        preview = AffineTransformAccumulator(proxy.size)
+        preview.matrix = _multiply(to_proxy, _multiply(accumulator.matrix, from_proxy))
+        preview.size = (max(1, round(accumulator.size[0] * ratio)),
+                        max(1, round(accumulator.size[1] * ratio)))
+        return preview.apply(proxy, resample=Image.Resampling.BILINEAR, fillcolor=fillcolor)
@@ -0,0 +1,52 @@
+from PIL import Image
+
+# Formats that store an alpha channel; everything else is flattened on export
+ALPHA_FORMATS = ('PNG', 'WEBP', 'TIFF', 'GIF')
+WHITE = (255, 255, 255)
+
+
+def has_alpha(image):
+    """True if the image carries transparency (an alpha band or a transparent colour)"""
+    return image.mode in ('RGBA', 'LA', 'PA', 'RGBa', 'La') or 'transparency' in image.info
+
+
+def flatten_alpha(image, background=WHITE):
+    """Composite an RGBA image over a solid colour in one pass"""
+    if image.mode != 'RGBA':
+        return image
+    flat = Image.new('RGB', image.size, background)
+    # The image's own alpha band is the mask, so no channel is split out
+    flat.paste(image, mask=image)
+    return flat
+
+
+def prepare_for_format(image, format_name):
+    """Flatten transparency for formats that cannot store it"""
+    if image.mode == 'RGBA' and format_name not in ALPHA_FORMATS:
+        return flatten_alpha(image)
+    return image
+
+
+def on_color_planes(image, function):
+    """Run function on the RGB planes of an RGBA image and put the alpha back.
+
+    Colour operations (adjustments, tone filters) must not touch coverage.
+    Images without alpha are passed straight through.
+    """
+    if image.mode != 'RGBA':
+        return function(image)
+    alpha = image.getchannel('A')
+    result = function(image.convert('RGB'))
+    if result is None:
+        return None
+    if result.mode != 'RGB':
+        result = result.convert('RGB')
+    result.putalpha(alpha)
+    return result
+
+
+def premultiplied(image, function):
+    """Run an averaging filter on premultiplied RGBA so transparent colour does not bleed"""
+    if image.mode != 'RGBA':
+        return function(image)
+    return function(image.convert('RGBa')).convert('RGBA')
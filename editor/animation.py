@@ -0,0 +1,241 @@
+import io
+import os
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageChops
+
+from .recipe import apply_recipe, to_working_mode
+
+# Formats that store several frames; the first three also carry timing
+MULTI_FRAME_FORMATS = ('GIF', 'PNG', 'WEBP', 'TIFF')
+ANIMATED_FORMATS = ('GIF', 'PNG', 'WEBP')
+
+
+class FrameSequence:
+    """Frames of a multi-frame file, decoded one at a time into working mode"""
+
+    def __init__(self, path):
+        self.path = path
+        with Image.open(path) as image:
+            self.format = image.format
+            self.n_frames = getattr(image, 'n_frames', 1)
+            self.loop = image.info.get('loop')
+            self.compression = image.info.get('compression')
+
+    def __len__(self):
+        return self.n_frames
+
+    def __iter__(self):
+        """Yield (duration in ms or None, frame) in order"""
+        with Image.open(self.path) as image:
+            for index in range(self.n_frames):
+                image.seek(index)
+                # Seeking reuses the frame buffer, so RGB(A) frames are copied out
+                frame = image.copy() if image.mode in ('RGB', 'RGBA') else image
+                frame = to_working_mode(frame)
+                yield image.info.get('duration'), frame
+
+
+def map_frames(frames, function, workers=None, window=None):
+    """Apply function to (duration, frame) pairs on a thread pool, yielding results in order.
+
+    At most ``window`` frames are decoded ahead of the one being yielded, so
+    memory stays bounded however long the sequence is.
+    """
+    workers = workers or min(4, os.cpu_count() or 2)
+    window = window or workers * 2
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="frames") as executor:
+        pending = deque()
+        for duration, frame in frames:
+            pending.append((duration, executor.submit(function, frame)))
+            if len(pending) >= window:
+                duration, future = pending.popleft()
+                yield duration, future.result()
+        while pending:
+            duration, future = pending.popleft()
+            yield duration, future.result()
+
+
+def _gif_palette(frame):
+    """Palette an RGB frame as the GIF encoder would, on a frame worker.
+
+    Quantizing is most of the cost of writing a GIF and releases the GIL,
+    so it runs in parallel here instead of serially inside the encoder.
+    """
+    if frame.mode == 'RGB':
+        return frame.convert('P', palette=Image.Palette.ADAPTIVE)
+    return frame
+
+
+def _gif_blocks(frame):
+    """Encode one frame as a single-image GIF and split it into
+    (colour table, transparent index, image descriptor flags, image data)"""
+    frame.info = {key: value for key, value in frame.info.items() if key == 'transparency'}
+    buffer = io.BytesIO()
+    frame.save(buffer, 'GIF', optimize=True)
+    data = buffer.getvalue()
+
+    flags = data[10]
+    position = 13
+    colour_table = b''
+    if flags & 0x80:
+        end = position + 3 * (2 << (flags & 7))
+        colour_table = data[position:end]
+        position = end
+    transparency = None
+    while data[position:position + 1] == b'!':
+        label = data[position + 1]
+        position += 2
+        if label == 0xF9 and data[position + 1] & 1:
+            transparency = data[position + 4]
+        while data[position]:
+            position += data[position] + 1
+        position += 1
+    # Image descriptor: separator, left, top, width, height, flags
+    descriptor_flags = data[position + 9]
+    return colour_table, transparency, descriptor_flags, data[position + 10:-1]
+
+
+def _table_size_bits(colour_table):
+    """GIF colour table size field for a table of len(colour_table) // 3 entries"""
+    return max(0, (len(colour_table) // 3).bit_length() - 2)
+
+
+def write_gif(frames, fp, loop=None):
+    """Write (duration, frame) pairs as an animated GIF, one frame at a time.
+
+    Only the previous frame is kept: each frame is stored as the rectangle
+    that changed since it (RGBA frames replace the whole canvas), a frame
+    identical to the previous one extends its duration, and every frame
+    carries its own palette. Returns the number of frames written.
+    """
+    count = 0
+    canvas = None
+    disposal = 1
+    previous = None
+    pending = None
+
+    for duration, frame in frames:
+        if canvas is None:
+            canvas = (0, 0) + frame.size
+            # Frames are full composites; transparent areas must not show the previous frame
+            disposal = 2 if frame.mode == 'RGBA' else 1
+            fp.write(b'GIF89a' + struct.pack('<2H3B', frame.width, frame.height, 0, 0, 0))
+            if loop is not None:
+                fp.write(b'!\xff\x0bNETSCAPE2.0\x03\x01' + struct.pack('<H', loop) + b'\x00')
+        elif frame.size != canvas[2:]:
+            frame = frame.resize(canvas[2:])
+
+        box = canvas
+        if previous is not None and disposal == 1:
+            box = ImageChops.difference(previous.convert('RGB'), frame.convert('RGB')).getbbox()
+            if box is None:
+                # Same picture: show the previous frame for longer instead
+                pending = pending[:2] + ((pending[2] or 0) + (duration or 0),)
+                continue
+        if pending is not None:
+            _write_gif_frame(fp, *pending, disposal)
+            count += 1
+        previous = frame
+        pending = (frame if box == canvas else frame.crop(box), box, duration)
+
+    if pending is not None:
+        _write_gif_frame(fp, *pending, disposal)
+        count += 1
+    fp.write(b';')
+    return count
+
+
+def _write_gif_frame(fp, image, box, duration, disposal):
+    """Graphic control extension, image descriptor, local palette and pixels of one frame"""
+    colour_table, transparency, descriptor_flags, image_data = _gif_blocks(image)
+    packed = disposal << 2 | (1 if transparency is not None else 0)
+    fp.write(b'!\xf9\x04' + struct.pack('<BHB', packed, int((duration or 0) / 10), transparency or 0) + b'\x00')
+    # Keep only the interlace bit; the palette becomes this frame's local table
+    descriptor_flags &= 0x40
+    if colour_table:
+        descriptor_flags |= 0x80 | _table_size_bits(colour_table)
+    fp.write(b',' + struct.pack('<4HB', box[0], box[1], image.width, image.height, descriptor_flags))
+    fp.write(colour_table + image_data)
+
+
+def save_frames(frames, target, format_name, sequence, quality=None):
+    """Encode (duration, frame) pairs as one multi-frame file, written atomically.
+
+    Pillow's multi-frame writers hold every frame until the file is written,
+    so GIF goes through write_gif instead; WebP, TIFF and APNG still keep all
+    processed frames in memory while saving. Returns the number of frames
+    written.
+    """
+    temporary = target + '.part'
+    try:
+        if format_name == 'GIF':
+            with open(temporary, 'wb') as fp:
+                count = write_gif(frames, fp, sequence.loop)
+        else:
+            count = _save_listed(frames, temporary, format_name, sequence, quality)
+        os.replace(temporary, target)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    return count
+
+
+def _save_listed(frames, target, format_name, sequence, quality):
+    """Save through Pillow's multi-frame writer, which takes every frame at once"""
+    timed = list(frames)
+    durations = [duration or 0 for duration, _ in timed]
+    first, rest = timed[0][1], [frame for _, frame in timed[1:]]
+    options = {}
+    if format_name in ANIMATED_FORMATS:
+        options['duration'] = durations
+        if sequence.loop is not None:
+            options['loop'] = sequence.loop
+    if format_name == 'WEBP':
+        options['quality'] = int(quality or 90)
+    elif format_name == 'TIFF' and sequence.compression not in (None, 'raw'):
+        options['compression'] = sequence.compression
+    first.save(target, format_name, save_all=True, append_images=rest, **options)
+    return len(timed)
+
+
+def process_frames(source, target, function, format_name, quality=None, workers=None):
+    """Run function over every frame of source and save the result to target.
+
+    Frames are decoded one at a time and processed in parallel, then saved
+    with their original durations and loop count (GIF frames are written as
+    they arrive, other formats are collected first).
+    """
+    if format_name not in MULTI_FRAME_FORMATS:
+        raise ValueError(f"{format_name} cannot store several frames")
+    sequence = FrameSequence(source)
+    if format_name == 'GIF':
+        process = function
+        function = lambda frame: _gif_palette(process(frame))
+    return save_frames(map_frames(sequence, function, workers), target, format_name, sequence, quality)
+
+
+def process_animation(source, target, steps, format_name, quality=None, workers=None):
+    """Apply recipe steps to every frame of source"""
+    return process_frames(source, target, lambda frame: apply_recipe(frame, steps),
+                          format_name, quality, workers)
+
+
+def replay_steps(frame, steps):
+    """Replay an editing session on one frame.
+
+    steps are recipe steps, plus ('layers', None, layers) where a layer stack
+    was flattened into the pixels.
+    """
+    recipe = []
+    for kind, name, params in steps:
+        if kind != 'layers':
+            recipe.append((kind, name, params))
+            continue
+        frame = apply_recipe(frame, recipe)
+        recipe = []
+        for layer in params:
+            layer.composite(frame)
+    return apply_recipe(frame, recipe)
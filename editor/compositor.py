@@ -0,0 +1,104 @@
+from .crop_view import materialize
+from .layers import intersect
+from .result_cache import forget_fingerprint
+
+
+class LayerCompositor:
+    """Composite a layer stack over a base image, one tile at a time.
+
+    The composite is kept between calls and treated as a tile cache: when
+    the stack changes, only tiles under the dirty rectangles of added,
+    removed, edited or reordered layers are rebuilt from the base. The
+    rebuilt tiles are recorded so the viewer can repaint just those.
+    """
+
+    def __init__(self, tile_size=256):
+        self.tile_size = tile_size
+        self.base = None
+        self.base_pixels = None
+        self.layers = ()
+        self.image = None
+        # Tiles changed since the last take_updates(); None = whole image is new
+        self.updates = None
+
+    def composite(self, base, layers):
+        """Return base with layers applied, reusing unaffected tiles"""
+        layers = tuple(layers)
+        if self.image is None or base is not self.base:
+            self.base = base
+            self.base_pixels = materialize(base)
+            self.image = self.base_pixels.copy()
+            self.layers = ()
+            self.updates = None
+        if layers == self.layers:
+            return self.image
+
+        dirty = self.dirty_boxes(self.layers, layers)
+        tiles = self.tiles(dirty)
+        forget_fingerprint(self.image)
+        for tile in tiles:
+            self._render_tile(tile, layers)
+        self.layers = layers
+        if self.updates is not None:
+            self.updates.extend(tiles)
+        return self.image
+
+    def dirty_boxes(self, old_layers, new_layers):
+        """Canvas boxes whose pixels may differ between two stacks"""
+        size = self.image.size
+        old_ids = set(map(id, old_layers))
+        new_ids = set(map(id, new_layers))
+        changed = [layer for layer in old_layers if id(layer) not in new_ids]
+        changed += [layer for layer in new_layers if id(layer) not in old_ids]
+
+        kept_old = [layer for layer in old_layers if id(layer) in new_ids]
+        kept_new = [layer for layer in new_layers if id(layer) in old_ids]
+        if kept_old != kept_new:
+            # Reordered layers affect everything they cover
+            changed += kept_new
+
+        boxes = []
+        for layer in changed:
+            box = layer.bounds(size)
+            if box is not None:
+                boxes.append(box)
+        return boxes
+
+    def tiles(self, boxes):
+        """Tile-grid boxes covering the given boxes"""
+        width, height = self.image.size
+        step = self.tile_size
+        keys = set()
+        for left, top, right, bottom in boxes:
+            for ty in range(top // step, (bottom - 1) // step + 1):
+                for tx in range(left // step, (right - 1) // step + 1):
+                    keys.add((tx, ty))
+        return [(tx * step, ty * step, min(width, (tx + 1) * step), min(height, (ty + 1) * step))
+                for ty, tx in sorted((ty, tx) for tx, ty in keys)]
+
+    def _render_tile(self, tile, layers):
+        """Rebuild one tile from the base through every layer"""
+        width, height = self.image.size
+        margin = sum(layer.margin for layer in layers if layer.visible)
+        area = intersect((tile[0] - margin, tile[1] - margin, tile[2] + margin, tile[3] + margin),
+                         (0, 0, width, height))
+        scratch = self.base_pixels.crop(area)
+        for layer in layers:
+            layer.composite(scratch, area[:2], (width, height))
+        if margin:
+            scratch = scratch.crop((tile[0] - area[0], tile[1] - area[1],
+                                    tile[2] - area[0], tile[3] - area[1]))
+        self.image.paste(scratch, tile[:2])
+
+    def take_updates(self):
+        """Tiles repainted since the last call (None if the whole composite is new)"""
+        updates, self.updates = self.updates, []
+        return updates
+
+    def release(self):
+        """Hand the composite over to the caller; it will not be modified again"""
+        image = self.image
+        self.base = self.base_pixels = self.image = None
+        self.layers = ()
+        self.updates = None
+        return image
@@ -0,0 +1,20 @@
+import os
+import pickle
+import zlib
+
+
+def write_compressed(path, value, level=1):
+    """Pickle, zlib-compress and atomically write value"""
+    data = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), level)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def read_compressed(path):
+    """Load a value written by write_compressed"""
+    with open(path, 'rb') as f:
+        return pickle.loads(zlib.decompress(f.read()))
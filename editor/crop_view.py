@@ -0,0 +1,91 @@
+
+class CropView:
+    """Lazy crop: an offset rectangle over a parent image.
+
+    Re-cropping only narrows the rectangle, so repeated crops cost nothing.
+    Pixels are copied by ``materialize`` only when an operation needs
+    contiguous memory (filters, adjustments, save).
+    """
+
+    def __init__(self, parent, box=None):
+        if isinstance(parent, CropView):
+            # Collapse nested views onto the real buffer
+            offset_x, offset_y = parent.box[0], parent.box[1]
+            if box is None:
+                box = parent.box
+            else:
+                box = (box[0] + offset_x, box[1] + offset_y, box[2] + offset_x, box[3] + offset_y)
+            parent = parent.parent
+        if box is None:
+            box = (0, 0, parent.width, parent.height)
+        self.parent = parent
+        self.box = tuple(int(v) for v in box)
+
+    @staticmethod
+    def of(image):
+        """Wrap image (or return it unchanged if it is already a view)"""
+        if isinstance(image, CropView):
+            return image
+        return CropView(image)
+
+    @property
+    def size(self):
+        return (self.box[2] - self.box[0], self.box[3] - self.box[1])
+
+    @property
+    def width(self):
+        return self.size[0]
+
+    @property
+    def height(self):
+        return self.size[1]
+
+    @property
+    def mode(self):
+        return self.parent.mode
+
+    @property
+    def info(self):
+        return self.parent.info
+
+    def is_full(self):
+        """Check if the view covers the whole parent"""
+        return self.box == (0, 0, self.parent.width, self.parent.height)
+
+    def crop(self, box):
+        """Narrow the view; box is relative to this view and gets clamped like EnhancedTransforms.crop"""
+        left, top, right, bottom = box
+        left = max(0, min(left, self.width))
+        top = max(0, min(top, self.height))
+        right = max(left + 1, min(right, self.width))
+        bottom = max(top + 1, min(bottom, self.height))
+        return CropView(self, (left, top, right, bottom))
+
+    def copy(self):
+        """Views are immutable, so copying only duplicates the rectangle"""
+        return CropView(self.parent, self.box)
+
+    def materialize(self):
+        """Copy the viewed pixels into a standalone PIL image"""
+        if self.is_full():
+            return self.parent
+        return self.parent.crop(self.box)
+
+    def __repr__(self):
+        return f"<CropView box={self.box} parent={self.parent.size}>"
+
+
+def materialize(image):
+    """Return a contiguous PIL image for either a view or a plain image"""
+    if isinstance(image, CropView):
+        return image.materialize()
+    return image
+
+
+def unwrap(image):
+    """Split a view into (parent image, box); plain images get box None"""
+    if isinstance(image, CropView):
+        if image.is_full():
+            return image.parent, None
+        return image.parent, image.box
+    return image, None
@@ -1,11 +1,28 @@
 from PIL import Image, ImageEnhance, ImageOps
 import numpy as np
 
+from .alpha import on_color_planes
+
 class EnhancedAdjustments:
     @staticmethod
     def apply(image, adjustment_name, value):
         """Apply adjustment to image"""
-        adjustment_map = {
+        adjustment_map = EnhancedAdjustments.adjustment_map()
+        
+        if adjustment_name in adjustment_map:
+            # Adjustments work on the colour planes; alpha passes through untouched
+            return on_color_planes(image, lambda pixels: adjustment_map[adjustment_name](pixels, value))
+        return None
+    
+    @staticmethod
+    def names():
+        """Names accepted by apply()"""
+        return list(EnhancedAdjustments.adjustment_map())
+    
+    @staticmethod
+    def adjustment_map():
+        """Map of adjustment name to implementation"""
+        return {
             'brightness': EnhancedAdjustments.brightness,
             'contrast': EnhancedAdjustments.contrast,
             'saturation': EnhancedAdjustments.saturation,
@@ -18,10 +35,26 @@ class EnhancedAdjustments:
             'auto_levels': EnhancedAdjustments.auto_levels,
             'auto_color': EnhancedAdjustments.auto_color,
         }
+    
+    @staticmethod
+    def apply_tiled(image, adjustment_name, value, strip_rows=256, margin=0):
+        """Apply a per-pixel (or small-neighbourhood) adjustment strip by strip
         
-        if adjustment_name in adjustment_map:
-            return adjustment_map[adjustment_name](image, value)
-        return None
+        Keeps temporaries (float32 arrays) to one strip instead of the whole image.
+        margin: rows read above/below each strip for neighbourhood adjustments
+        """
+        result = Image.new(image.mode, image.size)
+        for top in range(0, image.height, strip_rows):
+            bottom = min(image.height, top + strip_rows)
+            read_top, read_bottom = max(0, top - margin), min(image.height, bottom + margin)
+            strip = EnhancedAdjustments.apply(image.crop((0, read_top, image.width, read_bottom)),
+                                              adjustment_name, value)
+            if strip is None:
+                return None
+            if margin:
+                strip = strip.crop((0, top - read_top, image.width, top - read_top + bottom - top))
+            result.paste(strip, (0, top))
+        return result
     
     @staticmethod
     def brightness(image, factor):
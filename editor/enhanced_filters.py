@@ -1,14 +1,38 @@
 from PIL import Image, ImageFilter, ImageEnhance
 import numpy as np
 
+from .alpha import on_color_planes, premultiplied
+
 class EnhancedFilters:
+    # Filters whose kernel is not symmetric, so the result depends on which way is up
+    DIRECTIONAL = ('emboss',)
+    # Averaging filters that also soften the alpha edge (run premultiplied)
+    ALPHA_AVERAGING = ('blur', 'smooth')
+    
     @staticmethod
     def apply(image, filter_name, params=None):
         """Apply filter to image"""
         if params is None:
             params = {}
         
-        filter_map = {
+        filter_map = EnhancedFilters.filter_map()
+        if filter_name in filter_map:
+            function = lambda pixels: filter_map[filter_name](pixels, **params)
+            if filter_name in EnhancedFilters.ALPHA_AVERAGING:
+                return premultiplied(image, function)
+            # Everything else changes colour only; transparency is kept as is
+            return on_color_planes(image, function)
+        return None
+    
+    @staticmethod
+    def names():
+        """Names accepted by apply()"""
+        return list(EnhancedFilters.filter_map())
+    
+    @staticmethod
+    def filter_map():
+        """Map of filter name to implementation"""
+        return {
             'blur': EnhancedFilters.blur,
             'sharpen': EnhancedFilters.sharpen,
             'grayscale': EnhancedFilters.grayscale,
@@ -23,10 +47,6 @@ class EnhancedFilters:
             'black_and_white': EnhancedFilters.black_and_white,
             'random_filter': EnhancedFilters.random_filter,
         }
-        
-        if filter_name in filter_map:
-            return filter_map[filter_name](image, **params)
-        return None
     
     @staticmethod
     def blur(image, radius=2):
@@ -1,259 +1,795 @@
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image
 import os
-import sys
-from typing import Optional
 
-try:
-    # Optional but recommended for resolving system font paths by family name
-    import matplotlib.font_manager as fm  # type: ignore
-except Exception:  # pragma: no cover
-    fm = None
-from .enhanced_filters import EnhancedFilters
-from .enhanced_adjustments import EnhancedAdjustments
+# Filters, adjustments (NumPy) and matplotlib are imported on first use to keep
+# startup fast; editor.warmup preloads them in the background.
 from .enhanced_transforms import EnhancedTransforms
+from .affine_transform import AffineTransformAccumulator, orientation_steps
+from .crop_view import CropView
+from .resize_engine import ResizeEngine
+from .instrumentation import instrumented, performance_monitor
+from .tracing import traced
+from .result_cache import result_cache, derive_if_known, image_nbytes, NON_CACHEABLE
+from .layers import PixelLayer, AdjustmentLayer, intersect, offset_box
+from .text_layer import TextLayer
+from .compositor import LayerCompositor
+from .session_journal import journaled
+from .recipe import to_working_mode
+from .alpha import prepare_for_format
+from .animation import MULTI_FRAME_FORMATS, process_frames, replay_steps
+from .prefetch import image_prefetcher
+from .image_metadata import metadata_cache
 
 class EnhancedImageProcessor:
+    DEFAULT_MAX_HISTORY = 20
+    DEFAULT_PREVIEW_SIZE = 1024
+    
     def __init__(self):
         self.original_image = None
         self.current_image = None
         self.history = []
         self.history_index = -1
-        self.max_history = 20
+        self.max_history = self.DEFAULT_MAX_HISTORY
+        # Layers composited over current_image; history keeps them alongside each image
+        self.layers = ()
+        self.layer_history = []
+        # EXIF orientation not yet applied to current_image (kept per history entry):
+        # symmetric filters and adjustments run on the stored pixels, transforms fold
+        # it into their resample and the viewer rotates at draw time
+        self.orientation = 1
+        self.orientation_history = []
+        self.original_orientation = 1
+        # Edits since load as replayable steps, so saving a GIF/WebP/TIFF applies them
+        # to every frame; once one cannot be replayed, a description of that edit instead
+        self.steps = ()
+        self.step_history = []
+        self.compositor = LayerCompositor()
+        self.source_path = None
+        # Optional SessionJournal recording operations for crash recovery
+        self.journal = None
+        # Geometric transforms queued for a single combined resample
+        self.pending_transform = None
+        self.preview_max_size = self.DEFAULT_PREVIEW_SIZE
+        # Set by the memory governor under pressure: adjustment previews on a
+        # downscaled copy, and adjustments processed strip by strip
+        self.adjustment_preview_max_size = None
+        self.tiled_adjustments = False
+        self._preview_proxy = None
+        # Memoized filter/adjustment results shared across processors
+        self.result_cache = result_cache
         
+    @instrumented('load')
+    @journaled
     def load_image(self, file_path):
         """Load image from file"""
         try:
-            image = Image.open(file_path)
-            # Convert to RGB if necessary
-            if image.mode not in ('RGB', 'RGBA'):
-                image = image.convert('RGB')
-            elif image.mode == 'RGBA':
-                # Create white background for RGBA images
-                background = Image.new('RGB', image.size, (255, 255, 255))
-                background.paste(image, mask=image.split()[-1])  # Use alpha channel as mask
-                image = background
-            
-            self.original_image = image.copy()
-            self.current_image = image.copy()
-            self.history = [image.copy()]
+            # Decoded in the background when the filmstrip expected this file
+            image = image_prefetcher.take(file_path) or to_working_mode(Image.open(file_path))
+            metadata = metadata_cache.get(file_path)
+            orientation = metadata.orientation if metadata is not None and metadata.size == image.size else 1
+            # History entries are immutable snapshots, so they can share buffers
+            self.original_image = image
+            self.original_orientation = orientation
+            self.source_path = file_path
+            self.current_image = image
+            self.orientation = orientation
+            self.history = [image]
+            self.layer_history = [()]
+            self.orientation_history = [orientation]
+            self.steps = ()
+            self.step_history = [()]
             self.history_index = 0
+            self.layers = ()
+            self.compositor.release()
+            self.pending_transform = None
             return True
         except Exception as e:
             print(f"Error loading image: {e}")
             return False
     
+    @instrumented('save')
     def save_image(self, file_path):
         """Save current image to file"""
         try:
+            self.commit_transforms()
             if self.current_image:
-                self.current_image.save(file_path)
+                self._apply_orientation()
+                # Transparency is kept unless the format cannot store it
+                format_name = Image.registered_extensions().get(os.path.splitext(file_path)[1].lower())
+                if self.frame_count() > 1 and format_name in MULTI_FRAME_FORMATS:
+                    if self.save_frames(file_path, format_name):
+                        return True
+                prepare_for_format(self._pixels(), format_name).save(file_path)
                 return True
             return False
         except Exception as e:
             print(f"Error saving image: {e}")
             return False
     
+    def frame_count(self):
+        """Frames in the source file (edits apply to all of them on save)"""
+        metadata = metadata_cache.get(self.source_path) if self.source_path else None
+        return metadata.n_frames if metadata is not None else 1
+    
+    def replay_blocker(self):
+        """Description of the first edit that cannot be replayed on other frames, or None"""
+        if isinstance(self.steps, tuple):
+            return None
+        return self.steps or 'an edit'
+    
+    def saves_single_frame(self, file_path):
+        """True if saving a multi-frame source to file_path keeps only the current frame
+        because an edit (see replay_blocker) cannot be replayed on the others"""
+        format_name = Image.registered_extensions().get(os.path.splitext(file_path)[1].lower())
+        return (self.replay_blocker() is not None and format_name in MULTI_FRAME_FORMATS
+                and self.frame_count() > 1)
+    
+    def save_frames(self, file_path, format_name):
+        """Replay the session's edits on every frame of the source and save them all.
+        
+        Returns the number of frames written, or 0 (the caller saves the
+        displayed frame) when an edit cannot be replayed.
+        """
+        if self.replay_blocker() is not None:
+            return 0
+        steps = self.steps
+        if self.layers:
+            steps += (('layers', None, self.layers),)
+        return process_frames(self.source_path, file_path, lambda frame: replay_steps(frame, steps), format_name)
+    
     def get_current_image(self):
         """Get current image"""
+        if not self.current_image:
+            return None
+        if self.layers:
+            # Flattened copy; the layers stay editable
+            return self._composited().copy()
+        self._apply_orientation()
+        return self._pixels()
+    
+    def get_current_view(self):
+        """Get current image without materializing a lazy crop or the EXIF orientation (for display)"""
+        if self.layers:
+            return self._composited()
         return self.current_image
     
+    def get_view_orientation(self):
+        """EXIF orientation the viewer applies to get_current_view() when drawing"""
+        return self.orientation if self.current_image is not None else 1
+    
+    def take_display_updates(self):
+        """Tiles of the current view repainted since the last call (None = redraw everything)"""
+        if not self.layers:
+            return None
+        return self.compositor.take_updates()
+    
+    def snapshot(self):
+        """Current state as shared references (history entries are immutable)"""
+        if not self.current_image:
+            return None
+        return {
+            'image': self.current_image,
+            'layers': self.layers,
+            'orientation': self.orientation,
+            'steps': self.steps,
+            'pending_transform': self.pending_transform.copy() if self.pending_transform else None,
+            'source_path': self.source_path,
+            # The undo stack, so undo and redo after a restore behave as before it
+            'history': list(self.history),
+            'history_index': self.history_index,
+            'layer_history': list(self.layer_history),
+            'orientation_history': list(self.orientation_history),
+            'step_history': list(self.step_history),
+        }
+    
+    def restore_snapshot(self, snapshot):
+        """Restore a snapshot, with its undo stack when it has one"""
+        image = snapshot['image']
+        self.source_path = snapshot.get('source_path')
+        self.original_image = image
+        self.orientation = snapshot.get('orientation', 1)
+        self.original_orientation = self.orientation
+        if self.source_path and os.path.exists(self.source_path):
+            original = EnhancedImageProcessor()
+            if original.load_image(self.source_path):
+                self.original_image = original.original_image
+                self.original_orientation = original.original_orientation
+        self.current_image = image
+        self.layers = tuple(snapshot.get('layers', ()))
+        self.history = [image]
+        self.layer_history = [self.layers]
+        self.orientation_history = [self.orientation]
+        self.steps = snapshot.get('steps')
+        self.step_history = [self.steps]
+        self.history_index = 0
+        if snapshot.get('history'):
+            self.history = list(snapshot['history'])
+            self.layer_history = list(snapshot['layer_history'])
+            self.orientation_history = list(snapshot['orientation_history'])
+            self.step_history = list(snapshot['step_history'])
+            self.history_index = snapshot['history_index']
+        self.pending_transform = snapshot.get('pending_transform')
+        self.compositor.release()
+    
+    # Fields handed to the memory manager when an idle document is spilled
+    _STATE_FIELDS = ('original_image', 'current_image', 'history', 'history_index',
+                     'layers', 'layer_history', 'pending_transform', 'source_path',
+                     'orientation', 'orientation_history', 'original_orientation',
+                     'steps', 'step_history')
+    
+    def release_state(self):
+        """Give up pixels and history (to be spilled); restore_state brings them back"""
+        state = {name: getattr(self, name) for name in self._STATE_FIELDS}
+        self.original_image = None
+        self.current_image = None
+        self.history = []
+        self.layer_history = []
+        self.layers = ()
+        self.orientation = 1
+        self.orientation_history = []
+        self.steps = ()
+        self.step_history = []
+        self.pending_transform = None
+        self._preview_proxy = None
+        self.compositor.release()
+        return state
+    
+    def restore_state(self, state):
+        """Reinstate pixels and history returned by release_state"""
+        for name in self._STATE_FIELDS:
+            setattr(self, name, state[name])
+    
+    def memory_usage(self):
+        """Bytes held by the current pixels and by the rest of history (shared buffers counted once)"""
+        seen = set()
+        
+        def owned(image):
+            if image is None:
+                return 0
+            if isinstance(image, CropView):
+                image = image.parent
+            if id(image) in seen:
+                return 0
+            seen.add(id(image))
+            return image_nbytes(image)
+        
+        def layer_bytes(layers):
+            return sum(owned(getattr(layer, 'image', None)) + owned(layer.mask) for layer in layers)
+        
+        pixels = owned(self.current_image) + owned(self.compositor.image) + layer_bytes(self.layers)
+        history = owned(self.original_image)
+        for image, layers in zip(self.history, self.layer_history):
+            history += owned(image) + layer_bytes(layers)
+        return {'pixels': pixels, 'history': history}
+    
     def get_original_image(self):
         """Get original image"""
         return self.original_image
     
     def get_image_info(self):
-        """Get image information"""
-        if self.current_image:
-            return {
-                'size': self.current_image.size,
-                'mode': self.current_image.mode,
-                'format': getattr(self.current_image, 'format', 'Unknown')
-            }
-        return None
+        """Get image information
+        
+        Size and mode describe the working image; format, DPI, ICC profile and
+        orientation come from the source file's header.
+        """
+        if self.current_image is None:
+            return None
+        info = {
+            'size': self.get_view_size(),
+            'mode': self.current_image.mode,
+            'format': 'Unknown',
+        }
+        metadata = metadata_cache.get(self.source_path) if self.source_path else None
+        if metadata is not None:
+            info.update({
+                'format': metadata.format or 'Unknown',
+                'dpi': metadata.dpi,
+                'icc_profile': metadata.has_icc,
+                'orientation': metadata.orientation,
+                'file_size': metadata.file_size,
+                'frames': metadata.n_frames,
+            })
+        return info
     
+    @instrumented('filter', 1)
+    @journaled
     def apply_filter(self, filter_name, params=None):
         """Apply filter to current image"""
         if not self.current_image:
             return False
+        self.commit_transforms()
         
+        from .enhanced_filters import EnhancedFilters
         try:
-            result = EnhancedFilters.apply(self.current_image, filter_name, params)
+            if filter_name in EnhancedFilters.DIRECTIONAL:
+                self._apply_orientation()
+            result = self.result_cache.get_or_compute(
+                self._pixels(), f"filter:{filter_name}", params,
+                lambda image: EnhancedFilters.apply(image, filter_name, params))
             if result:
-                self._add_to_history(result)
+                # A random filter would pick differently on every frame
+                if filter_name in NON_CACHEABLE:
+                    step = f"the {filter_name} filter"
+                else:
+                    step = ('filter', filter_name, params or {})
+                self._add_to_history(result, orientation=self.orientation, steps=self._with_steps(step))
                 return True
             return False
         except Exception as e:
             print(f"Error applying filter {filter_name}: {e}")
             return False
     
+    @instrumented('adjustment', 1)
+    @journaled
     def apply_adjustment(self, adjustment_name, value):
         """Apply adjustment to current image"""
         if not self.current_image:
             return False
+        self.commit_transforms()
         
         try:
-            result = EnhancedAdjustments.apply(self.current_image, adjustment_name, value)
+            result = self.result_cache.get_or_compute(
+                self._pixels(), f"adjustment:{adjustment_name}", value,
+                lambda image: self._adjust(image, adjustment_name, value))
             if result:
-                self._add_to_history(result)
+                self._add_to_history(result, orientation=self.orientation,
+                                     steps=self._with_steps(('adjustment', adjustment_name, value)))
                 return True
             return False
         except Exception as e:
             print(f"Error applying adjustment {adjustment_name}: {e}")
             return False
     
+    def _adjust(self, image, adjustment_name, value):
+        """Run an adjustment, strip by strip when memory is tight and the adjustment allows it"""
+        from .enhanced_adjustments import EnhancedAdjustments
+        if self.tiled_adjustments:
+            if adjustment_name in AdjustmentLayer.POINTWISE or adjustment_name in AdjustmentLayer.MARGINS:
+                return EnhancedAdjustments.apply_tiled(image, adjustment_name, value,
+                                                       margin=AdjustmentLayer.MARGINS.get(adjustment_name, 0))
+        return EnhancedAdjustments.apply(image, adjustment_name, value)
+    
+    @instrumented('adjustment: local', 1)
+    @journaled
+    def apply_local_adjustment(self, adjustment_name, value, selection):
+        """Apply an adjustment inside a SelectionMask only.
+        
+        The adjustment runs on the selection's bounding box (plus the few
+        pixels neighbourhood adjustments read) and is blended back through
+        the mask, so its cost follows the selected area. The frame itself is
+        still copied once, since history entries are never modified.
+        Adjustments driven by whole-image statistics (contrast, auto levels,
+        auto color) are refused, as for adjustment layers.
+        """
+        if not self.current_image:
+            return False
+        if adjustment_name not in AdjustmentLayer.POINTWISE and adjustment_name not in AdjustmentLayer.MARGINS:
+            print(f"Error applying local adjustment {adjustment_name}: it depends on whole-image statistics")
+            return False
+        self.commit_transforms()
+        
+        from .enhanced_adjustments import EnhancedAdjustments
+        try:
+            # The selection is drawn on the upright image
+            self._apply_orientation()
+            pixels = self._pixels()
+            selection = selection.clipped(pixels.size)
+            if selection.is_empty():
+                return False
+            
+            box = selection.box
+            margin = AdjustmentLayer.MARGINS.get(adjustment_name, 0)
+            area = intersect((box[0] - margin, box[1] - margin, box[2] + margin, box[3] + margin),
+                             (0, 0, pixels.width, pixels.height))
+            adjusted = EnhancedAdjustments.apply(pixels.crop(area), adjustment_name, value)
+            if adjusted is None:
+                return False
+            if area != box:
+                adjusted = adjusted.crop(offset_box(box, -area[0], -area[1]))
+            
+            result = pixels.copy()
+            result.paste(adjusted, box[:2], selection.mask)
+            self._add_to_history(result, steps=self._with_steps(f"a local {adjustment_name} adjustment"))
+            return True
+        except Exception as e:
+            print(f"Error applying local adjustment {adjustment_name}: {e}")
+            return False
+    
+    @instrumented('transform', 1)
+    @journaled
     def apply_transform(self, transform_name, params):
         """Apply transform to current image"""
         if not self.current_image:
             return False
+        self.commit_transforms()
+        if transform_name == 'crop':
+            return self.crop(**params)
+        self._flatten_layers()
         
         try:
-            result = EnhancedTransforms.apply(self.current_image, transform_name, params)
+            # Route through the accumulator so exact transforms and scales can read lazy crops directly;
+            # a pending EXIF orientation is resampled in the same pass
+            steps = orientation_steps(self.orientation) + [(transform_name, params)]
+            result = EnhancedTransforms.apply_chain(self.current_image, steps)
+            if self.orientation == 1:
+                derive_if_known(result, self.current_image, f"transform:{transform_name}", params)
+            else:
+                derive_if_known(result, self.current_image, 'transforms', steps)
             if result:
-                self._add_to_history(result)
+                self._add_to_history(result, steps=self._with_steps(
+                    *[('transform', name, step_params) for name, step_params in steps]))
                 return True
             return False
         except Exception as e:
             print(f"Error applying transform {transform_name}: {e}")
             return False
     
-    def add_text(self, text, x, y, font_name="arial", font_size=40, color="#FFFFFF"):
-        """Add text to image"""
+    @instrumented('crop')
+    @journaled
+    def crop(self, box):
+        """Crop lazily: record an offset rectangle over the current pixels"""
         if not self.current_image:
             return False
         
+        self.commit_transforms()
+        self._flatten_layers()
         try:
-            new_image = self.current_image.copy()
-            draw = ImageDraw.Draw(new_image)
-
-            def _resolve_font_path(name: str) -> Optional[str]:
-                """Try to resolve a TTF/OTF font path from a family or filename."""
-                if not name:
-                    return None
-
-                # If user passed a direct path
-                if os.path.sep in name or name.lower().endswith((".ttf", ".otf")):
-                    return name if os.path.exists(name) else None
-
-                # Common Windows fonts location
-                windows_fonts = os.path.join(os.environ.get("WINDIR", "C:\\Windows"), "Fonts")
-                candidates = [
-                    os.path.join(windows_fonts, f"{name}.ttf"),
-                    os.path.join(windows_fonts, f"{name}.otf"),
-                    os.path.join(windows_fonts, f"{name.lower()}.ttf"),
-                    os.path.join(windows_fonts, f"{name.lower()}.otf"),
-                ]
-                for path in candidates:
-                    if os.path.exists(path):
-                        return path
-
-                # Try relative to cwd
-                for ext in (".ttf", ".otf"):
-                    local_path = f"{name}{ext}"
-                    if os.path.exists(local_path):
-                        return local_path
-
-                # Try matplotlib's font lookup if available
-                if fm is not None:
-                    try:
-                        prop = fm.FontProperties(family=name)
-                        font_path = fm.findfont(prop, fallback_to_default=True)
-                        if font_path and os.path.exists(font_path):
-                            return font_path
-                    except Exception:
-                        pass
-
-                return None
-
-            # Resolve font path and load a scalable font so size is respected
-            resolved_path = _resolve_font_path(font_name)
-            font = None
-            if resolved_path:
-                try:
-                    font = ImageFont.truetype(resolved_path, int(font_size))
-                except Exception:
-                    font = None
-
-            if font is None:
-                # Try a very common bundled font in Pillow
-                try:
-                    font = ImageFont.truetype("DejaVuSans.ttf", int(font_size))
-                except Exception:
-                    font = None
-
-            if font is None:
-                # Last resort (bitmap, ignores size but prevents crash)
-                font = ImageFont.load_default()
-            
-            # Add text with outline
-            outline_color = "black"
-            for dx, dy in [(-1, -1), (-1, 1), (1, -1), (1, 1)]:
-                draw.text((x + dx, y + dy), text, fill=outline_color, font=font)
-            draw.text((x, y), text, fill=color, font=font)
-            
-            self._add_to_history(new_image)
+            # The box is in upright coordinates
+            self._apply_orientation()
+            self._add_to_history(CropView.of(self.current_image).crop(box),
+                                 steps=self._with_steps(('transform', 'crop', {'box': tuple(box)})))
             return True
+        except Exception as e:
+            print(f"Error cropping image: {e}")
+            return False
+    
+    @traced()
+    @journaled
+    def queue_transform(self, transform_name, params):
+        """Queue a geometric transform to be resampled together with other pending ones"""
+        if not self.current_image:
+            return False
+        
+        try:
+            self._flatten_layers()
+            if self.pending_transform is None:
+                # Queued in upright coordinates; commit prepends the EXIF orientation
+                self.pending_transform = AffineTransformAccumulator(self.get_view_size())
+            return self.pending_transform.add(transform_name, params)
+        except Exception as e:
+            print(f"Error queueing transform {transform_name}: {e}")
+            return False
+    
+    def has_pending_transforms(self):
+        """Check if geometric transforms are waiting to be committed"""
+        return self.pending_transform is not None and not self.pending_transform.is_identity()
+    
+    @journaled
+    def commit_transforms(self):
+        """Resample all pending transforms at once and add the result to history"""
+        accumulator, self.pending_transform = self.pending_transform, None
+        if accumulator is None or accumulator.is_identity() or not self.current_image:
+            return False
+        
+        try:
+            with performance_monitor.measure('commit transforms'):
+                accumulator = self._upright_accumulator(accumulator)
+                result = accumulator.apply(self.current_image)
+                derive_if_known(result, self.current_image, 'transforms', accumulator.steps)
+                self._add_to_history(result, steps=self._with_steps(
+                    *[('transform', name, params) for name, params in accumulator.steps]))
+            return True
+        except Exception as e:
+            print(f"Error committing transforms: {e}")
+            return False
+    
+    @journaled
+    def cancel_transforms(self):
+        """Discard pending transforms"""
+        had_pending = self.has_pending_transforms()
+        self.pending_transform = None
+        return had_pending
+    
+    @instrumented('preview: transforms')
+    def get_transform_preview(self, straighten=0.0):
+        """Preview pending transforms (plus an optional straighten angle) on a proxy"""
+        if not self.current_image:
+            return None
+        
+        self._flatten_layers()
+        accumulator = self._upright_accumulator(self.pending_transform)
+        try:
+            return accumulator.preview(self._get_preview_proxy(), straighten)
+        except Exception as e:
+            print(f"Error previewing transforms: {e}")
+            return None
+    
+    def get_view_size(self):
+        """Size of the current image once its EXIF orientation is applied"""
+        if self.current_image is None:
+            return None
+        if self.orientation == 1:
+            return self.current_image.size
+        return self._upright_accumulator().size
+    
+    def _upright_accumulator(self, accumulator=None):
+        """The pending EXIF orientation followed by accumulator's steps, over the current pixels"""
+        if self.orientation == 1 and accumulator is not None:
+            return accumulator
+        upright = AffineTransformAccumulator(self.current_image.size)
+        upright.orient(self.orientation)
+        for transform_name, params in (accumulator.steps if accumulator is not None else ()):
+            upright.add(transform_name, params)
+        return upright
+    
+    @traced()
+    def _apply_orientation(self):
+        """Materialize the pending EXIF orientation (for export and coordinate-based edits)"""
+        if self.orientation == 1 or self.current_image is None:
+            return self.current_image
+        with performance_monitor.measure('apply orientation'):
+            accumulator = self._upright_accumulator()
+            image = accumulator.apply(self._pixels())
+            derive_if_known(image, self.current_image, 'transforms', accumulator.steps)
+        self.steps = self._with_steps(*[('transform', name, params) for name, params in accumulator.steps])
+        # Same picture upright, so the history entry is replaced rather than added
+        if self.history and self.history[self.history_index] is self.current_image:
+            self.history[self.history_index] = image
+            self.orientation_history[self.history_index] = 1
+            self.step_history[self.history_index] = self.steps
+        self.current_image = image
+        self.orientation = 1
+        return image
+    
+    @traced()
+    def _get_preview_proxy(self):
+        """Downscaled copy of the current image, cached until it changes"""
+        if self._preview_proxy is None or self._preview_proxy[0] is not self.current_image:
+            ratio = min(1.0, self.preview_max_size / max(self.current_image.size))
+            proxy = ResizeEngine.scale(self.current_image, ratio, 'fast')
+            if isinstance(proxy, CropView):
+                proxy = proxy.materialize()
+            self._preview_proxy = (self.current_image, proxy)
+        return self._preview_proxy[1]
+    
+    @instrumented('text')
+    def add_text(self, text, x, y, font_name="arial", font_size=40, color="#FFFFFF"):
+        """Add text to image as an editable layer"""
+        if not self.current_image:
+            return False
+        
+        try:
+            return self.add_layer(TextLayer(text, x, y, font_name, font_size, color))
         except Exception as e:
             print(f"Error adding text: {e}")
             return False
     
+    def add_pixel_layer(self, image, x=0, y=0, **options):
+        """Add a raster layer (RGBA alpha is respected)"""
+        try:
+            return self.add_layer(PixelLayer(image, x, y, **options))
+        except Exception as e:
+            print(f"Error adding pixel layer: {e}")
+            return False
+    
+    def add_adjustment_layer(self, adjustment_name, value, **options):
+        """Add a non-destructive adjustment layer (optionally limited by mask=)"""
+        try:
+            return self.add_layer(AdjustmentLayer(adjustment_name, value, **options))
+        except Exception as e:
+            print(f"Error adding adjustment layer: {e}")
+            return False
+    
+    @instrumented('layer', 1)
+    @journaled
+    def add_layer(self, layer):
+        """Put a layer on top of the stack"""
+        if not self.current_image:
+            return False
+        self.commit_transforms()
+        # Layers are positioned on the upright image
+        self._apply_orientation()
+        # The image is shared with the previous entry; only the layer is new
+        self._add_to_history(self.current_image, self.layers + (layer,), steps=self.steps)
+        return True
+    
+    def get_layers(self):
+        """Layers over the current image, bottom to top"""
+        return list(self.layers)
+    
+    @instrumented('layer: edit')
+    @journaled
+    def update_layer(self, index, **changes):
+        """Replace layer attributes (opacity, blend_mode, mask, visible, text, value, ...)"""
+        if not 0 <= index < len(self.layers):
+            return False
+        
+        try:
+            layer = self.layers[index].with_changes(**changes)
+            layers = self.layers[:index] + (layer,) + self.layers[index + 1:]
+            self._add_to_history(self.current_image, layers, steps=self.steps)
+            return True
+        except Exception as e:
+            print(f"Error editing layer: {e}")
+            return False
+    
+    @journaled
+    def remove_layer(self, index):
+        """Remove a layer"""
+        if not 0 <= index < len(self.layers):
+            return False
+        layers = self.layers[:index] + self.layers[index + 1:]
+        self._add_to_history(self.current_image, layers, steps=self.steps)
+        return True
+    
+    @journaled
+    def move_layer(self, index, new_index):
+        """Move a layer to another position in the stack"""
+        if not (0 <= index < len(self.layers) and 0 <= new_index < len(self.layers)) or index == new_index:
+            return False
+        layers = list(self.layers)
+        layers.insert(new_index, layers.pop(index))
+        self._add_to_history(self.current_image, layers, steps=self.steps)
+        return True
+    
+    @traced()
+    @journaled
     def reset_to_original(self):
         """Reset to original image"""
+        self.cancel_transforms()
         if self.original_image:
-            self._add_to_history(self.original_image.copy())
+            self._add_to_history(self.original_image, orientation=self.original_orientation, steps=())
             return True
         return False
     
+    @traced()
+    @journaled
     def undo(self):
         """Undo last operation"""
+        if self.cancel_transforms():
+            return True
         if self.history_index > 0:
             self.history_index -= 1
-            self.current_image = self.history[self.history_index].copy()
+            self._restore_history_entry()
             return True
         return False
     
+    @traced()
+    @journaled
     def redo(self):
         """Redo last undone operation"""
+        self.cancel_transforms()
         if self.history_index < len(self.history) - 1:
             self.history_index += 1
-            self.current_image = self.history[self.history_index].copy()
+            self._restore_history_entry()
             return True
         return False
     
+    def trim_history(self, keep):
+        """Drop the oldest (then redo) history entries beyond keep"""
+        keep = max(1, keep)
+        while len(self.history) > keep and self.history_index > 0:
+            self.history.pop(0)
+            self.layer_history.pop(0)
+            self.orientation_history.pop(0)
+            self.step_history.pop(0)
+            self.history_index -= 1
+        del self.history[keep:]
+        del self.layer_history[keep:]
+        del self.orientation_history[keep:]
+        del self.step_history[keep:]
+    
+    def drop_caches(self):
+        """Release derived images that can be rebuilt (preview proxy, layer composite)"""
+        self._preview_proxy = None
+        if not self.layers:
+            self.compositor.release()
+    
     def can_undo(self):
         """Check if undo is possible"""
-        return self.history_index > 0
+        return self.history_index > 0 or self.has_pending_transforms()
     
     def can_redo(self):
         """Check if redo is possible"""
         return self.history_index < len(self.history) - 1
     
-    def _add_to_history(self, image):
-        """Add image to history"""
+    def _restore_history_entry(self):
+        self.current_image = self.history[self.history_index]
+        self.layers = self.layer_history[self.history_index]
+        self.orientation = self.orientation_history[self.history_index]
+        self.steps = self.step_history[self.history_index]
+    
+    @traced()
+    def _composited(self):
+        """Current image with layers applied (only dirty tiles are recomposited)"""
+        if not self.layers:
+            return self.current_image
+        return self.compositor.composite(self.current_image, self.layers)
+    
+    def _flatten_layers(self):
+        """Bake layers into the current pixels before a pixel operation"""
+        if self.layers:
+            self._composited()
+            # The composite now belongs to history and must not change again
+            self.current_image = self.compositor.release()
+            self.steps = self._with_steps(('layers', None, self.layers))
+            self.layers = ()
+        return self.current_image
+    
+    @traced()
+    def _pixels(self):
+        """Materialize a lazy crop when an operation needs contiguous memory"""
+        self._flatten_layers()
+        if isinstance(self.current_image, CropView):
+            image = self.current_image.materialize()
+            derive_if_known(image, self.current_image, 'materialize')
+            if self.history and self.history[self.history_index] is self.current_image:
+                self.history[self.history_index] = image
+            self.current_image = image
+        return self.current_image
+    
+    @traced()
+    def _with_steps(self, *new_steps):
+        """The session's steps followed by new_steps.
+        
+        A step that cannot be replayed is given as a description string; from then
+        on the first such description stands in for the steps.
+        """
+        if not isinstance(self.steps, tuple):
+            return self.steps
+        for step in new_steps:
+            if isinstance(step, str):
+                return step
+        return self.steps + new_steps
+    
+    def _add_to_history(self, image, layers=(), orientation=1, steps=None):
+        """Add image (or lazy crop view), its layers, pending EXIF orientation and replayable steps to history without copying pixels"""
         # Remove any redo history if we're not at the end
         if self.history_index < len(self.history) - 1:
             self.history = self.history[:self.history_index + 1]
+            self.layer_history = self.layer_history[:self.history_index + 1]
+            self.orientation_history = self.orientation_history[:self.history_index + 1]
+            self.step_history = self.step_history[:self.history_index + 1]
         
-        self.history.append(image.copy())
+        self.history.append(image)
+        self.layer_history.append(tuple(layers))
+        self.orientation_history.append(orientation)
+        self.step_history.append(steps)
         self.history_index += 1
         
         # Limit history size
         if len(self.history) > self.max_history:
             self.history.pop(0)
+            self.layer_history.pop(0)
+            self.orientation_history.pop(0)
+            self.step_history.pop(0)
             self.history_index -= 1
         
-        self.current_image = image.copy()
+        self.current_image = image
+        self.layers = tuple(layers)
+        self.orientation = orientation
+        self.steps = steps
     
+    @instrumented('preview: adjustments')
     def get_preview_with_adjustments(self, adjustments):
         """Get preview with adjustments without modifying history"""
         if not self.current_image:
             return None
         
+        self.commit_transforms()
         try:
-            preview_image = self.current_image.copy()
+            # Layers stay editable while previewing
+            preview_image = self._composited() if self.layers else self._pixels()
+            limit = self.adjustment_preview_max_size
+            if limit and max(preview_image.size) > limit:
+                # Memory governor: preview on a downscaled copy
+                preview_image = ResizeEngine.scale(preview_image, limit / max(preview_image.size), 'fast')
             
             for adjustment_name, value in adjustments.items():
                 try:
-                    result = EnhancedAdjustments.apply(preview_image, adjustment_name, value)
+                    result = self.result_cache.get_or_compute(
+                        preview_image, f"adjustment:{adjustment_name}", value,
+                        lambda image: self._adjust(image, adjustment_name, value))
                     if result:
                         preview_image = result
                 except Exception as adj_error:
@@ -263,4 +799,4 @@ class EnhancedImageProcessor:
             return preview_image
         except Exception as e:
             # Return original image if preview fails
-            return self.current_image.copy()
+            return self.get_current_view()
@@ -1,6 +1,10 @@
 from PIL import Image, ImageOps
 import math
 
+from .affine_transform import AffineTransformAccumulator
+from .resize_engine import ResizeEngine
+from .crop_view import materialize
+
 class EnhancedTransforms:
     @staticmethod
     def apply(image, transform_name, params):
@@ -17,6 +21,21 @@ class EnhancedTransforms:
             return transform_map[transform_name](image, **params)
         return None
     
+    @staticmethod
+    def apply_chain(image, steps):
+        """Apply a list of (transform_name, params) steps with a single resample"""
+        accumulator = AffineTransformAccumulator(image.size)
+        for transform_name, params in steps:
+            if not accumulator.add(transform_name, params):
+                # Non-affine step (e.g. auto_orient): flush and apply directly
+                image = materialize(accumulator.apply(image))
+                result = EnhancedTransforms.apply(image, transform_name, params)
+                if result is None:
+                    raise ValueError(f"Unknown transform: {transform_name}")
+                image = result
+                accumulator = AffineTransformAccumulator(image.size)
+        return accumulator.apply(image)
+    
     @staticmethod
     def rotate(image, angle):
         if angle % 360 == 0:
@@ -34,19 +53,19 @@ class EnhancedTransforms:
             return image.rotate(angle, expand=True, fillcolor='white')
     
     @staticmethod
-    def resize(image, size, resample=Image.Resampling.LANCZOS):
+    def resize(image, size, resample=None, quality='balanced'):
         if isinstance(size, (list, tuple)) and len(size) == 2:
-            return image.resize(size, resample)
+            if resample is not None:
+                return image.resize(size, resample)
+            return ResizeEngine.resize(image, size, quality)
         return image
     
     @staticmethod
-    def scale(image, factor):
+    def scale(image, factor, quality='balanced'):
         if factor <= 0:
             return image
         
-        new_width = int(image.width * factor)
-        new_height = int(image.height * factor)
-        return image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        return ResizeEngine.scale(image, factor, quality)
     
     @staticmethod
     def flip(image, direction):
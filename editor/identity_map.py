@@ -0,0 +1,45 @@
+import threading
+import weakref
+
+
+class IdentityWeakMap:
+    """Weak mapping keyed by object identity.
+
+    PIL images define __eq__ without __hash__, so they cannot be keys of a
+    WeakKeyDictionary; entries here disappear when the key object dies.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, obj, default=None):
+        with self._lock:
+            entry = self._entries.get(id(obj))
+        if entry is not None and entry[0]() is obj:
+            return entry[1]
+        return default
+
+    def __setitem__(self, obj, value):
+        key = id(obj)
+
+        def _forget(ref, key=key):
+            with self._lock:
+                if self._entries.get(key, (None,))[0] is ref:
+                    del self._entries[key]
+
+        with self._lock:
+            self._entries[key] = (weakref.ref(obj, _forget), value)
+
+    def discard(self, obj):
+        """Forget obj's entry if present"""
+        with self._lock:
+            entry = self._entries.get(id(obj))
+            if entry is not None and entry[0]() is obj:
+                del self._entries[id(obj)]
+
+    def __contains__(self, obj):
+        return self.get(obj) is not None
+
+    def __len__(self):
+        return len(self._entries)
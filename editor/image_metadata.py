@@ -0,0 +1,145 @@
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+ORIENTATION_TAG = 0x0112
+# EXIF orientations that swap width and height
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+class ImageMetadata:
+    """What a file's header says about an image, read without decoding pixels"""
+
+    def __init__(self, path, width, height, mode, format_name, orientation=1, has_icc=False,
+                 dpi=None, file_size=0, mtime_ns=0, n_frames=1):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.format = format_name
+        self.orientation = orientation
+        self.has_icc = has_icc
+        self.dpi = dpi
+        self.file_size = file_size
+        self.mtime_ns = mtime_ns
+        self.n_frames = n_frames
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    @property
+    def oriented_size(self):
+        """Size once EXIF orientation is applied"""
+        if self.orientation in TRANSPOSED_ORIENTATIONS:
+            return self.height, self.width
+        return self.size
+
+    @property
+    def pixels(self):
+        return self.width * self.height
+
+    def decoded_bytes(self):
+        """Memory of the image decoded in the editor's working mode (4 bytes per RGB pixel)"""
+        return self.pixels * 4
+
+    def as_dict(self):
+        return {
+            'size': self.size,
+            'mode': self.mode,
+            'format': self.format,
+            'orientation': self.orientation,
+            'icc_profile': self.has_icc,
+            'dpi': self.dpi,
+            'file_size': self.file_size,
+            'frames': self.n_frames,
+        }
+
+    def __repr__(self):
+        return f"<ImageMetadata {os.path.basename(self.path)} {self.width}x{self.height} {self.mode} {self.format}>"
+
+
+def _orientation(image):
+    """EXIF orientation still to be applied once the pixels are decoded"""
+    try:
+        if image.format == 'TIFF':
+            # Pillow already reports the oriented size and transposes TIFFs on load
+            return 1
+        if image.format == 'PNG':
+            # getexif() would decode the pixels to reach an eXIf chunk after the image data
+            raw = image.info.get('exif')
+            if not raw:
+                return 1
+            exif = Image.Exif()
+            exif.load(raw)
+        else:
+            exif = image.getexif()
+        orientation = int(exif.get(ORIENTATION_TAG, 1))
+        return orientation if 1 <= orientation <= 8 else 1
+    except Exception:
+        return 1
+
+
+def read_metadata(path):
+    """Read an ImageMetadata from the file header (pixels are not decoded)"""
+    stat = os.stat(path)
+    with Image.open(path) as image:
+        dpi = image.info.get('dpi')
+        if dpi:
+            dpi = tuple(int(round(float(value))) for value in dpi)
+        return ImageMetadata(
+            path=path,
+            width=image.width,
+            height=image.height,
+            mode=image.mode,
+            format_name=image.format,
+            orientation=_orientation(image),
+            has_icc=bool(image.info.get('icc_profile')),
+            dpi=dpi or None,
+            file_size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            # Counting GIF frames walks the file, so only animated files are counted
+            n_frames=image.n_frames if getattr(image, 'is_animated', False) else 1,
+        )
+
+
+class MetadataCache:
+    """Header metadata by path, re-read when the file's size or mtime changes"""
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """Metadata of path, or None if it is not a readable image"""
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            metadata = self.entries.get(path)
+            if metadata is not None and (metadata.mtime_ns, metadata.file_size) == (stat.st_mtime_ns, stat.st_size):
+                self.entries.move_to_end(path)
+                return metadata
+        try:
+            metadata = read_metadata(path)
+        except Exception:
+            return None
+        with self._lock:
+            self.entries[path] = metadata
+            self.entries.move_to_end(path)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return metadata
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+
+# Shared by the status bar, filmstrip and batch tools
+metadata_cache = MetadataCache()
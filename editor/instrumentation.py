@@ -0,0 +1,207 @@
+import functools
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+from .tracing import tracer
+
+# Set to measure peak Python allocations of every operation from startup
+TRACK_MEMORY_ENV_VAR = 'PHOTO_EDITOR_TRACK_MEMORY'
+
+
+def current_rss():
+    """Resident set size of this process in bytes (None if unavailable)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import psutil  # type: ignore
+        return psutil.Process().memory_info().rss
+    except Exception:
+        return None
+
+
+class OperationRecord:
+    """Timing and memory figures for one editor operation"""
+
+    def __init__(self, name, wall_time, cpu_time, peak_bytes, rss_delta, timestamp):
+        self.name = name
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.peak_bytes = peak_bytes
+        self.rss_delta = rss_delta
+        self.timestamp = timestamp
+
+    def summary(self):
+        """Short one-line text for the status bar"""
+        text = f"{self.name}: {self.wall_time * 1000:.0f} ms (CPU {self.cpu_time * 1000:.0f} ms)"
+        if self.peak_bytes is not None:
+            text += f", peak {self.peak_bytes / 1048576:.1f} MB"
+        elif self.rss_delta is not None:
+            text += f", RSS {self.rss_delta / 1048576:+.1f} MB"
+        return text
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'wall_ms': round(self.wall_time * 1000, 3),
+            'cpu_ms': round(self.cpu_time * 1000, 3),
+            'peak_bytes': self.peak_bytes,
+            'rss_delta': self.rss_delta,
+            'timestamp': self.timestamp,
+        }
+
+
+class PerformanceMonitor:
+    """Ring buffer of per-operation timings.
+
+    The RSS delta of each operation is always recorded. Peak allocation
+    comes from tracemalloc (Python and NumPy buffers; Pillow allocates
+    outside of it) and is only measured while track_memory is on, since
+    tracing slows the traced operations several times over. Nested
+    operations are folded into the outermost one.
+    """
+
+    def __init__(self, capacity=200, track_memory=None):
+        self.records = deque(maxlen=capacity)
+        self.listeners = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.track_memory = False
+        self._started_tracing = False
+        if track_memory is None:
+            track_memory = bool(os.environ.get(TRACK_MEMORY_ENV_VAR))
+        self.set_track_memory(track_memory)
+
+    def set_track_memory(self, enabled):
+        """Turn tracemalloc peak measurement on or off"""
+        self.track_memory = bool(enabled)
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        elif not self.track_memory and self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def add_listener(self, callback):
+        """Call callback(record) after every recorded operation"""
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    @contextmanager
+    def measure(self, name):
+        """Record wall time, CPU time and peak allocation of the enclosed block"""
+        with tracer.span(name, 'operation'):
+            with self._measure(name):
+                yield
+
+    @contextmanager
+    def _measure(self, name):
+        depth = getattr(self._local, 'depth', 0)
+        if depth:
+            # Inner operations are part of the outer measurement
+            self._local.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._local.depth = depth
+            return
+
+        self._local.depth = 1
+        base_traced = None
+        if (self.track_memory and tracemalloc.is_tracing()
+                and threading.current_thread() is threading.main_thread()):
+            tracemalloc.reset_peak()
+            base_traced = tracemalloc.get_traced_memory()[0]
+        rss_before = current_rss()
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            cpu_time = time.thread_time() - cpu_start
+            wall_time = time.perf_counter() - wall_start
+            peak_bytes = None
+            if base_traced is not None and tracemalloc.is_tracing():
+                peak_bytes = max(0, tracemalloc.get_traced_memory()[1] - base_traced)
+            rss_after = current_rss()
+            rss_delta = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+            self._local.depth = 0
+            self._record(OperationRecord(name, wall_time, cpu_time, peak_bytes, rss_delta, time.time()))
+
+    def _record(self, record):
+        with self._lock:
+            self.records.append(record)
+        for callback in list(self.listeners):
+            try:
+                callback(record)
+            except Exception as e:
+                print(f"Error in performance listener: {e}")
+
+    def latest(self):
+        """Most recent record (or None)"""
+        with self._lock:
+            return self.records[-1] if self.records else None
+
+    def clear(self):
+        with self._lock:
+            self.records.clear()
+
+    def format_log(self):
+        """Human readable performance log with a per-operation summary"""
+        with self._lock:
+            records = list(self.records)
+        if not records:
+            return "No operations recorded yet."
+
+        lines = [f"{'operation':<32} {'wall ms':>9} {'cpu ms':>9} {'peak MB':>9} {'rss MB':>8}"]
+        for record in records:
+            peak = f"{record.peak_bytes / 1048576:.1f}" if record.peak_bytes is not None else "-"
+            rss = f"{record.rss_delta / 1048576:+.1f}" if record.rss_delta is not None else "-"
+            lines.append(f"{record.name[:32]:<32} {record.wall_time * 1000:>9.1f} "
+                         f"{record.cpu_time * 1000:>9.1f} {peak:>9} {rss:>8}")
+
+        totals = {}
+        for record in records:
+            count, total, worst = totals.get(record.name, (0, 0.0, 0.0))
+            totals[record.name] = (count + 1, total + record.wall_time, max(worst, record.wall_time))
+        lines.append("")
+        lines.append(f"{'summary':<32} {'count':>9} {'mean ms':>9} {'max ms':>9}")
+        for name, (count, total, worst) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name[:32]:<32} {count:>9} {total / count * 1000:>9.1f} {worst * 1000:>9.1f}")
+        return "\n".join(lines)
+
+    def dump(self, file_path):
+        """Write the performance log to a text file"""
+        with open(file_path, 'w', encoding='utf-8') as handle:
+            handle.write(self.format_log() + "\n")
+
+
+# Shared monitor used by the editor and the UI
+performance_monitor = PerformanceMonitor()
+
+
+def instrumented(label, detail_arg=None):
+    """Decorator recording the wrapped call in performance_monitor.
+
+    detail_arg is the positional index (including self) of an argument
+    appended to the label, e.g. instrumented('filter', 1) -> "filter: blur".
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            name = label
+            if detail_arg is not None and len(args) > detail_arg:
+                name = f"{label}: {args[detail_arg]}"
+            with performance_monitor.measure(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,191 @@
+import copy
+
+from PIL import Image, ImageChops
+
+from .crop_view import materialize
+
+# Blend functions take (below, layer) images of the same mode; None = normal
+BLEND_MODES = {
+    'normal': None,
+    'multiply': ImageChops.multiply,
+    'screen': ImageChops.screen,
+    'overlay': ImageChops.overlay,
+    'soft_light': ImageChops.soft_light,
+    'hard_light': ImageChops.hard_light,
+    'darken': ImageChops.darker,
+    'lighten': ImageChops.lighter,
+    'add': ImageChops.add,
+    'subtract': ImageChops.subtract,
+    'difference': ImageChops.difference,
+}
+
+
+def intersect(a, b):
+    """Intersection of two (left, top, right, bottom) boxes, or None"""
+    box = (max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3]))
+    if box[0] >= box[2] or box[1] >= box[3]:
+        return None
+    return box
+
+
+def offset_box(box, dx, dy):
+    return (box[0] + dx, box[1] + dy, box[2] + dx, box[3] + dy)
+
+
+class Layer:
+    """Base class for layers composited over the processor's current image.
+
+    Layers are immutable once they are in history; ``with_changes`` returns
+    a modified copy. Subclasses implement ``content_bounds`` and ``render``; the
+    base class applies the blend mode, opacity and optional mask.
+    """
+
+    kind = 'layer'
+    # Pixels outside the output box a layer reads (e.g. for neighbourhood filters)
+    margin = 0
+
+    def __init__(self, name=None, opacity=1.0, blend_mode='normal', mask=None,
+                 mask_offset=(0, 0), visible=True):
+        if blend_mode not in BLEND_MODES:
+            raise ValueError(f"Unknown blend mode: {blend_mode}")
+        if mask is not None and mask.mode != 'L':
+            mask = mask.convert('L')
+        self.name = name or self.kind
+        self.opacity = float(opacity)
+        self.blend_mode = blend_mode
+        self.mask = mask
+        self.mask_offset = tuple(mask_offset)
+        self.visible = visible
+
+    def with_changes(self, **changes):
+        """New layer with some attributes replaced"""
+        if changes.get('blend_mode', self.blend_mode) not in BLEND_MODES:
+            raise ValueError(f"Unknown blend mode: {changes['blend_mode']}")
+        layer = copy.copy(self)
+        for name, value in changes.items():
+            if not hasattr(layer, name):
+                raise AttributeError(f"{type(self).__name__} has no attribute {name!r}")
+            setattr(layer, name, value)
+        layer._reset()
+        return layer
+
+    def _reset(self):
+        """Drop cached renders after with_changes"""
+
+    def content_bounds(self, canvas_size):
+        """Canvas box the layer draws into, before masking"""
+        return (0, 0) + tuple(canvas_size)
+
+    def bounds(self, canvas_size):
+        """Canvas box the layer can change (None if it changes nothing)"""
+        box = intersect(self.content_bounds(canvas_size), (0, 0) + tuple(canvas_size))
+        if box is not None and self.mask is not None:
+            mask_box = self.mask.getbbox()
+            if mask_box is None:
+                return None
+            box = intersect(box, offset_box(mask_box, *self.mask_offset))
+        return box
+
+    def render(self, image, region, origin):
+        """Return (pixels, coverage or None) for region (canvas coordinates).
+
+        image is the composite of the layers below, positioned at origin in
+        canvas coordinates; it covers region plus ``margin`` where possible.
+        """
+        raise NotImplementedError
+
+    def coverage(self, coverage, region):
+        """Combine the layer's own coverage with its mask and opacity"""
+        size = (region[2] - region[0], region[3] - region[1])
+        if self.mask is not None:
+            mask = self.mask.crop(offset_box(region, -self.mask_offset[0], -self.mask_offset[1]))
+            coverage = mask if coverage is None else ImageChops.multiply(coverage, mask)
+        if self.opacity < 1.0:
+            if coverage is None:
+                coverage = Image.new('L', size, int(round(255 * self.opacity)))
+            else:
+                coverage = coverage.point(lambda v: int(round(v * self.opacity)))
+        return coverage
+
+    def composite(self, image, origin=(0, 0), canvas_size=None):
+        """Blend the layer into image in place; image sits at origin in canvas coordinates"""
+        if not self.visible or self.opacity <= 0:
+            return None
+        bounds = self.bounds(canvas_size or image.size)
+        if bounds is None:
+            return None
+        region = intersect(bounds, (origin[0], origin[1], origin[0] + image.width, origin[1] + image.height))
+        if region is None:
+            return None
+
+        pixels, coverage = self.render(image, region, origin)
+        coverage = self.coverage(coverage, region)
+        local = offset_box(region, -origin[0], -origin[1])
+        if pixels.mode != image.mode:
+            pixels = pixels.convert(image.mode)
+        blend = BLEND_MODES[self.blend_mode]
+        if blend is not None:
+            pixels = blend(image.crop(local), pixels)
+        image.paste(pixels, local[:2], coverage)
+        return region
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name!r} {self.blend_mode} {self.opacity:.2f}>"
+
+
+class PixelLayer(Layer):
+    """Raster layer placed at (x, y); RGBA alpha acts as coverage"""
+
+    kind = 'pixel'
+
+    def __init__(self, image, x=0, y=0, **options):
+        super().__init__(**options)
+        self.image = materialize(image)
+        self.x = int(x)
+        self.y = int(y)
+
+    def content_bounds(self, canvas_size):
+        return (self.x, self.y, self.x + self.image.width, self.y + self.image.height)
+
+    def render(self, image, region, origin):
+        pixels = self.image.crop(offset_box(region, -self.x, -self.y))
+        coverage = None
+        if pixels.mode in ('RGBA', 'LA'):
+            coverage = pixels.getchannel('A')
+            pixels = pixels.convert('RGB' if pixels.mode == 'RGBA' else 'L')
+        return pixels, coverage
+
+
+class AdjustmentLayer(Layer):
+    """Non-destructive adjustment of everything below, limited by its mask"""
+
+    kind = 'adjustment'
+    # Adjustments whose output pixel depends only on the input pixel
+    POINTWISE = {'brightness', 'saturation', 'gamma', 'exposure', 'hue', 'temperature', 'levels'}
+    # Neighbourhood adjustments and the extra pixels they read
+    MARGINS = {'sharpness': 2}
+
+    def __init__(self, adjustment_name, value, **options):
+        if adjustment_name not in self.POINTWISE and adjustment_name not in self.MARGINS:
+            # contrast/auto_levels/auto_color depend on whole-image statistics
+            raise ValueError(f"{adjustment_name} cannot be used as an adjustment layer")
+        options.setdefault('name', adjustment_name)
+        super().__init__(**options)
+        self.adjustment_name = adjustment_name
+        self.value = value
+        self.margin = self.MARGINS.get(adjustment_name, 0)
+
+    def _reset(self):
+        self.margin = self.MARGINS.get(self.adjustment_name, 0)
+
+    def render(self, image, region, origin):
+        from .enhanced_adjustments import EnhancedAdjustments
+
+        # Read margin pixels around the region so tiles match a whole-image pass
+        local = offset_box(region, -origin[0], -origin[1])
+        area = intersect((local[0] - self.margin, local[1] - self.margin,
+                          local[2] + self.margin, local[3] + self.margin),
+                         (0, 0, image.width, image.height))
+        adjusted = EnhancedAdjustments.apply(image.crop(area), self.adjustment_name, self.value)
+        inner = offset_box(local, -area[0], -area[1])
+        return adjusted.crop(inner), None
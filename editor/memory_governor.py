@@ -0,0 +1,149 @@
+import os
+import threading
+
+from .instrumentation import current_rss
+from .memory_manager import memory_manager
+from .result_cache import result_cache
+
+# Escalation steps; each level keeps the measures of the ones below it
+LEVEL_NAMES = ['normal', 'history trimmed', 'caches dropped', 'previews reduced', 'tiled adjustments']
+# Fraction of the RSS limit at which each level starts
+RSS_THRESHOLDS = [0.0, 0.70, 0.80, 0.90, 0.95]
+# Multiples of the reserve of free system memory below which each level starts
+AVAILABLE_THRESHOLDS = [None, 2.0, 1.5, 1.0, 0.5]
+# A level is left only once pressure is this far below where it started
+RSS_HYSTERESIS = 0.05
+AVAILABLE_HYSTERESIS = 0.25
+
+TRIMMED_HISTORY = 5
+REDUCED_PREVIEW_SIZE = 512
+REDUCED_ADJUSTMENT_PREVIEW = 1024
+
+
+def system_memory():
+    """(total, available) system memory in bytes, or (None, None)"""
+    try:
+        values = {}
+        with open('/proc/meminfo') as meminfo:
+            for line in meminfo:
+                key, rest = line.split(':', 1)
+                values[key] = int(rest.split()[0]) * 1024
+        return values['MemTotal'], values['MemAvailable']
+    except (OSError, ValueError, KeyError):
+        pass
+    try:
+        import psutil  # type: ignore
+        memory = psutil.virtual_memory()
+        return memory.total, memory.available
+    except Exception:
+        return None, None
+
+
+class MemorySample:
+    """One reading of process and system memory"""
+
+    def __init__(self, rss, total, available):
+        self.rss = rss
+        self.total = total
+        self.available = available
+
+    def summary(self):
+        parts = []
+        if self.rss is not None:
+            parts.append(f"RSS {self.rss / 2 ** 20:.0f} MB")
+        if self.available is not None:
+            parts.append(f"free {self.available / 2 ** 20:.0f} MB")
+        return ", ".join(parts)
+
+
+class MemoryGovernor:
+    """Degrade gracefully as memory runs low instead of running out.
+
+    ``check`` reads process RSS and available system memory and moves
+    between levels: 1 trims every document's history and spills idle
+    documents, 2 drops the result cache and preview proxies, 3 lowers
+    preview resolution and 4 switches adjustments to strip-by-strip
+    processing. Listeners are told about every level change.
+    """
+
+    def __init__(self, rss_limit=None, reserve=None, documents=None):
+        total, _ = system_memory()
+        if rss_limit is None:
+            limit_mb = os.environ.get('PHOTO_EDITOR_RSS_LIMIT_MB')
+            if limit_mb:
+                rss_limit = int(limit_mb) * 1024 * 1024
+            elif total:
+                rss_limit = int(total * 0.75)
+        self.rss_limit = rss_limit
+        # Free system memory to keep in reserve (default: 10% of RAM, at most 1 GB)
+        self.reserve = reserve if reserve is not None else min(2 ** 30, int((total or 0) * 0.10)) or None
+        self.documents = documents or (lambda: list(memory_manager.documents.values()))
+        self.level = 0
+        self.last_sample = None
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback):
+        """callback(level, name, sample) is called whenever the level changes"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def sample(self):
+        total, available = system_memory()
+        return MemorySample(current_rss(), total, available)
+
+    def level_for(self, sample, current_level=0):
+        """Level called for by a sample (with hysteresis around current_level)"""
+        level = 0
+        for candidate in range(1, len(LEVEL_NAMES)):
+            held = candidate <= current_level
+            if sample.rss is not None and self.rss_limit:
+                slack = RSS_HYSTERESIS if held else 0.0
+                if sample.rss / self.rss_limit >= RSS_THRESHOLDS[candidate] - slack:
+                    level = candidate
+            if sample.available is not None and self.reserve:
+                slack = AVAILABLE_HYSTERESIS if held else 0.0
+                if sample.available / self.reserve <= AVAILABLE_THRESHOLDS[candidate] + slack:
+                    level = candidate
+        return level
+
+    def check(self, sample=None):
+        """Sample memory, apply the matching level and return it"""
+        with self._lock:
+            sample = sample or self.sample()
+            self.last_sample = sample
+            previous = self.level
+            self.level = self.level_for(sample, previous)
+            self.apply(self.level, escalated=self.level > previous)
+        if self.level != previous:
+            for callback in list(self._listeners):
+                callback(self.level, LEVEL_NAMES[self.level], sample)
+        return self.level
+
+    def apply(self, level, escalated=False):
+        """Apply the settings of a level to every open document"""
+        processors = [processor for processor in self.documents() if processor is not None]
+        for processor in processors:
+            processor.max_history = TRIMMED_HISTORY if level >= 1 else processor.DEFAULT_MAX_HISTORY
+            processor.preview_max_size = REDUCED_PREVIEW_SIZE if level >= 3 else processor.DEFAULT_PREVIEW_SIZE
+            processor.adjustment_preview_max_size = REDUCED_ADJUSTMENT_PREVIEW if level >= 3 else None
+            processor.tiled_adjustments = level >= 4
+
+        if not escalated:
+            return
+        # One-off measures, repeated only when pressure rises again
+        if level >= 1:
+            for processor in processors:
+                processor.trim_history(TRIMMED_HISTORY)
+            memory_manager.spill_idle()
+        if level >= 2:
+            result_cache.clear()
+            for processor in processors:
+                processor.drop_caches()
+
+
+# Shared by the main window
+memory_governor = MemoryGovernor()
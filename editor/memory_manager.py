@@ -0,0 +1,165 @@
+import os
+import shutil
+import tempfile
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .compressed_io import write_compressed, read_compressed
+
+DEFAULT_BUDGET_MB = 1024
+
+
+class MemoryManager:
+    """Shared pixel/history budget for every open document.
+
+    Documents (processors) are kept in most-recently-activated order. When
+    the total exceeds ``budget_bytes``, the least recently used idle
+    documents hand over their pixels and history, which are compressed to
+    a scratch directory on a background thread. A spilled document is
+    restored when it is activated again - straight from memory if its
+    write has not finished yet.
+    """
+
+    def __init__(self, budget_bytes=None, scratch_dir=None):
+        if budget_bytes is None:
+            budget_bytes = int(os.environ.get('PHOTO_EDITOR_MEMORY_BUDGET_MB', DEFAULT_BUDGET_MB)) * 1024 * 1024
+        self.budget_bytes = budget_bytes
+        self.scratch_root = scratch_dir
+        self.scratch_dir = None
+        self.documents = OrderedDict()
+        # id(processor) -> (scratch path, write future, state kept until written);
+        # every spill gets its own path so a stale write never touches a newer one
+        self.spilled = {}
+        self._generation = itertools.count()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def register(self, processor):
+        """Track a document; it becomes the most recently used one"""
+        self.documents[id(processor)] = processor
+
+    def unregister(self, processor):
+        """Forget a closed document and delete its scratch file"""
+        self.documents.pop(id(processor), None)
+        entry = self.spilled.pop(id(processor), None)
+        if entry is not None:
+            entry[1].cancel()
+            entry[1].add_done_callback(lambda _done, path=entry[0]: self._remove(path))
+
+    def activate(self, processor):
+        """Mark a document as in use, restoring it if it was spilled"""
+        if id(processor) not in self.documents:
+            self.register(processor)
+        self.documents.move_to_end(id(processor))
+        self.ensure_resident(processor)
+        return self.enforce()
+
+    def is_spilled(self, processor):
+        return id(processor) in self.spilled
+
+    def usage(self, processor):
+        """Resident {'pixels': bytes, 'history': bytes} of a document"""
+        if self.is_spilled(processor):
+            return {'pixels': 0, 'history': 0}
+        return processor.memory_usage()
+
+    def total_bytes(self):
+        total = 0
+        for processor in self.documents.values():
+            usage = self.usage(processor)
+            total += usage['pixels'] + usage['history']
+        return total
+
+    def enforce(self):
+        """Spill idle documents, least recently used first, until within budget"""
+        spilled = []
+        idle = list(self.documents.values())[:-1]
+        total = self.total_bytes()
+        for processor in idle:
+            if total <= self.budget_bytes:
+                break
+            if self.is_spilled(processor):
+                continue
+            usage = self.usage(processor)
+            if self.spill(processor):
+                total -= usage['pixels'] + usage['history']
+                spilled.append(processor)
+        return spilled
+
+    def spill_idle(self):
+        """Spill every document except the most recently used one"""
+        return [processor for processor in list(self.documents.values())[:-1] if self.spill(processor)]
+
+    def spill(self, processor):
+        """Move a document's pixels and history to the scratch cache"""
+        if self.is_spilled(processor) or processor.current_image is None:
+            return False
+
+        state = processor.release_state()
+        path = os.path.join(self._scratch(), f"document-{id(processor)}-{next(self._generation)}.bin")
+        with self._lock:
+            future = self._writer().submit(self._write, processor, path, state)
+            self.spilled[id(processor)] = (path, future, state)
+        return True
+
+    def _write(self, processor, path, state):
+        write_compressed(path, state)
+        with self._lock:
+            entry = self.spilled.get(id(processor))
+            if entry is not None and entry[0] == path:
+                # Written and still the current spill: drop the in-memory copy
+                self.spilled[id(processor)] = (path, entry[1], None)
+
+    def ensure_resident(self, processor):
+        """Bring a spilled document back (no-op if it is resident)"""
+        entry = self.spilled.get(id(processor))
+        if entry is None:
+            return False
+
+        path, future, _ = entry
+        with self._lock:
+            state = self.spilled[id(processor)][2]
+            if state is not None:
+                future.cancel()
+        try:
+            if state is None:
+                state = read_compressed(path)
+            processor.restore_state(state)
+        finally:
+            del self.spilled[id(processor)]
+            # Runs now if the write finished or was cancelled, otherwise once it ends
+            future.add_done_callback(lambda _done, path=path: self._remove(path))
+        return True
+
+    def _scratch(self):
+        if self.scratch_dir is None:
+            self.scratch_dir = tempfile.mkdtemp(prefix='photo-editor-scratch-', dir=self.scratch_root)
+        return self.scratch_dir
+
+    def _writer(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scratch-cache")
+        return self._executor
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def shutdown(self):
+        """Stop the writer and delete the scratch cache"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        if self.scratch_dir is not None:
+            shutil.rmtree(self.scratch_dir, ignore_errors=True)
+            self.scratch_dir = None
+        self.spilled.clear()
+
+
+# Shared by every document window
+memory_manager = MemoryManager()
@@ -0,0 +1,174 @@
+import os
+import queue
+import threading
+import time
+
+from PIL import Image
+
+from .recipe import FORMATS, apply_recipe, encode, to_working_mode
+
+_DONE = object()
+
+
+class StageStats:
+    """Counters for one pipeline stage"""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy = 0.0
+        # Time spent waiting for input / for room in the next queue
+        self.starved = 0.0
+        self.blocked = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, busy=0.0, starved=0.0, blocked=0.0, items=0):
+        with self._lock:
+            self.busy += busy
+            self.starved += starved
+            self.blocked += blocked
+            self.items += items
+
+    def utilization(self, elapsed):
+        """Fraction of the stage's worker time spent working"""
+        if elapsed <= 0:
+            return 0.0
+        return min(1.0, self.busy / (elapsed * self.workers))
+
+    def summary(self, elapsed):
+        per_item = self.busy / self.items * 1000 if self.items else 0.0
+        return (f"{self.name:<8} {self.workers:>2} workers  {self.utilization(elapsed) * 100:5.1f}% busy  "
+                f"{per_item:7.1f} ms/item  starved {self.starved:6.2f} s  blocked {self.blocked:6.2f} s")
+
+
+class StagedPipeline:
+    """Decode -> process -> encode with a thread pool per stage.
+
+    Stages are joined by queues of ``queue_size`` items; a stage that gets
+    ahead blocks on a full queue (backpressure), so at most about
+    ``2 * queue_size`` decoded images plus one per worker are in memory.
+    Disk reads and writes overlap computation and throughput approaches that
+    of the slowest stage. ``blocked`` time shows a stage waiting on the next
+    one, ``starved`` time a stage waiting on the previous one.
+    """
+
+    STAGES = ('decode', 'process', 'encode')
+
+    def __init__(self, decode, process, encode, workers=(2, None, 2), queue_size=4):
+        self.functions = (decode, process, encode)
+        counts = list(workers)
+        if counts[1] is None:
+            counts[1] = os.cpu_count() or 2
+        self.workers = [max(1, int(count)) for count in counts]
+        self.queue_size = max(1, queue_size)
+        self.stats = [StageStats(name, count) for name, count in zip(self.STAGES, self.workers)]
+        self.elapsed = 0.0
+
+    def run(self, jobs, on_result=None):
+        """Run every job through the stages; returns [(job, result, error)] in job order.
+
+        on_result(job, result, error) is called from an encode worker as each job finishes;
+        an exception it raises is recorded as that job's error.
+        """
+        jobs = list(jobs)
+        self.stats = [StageStats(name, count) for name, count in zip(self.STAGES, self.workers)]
+        queues = [queue.Queue(self.queue_size) for _ in range(len(self.STAGES) + 1)]
+        results = [None] * len(jobs)
+        remaining = [count for count in self.workers]
+        lock = threading.Lock()
+
+        def worker(stage):
+            function, stats = self.functions[stage], self.stats[stage]
+            inbox, outbox = queues[stage], queues[stage + 1]
+            while True:
+                wait_start = time.perf_counter()
+                item = inbox.get()
+                started = time.perf_counter()
+                if item is _DONE:
+                    stats.add(starved=started - wait_start)
+                    break
+                index, value, error = item
+                if error is None:
+                    try:
+                        value = function(value)
+                    except Exception as e:
+                        value, error = None, e
+                finished = time.perf_counter()
+
+                if stage == len(self.STAGES) - 1:
+                    if on_result is not None:
+                        try:
+                            on_result(jobs[index], value, error)
+                        except Exception as e:
+                            # A failing callback must not kill the worker and stall the run
+                            error = error or e
+                    results[index] = (jobs[index], value, error)
+                else:
+                    outbox.put((index, value, error))
+                stats.add(busy=finished - started, starved=started - wait_start,
+                          blocked=time.perf_counter() - finished, items=1)
+
+            with lock:
+                remaining[stage] -= 1
+                last = remaining[stage] == 0
+            if last and stage < len(self.STAGES) - 1:
+                # Last worker out tells every worker of the next stage
+                for _ in range(self.workers[stage + 1]):
+                    outbox.put(_DONE)
+
+        threads = []
+        for stage, count in enumerate(self.workers):
+            for number in range(count):
+                thread = threading.Thread(target=worker, args=(stage,), daemon=True,
+                                          name=f"pipeline-{self.STAGES[stage]}-{number}")
+                thread.start()
+                threads.append(thread)
+
+        start = time.perf_counter()
+        # Feeding blocks once decode falls behind
+        for index, job in enumerate(jobs):
+            queues[0].put((index, job, None))
+        for _ in range(self.workers[0]):
+            queues[0].put(_DONE)
+        for thread in threads:
+            thread.join()
+        self.elapsed = time.perf_counter() - start
+        return results
+
+    def summary(self):
+        lines = [stats.summary(self.elapsed) for stats in self.stats]
+        items = self.stats[-1].items
+        rate = items / self.elapsed if self.elapsed else 0.0
+        bottleneck = max(self.stats, key=lambda stats: stats.utilization(self.elapsed))
+        lines.append(f"{items} items in {self.elapsed:.2f} s ({rate:.1f}/s), "
+                     f"bottleneck: {bottleneck.name}")
+        return "\n".join(lines)
+
+
+def recipe_pipeline(steps, format_name=None, quality=None, workers=(2, None, 2), queue_size=4):
+    """Pipeline for (source_path, output_path) jobs that applies a recipe.
+
+    The output format follows format_name, else the output path's extension.
+    """
+
+    def decode(job):
+        source, output = job
+        # load() inside to_working_mode reads the pixels and closes the file
+        return output, to_working_mode(Image.open(source))
+
+    def process(item):
+        output, image = item
+        return output, apply_recipe(image, steps)
+
+    def write(item):
+        output, image = item
+        target_format = format_name or FORMATS.get(os.path.splitext(output)[1].lower().lstrip('.'), 'PNG')
+        data = encode(image, target_format, quality)
+        temporary = output + '.part'
+        with open(temporary, 'wb') as f:
+            f.write(data)
+        os.replace(temporary, output)
+        return output
+
+    return StagedPipeline(decode, process, write, workers, queue_size)
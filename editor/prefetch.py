@@ -0,0 +1,95 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from .recipe import to_working_mode
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def decode(path):
+    """Decode a file into the editor's working mode"""
+    return to_working_mode(Image.open(path))
+
+
+class ImagePrefetcher:
+    """Decode images the user is likely to open next on a background thread.
+
+    ``load_image`` asks ``take`` first: a finished decode is used as is, one
+    still running is waited for (it is further along than a fresh decode),
+    and a file changed since it was prefetched is decoded again. Only the
+    ``max_images`` most recent requests are kept, and nothing is prefetched
+    while the memory governor is dropping caches.
+    """
+
+    def __init__(self, max_images=2):
+        self.max_images = max_images
+        self.entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def prefetch(self, paths):
+        """Start decoding paths (most wanted first) unless already done"""
+        from .memory_governor import memory_governor
+
+        if memory_governor.level >= 2:
+            self.clear()
+            return
+        with self._lock:
+            for path in reversed(paths[:self.max_images]):
+                try:
+                    signature = _signature(path)
+                except OSError:
+                    continue
+                entry = self.entries.get(path)
+                if entry is not None and entry[0] == signature:
+                    self.entries.move_to_end(path)
+                    continue
+                self.entries[path] = (signature, self._pool().submit(decode, path))
+                self.entries.move_to_end(path)
+            while len(self.entries) > self.max_images:
+                _, (_, future) = self.entries.popitem(last=False)
+                future.cancel()
+
+    def take(self, path):
+        """Prefetched working-mode image of path, or None"""
+        with self._lock:
+            entry = self.entries.pop(path, None)
+        if entry is None:
+            return None
+        signature, future = entry
+        try:
+            if _signature(path) != signature or future.cancelled():
+                future.cancel()
+                return None
+            return future.result()
+        except Exception:
+            # Let the normal load report the error
+            return None
+
+    def clear(self):
+        with self._lock:
+            for _, future in self.entries.values():
+                future.cancel()
+            self.entries.clear()
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        return self._executor
+
+    def shutdown(self):
+        self.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Used by load_image and the filmstrip
+image_prefetcher = ImagePrefetcher()
@@ -0,0 +1,224 @@
+import inspect
+import io
+import json
+import numbers
+
+from PIL import Image
+
+from .alpha import flatten_alpha, has_alpha, prepare_for_format
+from .crop_view import materialize
+from .enhanced_transforms import EnhancedTransforms
+from .resize_engine import ResizeEngine
+from .result_cache import canonical_params
+
+STEP_KINDS = ('filter', 'adjustment', 'transform')
+
+# Output formats by file extension / request name
+FORMATS = {
+    'png': 'PNG', 'jpg': 'JPEG', 'jpeg': 'JPEG', 'webp': 'WEBP',
+    'bmp': 'BMP', 'tif': 'TIFF', 'tiff': 'TIFF', 'gif': 'GIF',
+}
+MIME_TYPES = {
+    'PNG': 'image/png', 'JPEG': 'image/jpeg', 'WEBP': 'image/webp',
+    'BMP': 'image/bmp', 'TIFF': 'image/tiff', 'GIF': 'image/gif',
+}
+
+
+class RecipeError(ValueError):
+    """Malformed recipe step"""
+
+
+def _is_number(value):
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+
+def _is_positive(value):
+    return _is_number(value) and value > 0
+
+
+def _is_numbers(count):
+    return lambda value: (isinstance(value, (list, tuple)) and len(value) == count
+                          and all(_is_number(v) for v in value))
+
+
+# Transform name -> {parameter: check}, as AffineTransformAccumulator.add takes them;
+# the first parameter is required
+TRANSFORM_PARAMS = {
+    'rotate': {'angle': _is_number},
+    'scale': {'factor': _is_positive},
+    'resize': {'size': lambda value: _is_numbers(2)(value) and all(v >= 1 for v in value)},
+    'crop': {'box': _is_numbers(4)},
+    'flip': {'direction': lambda value: isinstance(value, str) and value.lower() in ('horizontal', 'vertical')},
+    'orient': {'orientation': lambda value: isinstance(value, int) and 1 <= value <= 8},
+    'auto_orient': {},
+}
+# Adjustments that compute their own value from the image
+VALUE_OPTIONAL = ('auto_levels', 'auto_color')
+
+
+def _check_params(kind, name, params, checks):
+    """Raise RecipeError unless params has the required and only known, well-typed keys"""
+    if not isinstance(params, dict):
+        raise RecipeError(f"{kind} params must be an object: {params!r}")
+    for key, value in params.items():
+        if key not in checks:
+            raise RecipeError(f"{kind} {name} has no parameter {key!r}")
+        if not checks[key](value):
+            raise RecipeError(f"Invalid {key} for {kind} {name}: {value!r}")
+    required = next(iter(checks), None)
+    if required is not None and kind == 'transform' and required not in params:
+        raise RecipeError(f"{kind} {name} needs {required}")
+
+
+def normalize_step(step):
+    """Turn one recipe step into (kind, name, params).
+
+    Accepted forms:
+        {"filter": "blur"}, {"filter": "blur", "params": {...}}
+        {"adjustment": "brightness", "value": 1.2}
+        {"transform": "rotate", "params": {"angle": 90}}
+        ["adjustment", "gamma", 1.4]
+    """
+    if isinstance(step, (list, tuple)) and len(step) in (2, 3):
+        kind, name = step[0], step[1]
+        params = step[2] if len(step) == 3 else None
+    elif isinstance(step, dict):
+        kinds = [kind for kind in STEP_KINDS if kind in step]
+        if len(kinds) != 1:
+            raise RecipeError(f"Step needs exactly one of {', '.join(STEP_KINDS)}: {step!r}")
+        kind = kinds[0]
+        name = step[kind]
+        params = step.get('value', step.get('params'))
+    else:
+        raise RecipeError(f"Invalid step: {step!r}")
+
+    if kind not in STEP_KINDS:
+        raise RecipeError(f"Unknown step type: {kind!r}")
+    if not isinstance(name, str):
+        raise RecipeError(f"Step name must be a string: {name!r}")
+    if kind == 'filter':
+        from .enhanced_filters import EnhancedFilters
+        filter_map = EnhancedFilters.filter_map()
+        if name not in filter_map:
+            raise RecipeError(f"Unknown filter: {name}")
+        params = {} if params is None else params
+        # Every filter parameter is numeric; the names come from the signature
+        accepted = list(inspect.signature(filter_map[name]).parameters)[1:]
+        _check_params(kind, name, params, {key: _is_number for key in accepted})
+    elif kind == 'transform':
+        if name not in TRANSFORM_PARAMS:
+            raise RecipeError(f"Unknown transform: {name}")
+        params = {} if params is None else params
+        _check_params(kind, name, params, TRANSFORM_PARAMS[name])
+    else:
+        from .enhanced_adjustments import EnhancedAdjustments
+        if name not in EnhancedAdjustments.names():
+            raise RecipeError(f"Unknown adjustment: {name}")
+        if params is None and name not in VALUE_OPTIONAL:
+            raise RecipeError(f"Adjustment {name} needs a value")
+        if params is not None and not _is_number(params):
+            raise RecipeError(f"Adjustment {name} value must be a number: {params!r}")
+    return kind, name, params
+
+
+def parse_recipe(data):
+    """Normalize a recipe given as JSON text, a list of steps or {"steps": [...]}"""
+    if isinstance(data, (str, bytes)):
+        try:
+            data = json.loads(data)
+        except ValueError as e:
+            raise RecipeError(f"Recipe is not valid JSON: {e}")
+    if isinstance(data, dict):
+        data = data.get('steps', [])
+    if not isinstance(data, list):
+        raise RecipeError("Recipe must be a list of steps")
+    return [normalize_step(step) for step in data]
+
+
+def load_recipe(path):
+    """Read a recipe from a JSON file"""
+    with open(path, encoding='utf-8') as f:
+        return parse_recipe(f.read())
+
+
+def recipe_key(steps):
+    """Stable text form of normalized steps (for cache keys)"""
+    return canonical_params([list(step) for step in steps])
+
+
+def to_working_mode(image, keep_alpha=True):
+    """Convert a decoded image to the editor's working mode.
+
+    RGBA when the image has transparency (flattened over white only on export
+    to a format without alpha, or here with keep_alpha=False), RGB otherwise.
+    """
+    if has_alpha(image):
+        if image.mode != 'RGBA':
+            image = image.convert('RGBA')
+        if not keep_alpha:
+            image.load()
+            image = flatten_alpha(image)
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.load()
+    return image
+
+
+def apply_recipe(image, steps):
+    """Apply normalized steps; consecutive transforms share one resample"""
+    from .enhanced_adjustments import EnhancedAdjustments
+    from .enhanced_filters import EnhancedFilters
+
+    transforms = []
+    for kind, name, params in steps:
+        if kind == 'transform':
+            transforms.append((name, params))
+            continue
+        if transforms:
+            image = materialize(EnhancedTransforms.apply_chain(image, transforms))
+            transforms = []
+        if kind == 'filter':
+            result = EnhancedFilters.apply(image, name, params)
+        else:
+            result = EnhancedAdjustments.apply(image, name, params)
+        if result is None:
+            raise RecipeError(f"Unknown {kind}: {name}")
+        image = result
+    if transforms:
+        image = EnhancedTransforms.apply_chain(image, transforms)
+    return materialize(image)
+
+
+def output_format(name, default='PNG'):
+    """PIL format for an extension or format name"""
+    if not name:
+        return default
+    key = name.lower().lstrip('.')
+    if key in FORMATS:
+        return FORMATS[key]
+    if name.upper() in MIME_TYPES:
+        return name.upper()
+    raise RecipeError(f"Unsupported output format: {name}")
+
+
+def encode(image, format_name, quality=None):
+    """Encode an image to bytes"""
+    options = {}
+    image = prepare_for_format(image, format_name)
+    if format_name in ('JPEG', 'WEBP'):
+        options['quality'] = int(quality or 90)
+    buffer = io.BytesIO()
+    image.save(buffer, format_name, **options)
+    return buffer.getvalue()
+
+
+def render_bytes(data, steps, format_name='PNG', quality=None, max_size=None):
+    """Decode image bytes, apply steps (then fit within max_size) and encode.
+
+    Self-contained so it can run in a worker process.
+    """
+    image = to_working_mode(Image.open(io.BytesIO(data)))
+    image = apply_recipe(image, steps)
+    if max_size and max(image.size) > max_size:
+        image = materialize(ResizeEngine.scale(image, max_size / max(image.size), 'balanced'))
+    return encode(image, format_name, quality)
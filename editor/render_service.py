@@ -0,0 +1,272 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+from PIL import UnidentifiedImageError
+
+from .recipe import RecipeError, parse_recipe, recipe_key, output_format, render_bytes, MIME_TYPES
+
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 100 * 1024 * 1024
+DEFAULT_CACHE_MB = 256
+
+STATUS_TEXT = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    413: 'Payload Too Large', 500: 'Internal Server Error',
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class OutputCache:
+    """Recently rendered outputs, evicted least recently used by total bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        if key in self.entries:
+            self.nbytes -= len(self.entries.pop(key))
+        self.entries[key] = value
+        self.nbytes += len(value)
+        while self.nbytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= len(evicted)
+
+
+class RenderService:
+    """Local HTTP service rendering recipes on a process pool.
+
+    POST /render?steps=<json>&format=png&quality=90&max_size=2048 with the
+    encoded image as the body returns the rendered image. A request whose
+    image bytes, steps and output options match one already rendering waits
+    for that render instead of starting another; recent outputs are served
+    from a byte-bounded cache. GET /health and GET /stats report status.
+    """
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, workers=None, cache_bytes=None):
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 2
+        self.cache = OutputCache(cache_bytes if cache_bytes is not None else DEFAULT_CACHE_MB * 1024 * 1024)
+        # request key -> future of the render in progress
+        self.in_flight = {}
+        self.stats = {'requests': 0, 'rendered': 0, 'cache_hits': 0, 'coalesced': 0, 'errors': 0,
+                      'render_seconds': 0.0}
+        # Counters are read by /stats and load tests from other threads
+        self._stats_lock = threading.Lock()
+        self.started = time.time()
+        self.executor = None
+        self.server = None
+        self.connections = set()
+
+    async def start(self):
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        # Port 0 picks a free port
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        print(f"Render service listening on http://{self.host}:{self.port} ({self.workers} workers)")
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            # Idle keep-alive connections would otherwise hold wait_closed open
+            for task in list(self.connections):
+                task.cancel()
+            await asyncio.gather(*self.connections, return_exceptions=True)
+            await self.server.wait_closed()
+            self.server = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    async def render(self, body, steps, format_name, quality, max_size):
+        """Rendered bytes and how they were obtained ('hit', 'coalesced' or 'miss')"""
+        digest = hashlib.sha1(body).hexdigest()
+        key = f"{digest}|{recipe_key(steps)}|{format_name}|{quality}|{max_size}"
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._count('cache_hits')
+            return cached, 'hit'
+
+        pending = self.in_flight.get(key)
+        if pending is not None:
+            self._count('coalesced')
+            # shield: one waiter disconnecting must not cancel the shared render
+            return await asyncio.shield(pending), 'coalesced'
+
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        future = loop.run_in_executor(self.executor, render_bytes, body, steps, format_name, quality, max_size)
+        self.in_flight[key] = future
+        try:
+            output = await asyncio.shield(future)
+        finally:
+            self.in_flight.pop(key, None)
+        self._count('rendered')
+        self._count('render_seconds', time.perf_counter() - start)
+        self.cache.put(key, output)
+        return output, 'miss'
+
+    async def _handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self.connections.add(task)
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, response_headers, payload = await self._dispatch(method, target, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                self._write_response(writer, status, response_headers, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except HTTPError as e:
+            self._write_response(writer, e.status, {}, self._json({'error': str(e)}), False)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self.connections.discard(task)
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _read_request(self, reader):
+        """(method, target, headers, body) of the next request, or None at EOF"""
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(400, "Request headers too large")
+
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, _ = lines[0].split(' ', 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            raise HTTPError(400, "Chunked request bodies are not supported")
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Body larger than {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target, headers, body
+
+    async def _dispatch(self, method, target, body):
+        self._count('requests')
+        url = urlsplit(target)
+        try:
+            if url.path == '/health':
+                return 200, {}, self._json({'status': 'ok'})
+            if url.path == '/stats':
+                return 200, {}, self._json(self.snapshot_stats())
+            if url.path != '/render':
+                raise HTTPError(404, f"No such endpoint: {url.path}")
+            if method != 'POST':
+                raise HTTPError(405, "Use POST with the image as the request body")
+            if not body:
+                raise HTTPError(400, "Empty request body")
+
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            try:
+                steps = parse_recipe(query.get('steps', '[]'))
+                format_name = output_format(query.get('format'))
+                quality = int(query['quality']) if 'quality' in query else None
+                max_size = int(query['max_size']) if 'max_size' in query else None
+            except (RecipeError, ValueError) as e:
+                raise HTTPError(400, str(e))
+
+            try:
+                output, source = await self.render(body, steps, format_name, quality, max_size)
+            except (RecipeError, UnidentifiedImageError) as e:
+                raise HTTPError(400, str(e))
+            except Exception as e:
+                raise HTTPError(500, f"Render failed: {e}")
+            return 200, {'Content-Type': MIME_TYPES[format_name], 'X-Cache': source}, output
+        except HTTPError as e:
+            self._count('errors')
+            return e.status, {}, self._json({'error': str(e)})
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    def snapshot_stats(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['render_seconds'] = round(stats['render_seconds'], 3)
+        stats.update({
+            'in_flight': len(self.in_flight),
+            'cache_entries': len(self.cache.entries),
+            'cache_bytes': self.cache.nbytes,
+            'workers': self.workers,
+            'uptime': round(time.time() - self.started, 1),
+        })
+        return stats
+
+    @staticmethod
+    def _json(value):
+        return json.dumps(value).encode('utf-8')
+
+    @staticmethod
+    def _write_response(writer, status, headers, payload, keep_alive):
+        headers = dict(headers)
+        headers.setdefault('Content-Type', 'application/json')
+        headers['Content-Length'] = str(len(payload))
+        headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+        head = f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+        head += ''.join(f"{name}: {value}\r\n" for name, value in headers.items())
+        writer.write(head.encode('latin-1') + b'\r\n' + payload)
+
+
+def run_service(host='127.0.0.1', port=DEFAULT_PORT, workers=None, cache_mb=DEFAULT_CACHE_MB):
+    """Run the render service until interrupted"""
+    service = RenderService(host, port, workers, cache_mb * 1024 * 1024)
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,112 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from .crop_view import materialize
+from .recipe import FORMATS, apply_recipe, encode, to_working_mode
+from .resize_engine import ResizeEngine
+
+# Long-edge sizes; None is the full-size rendition
+DEFAULT_SIZES = (None, 2048, 1024, 512, 256)
+DEFAULT_FORMATS = ('jpg', 'webp')
+MANIFEST_SUFFIX = '.manifest.json'
+
+
+def fit_size(size, long_edge):
+    """Size scaled so its longer side is long_edge"""
+    width, height = size
+    factor = long_edge / max(width, height)
+    return max(1, round(width * factor)), max(1, round(height * factor))
+
+
+def build_cascade(image, sizes, quality='balanced'):
+    """{size: image} where each rendition is resized from the next larger one.
+
+    Sizes at or above the source's long edge are served by the source
+    itself (never upscaled). Every step is a small downscale of an already
+    reduced image, so the cascade costs little more than its first step.
+    """
+    renditions = {}
+    previous = image
+    for size in sorted(sizes, key=lambda s: float('inf') if s is None else s, reverse=True):
+        if size is None or size >= max(image.size):
+            renditions[size] = image
+            continue
+        previous = materialize(ResizeEngine.resize(previous, fit_size(image.size, size), quality))
+        renditions[size] = previous
+    return renditions
+
+
+def export_renditions(source, output_dir, sizes=DEFAULT_SIZES, formats=DEFAULT_FORMATS,
+                      quality=None, steps=None, basename=None, workers=None, resize_quality='balanced'):
+    """Decode once, cascade down through sizes and encode every size/format in parallel.
+
+    source: a path or an already decoded PIL image
+    Writes <basename>-<size>.<ext> files plus <basename>.manifest.json; returns the manifest.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    timings = {}
+
+    start = time.perf_counter()
+    if isinstance(source, Image.Image):
+        image = materialize(source)
+        basename = basename or 'image'
+    else:
+        image = to_working_mode(Image.open(source))
+        basename = basename or os.path.splitext(os.path.basename(source))[0]
+    timings['decode_ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+    if steps:
+        start = time.perf_counter()
+        image = apply_recipe(image, steps)
+        timings['recipe_ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+    start = time.perf_counter()
+    renditions = build_cascade(image, sizes, resize_quality)
+    timings['cascade_ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+    format_names = [FORMATS[extension.lower().lstrip('.')] for extension in formats]
+
+    def write(size, extension, format_name):
+        rendition = renditions[size]
+        started = time.perf_counter()
+        data = encode(rendition, format_name, quality)
+        label = 'full' if size is None else str(size)
+        filename = f"{basename}-{label}.{extension.lower().lstrip('.')}"
+        path = os.path.join(output_dir, filename)
+        temporary = path + '.part'
+        with open(temporary, 'wb') as f:
+            f.write(data)
+        os.replace(temporary, path)
+        return {
+            'file': filename,
+            'size': label,
+            'format': format_name,
+            'width': rendition.width,
+            'height': rendition.height,
+            'bytes': len(data),
+            'encode_ms': round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    start = time.perf_counter()
+    jobs = [(size, extension, format_name) for size in renditions
+            for extension, format_name in zip(formats, format_names)]
+    # Pillow releases the GIL while encoding, so threads encode in parallel
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 2,
+                            thread_name_prefix="rendition-encode") as executor:
+        outputs = list(executor.map(lambda job: write(*job), jobs))
+    timings['encode_ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+    manifest = {
+        'source': source if isinstance(source, str) else None,
+        'width': image.width,
+        'height': image.height,
+        'timings': timings,
+        'outputs': outputs,
+    }
+    with open(os.path.join(output_dir, basename + MANIFEST_SUFFIX), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+from .crop_view import CropView
+from .identity_map import IdentityWeakMap
+
+# Operations whose output is not a pure function of their inputs
+NON_CACHEABLE = {'random_filter'}
+
+# Rows hashed per chunk, so fingerprinting never copies a whole frame
+_HASH_BAND_ROWS = 256
+
+_BYTES_PER_BAND = {'I': 4, 'F': 4, 'I;16': 2, 'I;16B': 2, 'I;16L': 2}
+
+_fingerprints = IdentityWeakMap()
+
+
+def image_nbytes(image):
+    """Approximate pixel buffer size of a PIL image (or crop view) in bytes"""
+    bands = Image.getmodebands(image.mode)
+    return image.width * image.height * bands * _BYTES_PER_BAND.get(image.mode, 1)
+
+
+def canonical_params(params):
+    """Stable text form of operation params (dict order and float noise removed)"""
+    def normalize(value):
+        if isinstance(value, float):
+            return round(value, 6)
+        if isinstance(value, dict):
+            return {str(k): normalize(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [normalize(v) for v in value]
+        return value
+
+    return json.dumps(normalize(params), sort_keys=True, default=repr)
+
+
+def derive_fingerprint(parent_fingerprint, operation, params=None):
+    """Fingerprint of a result, derived from its source without reading pixels"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(parent_fingerprint.encode())
+    digest.update(operation.encode())
+    digest.update(canonical_params(params).encode())
+    return digest.hexdigest()
+
+
+def set_fingerprint(image, value):
+    """Remember the fingerprint of an image produced by a known operation"""
+    _fingerprints[image] = value
+
+
+def forget_fingerprint(image):
+    """Drop a remembered fingerprint after an image is modified in place"""
+    _fingerprints.discard(image)
+
+
+def derive_if_known(result, source, operation, params=None):
+    """Give result a derived fingerprint when the source's one is already known"""
+    if result is None or result is source:
+        return
+    known = _fingerprints.get(source)
+    if known is None and isinstance(source, CropView):
+        parent_known = _fingerprints.get(source.parent)
+        if parent_known is not None:
+            known = derive_fingerprint(parent_known, 'crop', list(source.box))
+    if known is not None:
+        set_fingerprint(result, known if operation == 'materialize' else
+                        derive_fingerprint(known, operation, params))
+
+
+def fingerprint(image):
+    """Content fingerprint of an image, computed once per image object.
+
+    Loaded images are hashed band by band; results of cached operations
+    inherit a derived fingerprint, and crop views derive theirs from the
+    parent, so most lookups never touch pixels.
+    """
+    known = _fingerprints.get(image)
+    if known is not None:
+        return known
+
+    if isinstance(image, CropView):
+        value = derive_fingerprint(fingerprint(image.parent), 'crop', list(image.box))
+    else:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{image.mode}:{image.width}x{image.height}".encode())
+        for top in range(0, image.height, _HASH_BAND_ROWS):
+            bottom = min(image.height, top + _HASH_BAND_ROWS)
+            digest.update(image.crop((0, top, image.width, bottom)).tobytes())
+        value = digest.hexdigest()
+
+    set_fingerprint(image, value)
+    return value
+
+
+class ResultCache:
+    """LRU cache of operation results keyed by (source fingerprint, operation, params).
+
+    Entries are evicted least-recently-used first once the stored pixel
+    bytes exceed max_bytes. Cached images are shared, so callers must treat
+    them as immutable (as the processor's history already does).
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, image, operation, params=None):
+        """Cache key for applying operation(params) to image"""
+        return (fingerprint(image), operation, canonical_params(params))
+
+    def get(self, key):
+        """Cached result or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, image):
+        """Store a result, evicting old entries to stay within the byte budget"""
+        size = image_nbytes(image)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.bytes_used -= self._entries.pop(key)[1]
+            self._entries[key] = (image, size)
+            self.bytes_used += size
+            self._evict(self.max_bytes)
+
+    def _evict(self, limit):
+        while self._entries and self.bytes_used > limit:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.bytes_used -= size
+
+    def trim(self, max_bytes):
+        """Evict down to max_bytes without changing the budget"""
+        with self._lock:
+            self._evict(max_bytes)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes_used = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_compute(self, image, operation, params, compute):
+        """Return the cached result of compute(image) or compute and store it"""
+        name = operation.split(':', 1)[-1]
+        if name in NON_CACHEABLE:
+            return compute(image)
+
+        key = self.key(image, operation, params)
+        result = self.get(key)
+        if result is not None:
+            return result
+
+        result = compute(image)
+        if result is not None and result is not image:
+            set_fingerprint(result, derive_fingerprint(key[0], operation, params))
+            self.put(key, result)
+        return result
+
+
+# Shared cache used by the processor, previews and the filter gallery
+result_cache = ResultCache()
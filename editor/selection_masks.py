@@ -0,0 +1,111 @@
+from PIL import Image, ImageDraw, ImageFilter
+
+from .layers import intersect, offset_box
+
+
+class SelectionMask:
+    """Soft selection stored only over its bounding box.
+
+    ``mask`` is an 'L' image covering ``box`` (canvas coordinates); pixels
+    outside the box are unselected. Local adjustments process just that box.
+    """
+
+    def __init__(self, mask, offset=(0, 0)):
+        if mask.mode != 'L':
+            mask = mask.convert('L')
+        # Trim to the selected pixels so work is proportional to the selection
+        bbox = mask.getbbox()
+        if bbox is None:
+            self.mask = None
+            self.box = None
+            return
+        if bbox != (0, 0) + mask.size:
+            mask = mask.crop(bbox)
+        self.mask = mask
+        self.box = offset_box(bbox, offset[0], offset[1])
+
+    def is_empty(self):
+        return self.box is None
+
+    @property
+    def area(self):
+        """Pixels inside the bounding box"""
+        if self.box is None:
+            return 0
+        return (self.box[2] - self.box[0]) * (self.box[3] - self.box[1])
+
+    def clipped(self, canvas_size):
+        """Selection limited to the canvas"""
+        if self.box is None:
+            return self
+        box = intersect(self.box, (0, 0) + tuple(canvas_size))
+        if box == self.box:
+            return self
+        if box is None:
+            return SelectionMask(Image.new('L', (1, 1), 0))
+        return SelectionMask(self.mask.crop(offset_box(box, -self.box[0], -self.box[1])), box[:2])
+
+    def mask_for(self, box):
+        """Mask pixels for a canvas box (zero outside the selection)"""
+        return self.mask.crop(offset_box(box, -self.box[0], -self.box[1]))
+
+    @staticmethod
+    def _feathered(box, draw_shape, feather):
+        """Draw a shape into a padded mask and blur its edge"""
+        pad = int(feather * 2)
+        left, top, right, bottom = (int(v) for v in box)
+        mask = Image.new('L', (right - left + 2 * pad, bottom - top + 2 * pad), 0)
+        draw_shape(ImageDraw.Draw(mask), (pad, pad, pad + right - left - 1, pad + bottom - top - 1))
+        if feather > 0:
+            mask = mask.filter(ImageFilter.GaussianBlur(feather))
+        return SelectionMask(mask, (left - pad, top - pad))
+
+    @staticmethod
+    def rectangle(box, feather=0):
+        """Rectangular selection, optionally with a feathered edge"""
+        return SelectionMask._feathered(box, lambda draw, b: draw.rectangle(b, fill=255), feather)
+
+    @staticmethod
+    def ellipse(box, feather=0):
+        """Elliptical selection inscribed in box"""
+        return SelectionMask._feathered(box, lambda draw, b: draw.ellipse(b, fill=255), feather)
+
+    @staticmethod
+    def gradient(canvas_size, start, end):
+        """Linear gradient: fully selected before start, fading to nothing at end"""
+        import numpy as np
+
+        width, height = canvas_size
+        dx, dy = end[0] - start[0], end[1] - start[1]
+        length_sq = float(dx * dx + dy * dy) or 1.0
+        xs = np.arange(width, dtype=np.float32)
+        ys = np.arange(height, dtype=np.float32)[:, None]
+        # Position along the start -> end axis: 0 at start, 1 at end
+        t = ((xs - start[0]) * dx + (ys - start[1]) * dy) / length_sq
+        values = np.clip((1.0 - t) * 255.0, 0, 255).astype(np.uint8)
+        return SelectionMask(Image.fromarray(values, 'L'))
+
+    @staticmethod
+    def brush(points, radius, hardness=1.0):
+        """Brush stroke through points; softer hardness blurs the edge"""
+        if not points:
+            return SelectionMask(Image.new('L', (1, 1), 0))
+        radius = max(1, int(radius))
+        feather = radius * (1.0 - max(0.0, min(1.0, hardness))) / 2
+        pad = radius + int(feather * 2) + 1
+        xs = [int(x) for x, _ in points]
+        ys = [int(y) for _, y in points]
+        left, top = min(xs) - pad, min(ys) - pad
+        mask = Image.new('L', (max(xs) - min(xs) + 2 * pad, max(ys) - min(ys) + 2 * pad), 0)
+        draw = ImageDraw.Draw(mask)
+        local = [(x - left, y - top) for x, y in zip(xs, ys)]
+        if len(local) > 1:
+            draw.line(local, fill=255, width=radius * 2, joint='curve')
+        for x, y in local:
+            draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=255)
+        if feather > 0:
+            mask = mask.filter(ImageFilter.GaussianBlur(feather))
+        return SelectionMask(mask, (left, top))
+
+    def __repr__(self):
+        return f"<SelectionMask box={self.box}>"
@@ -0,0 +1,366 @@
+import functools
+import json
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+import weakref
+
+from .compressed_io import write_compressed, read_compressed
+from .result_cache import NON_CACHEABLE
+
+JOURNAL_FILE = 'journal.jsonl'
+OWNER_FILE = 'owner.json'
+# Held locked by the running editor, so others can tell its journal is live
+LOCK_FILE = 'owner.lock'
+ENTRY_PREFIX = 'entry-'
+
+
+def default_journal_dir():
+    """Where session journals live (PHOTO_EDITOR_JOURNAL_DIR overrides)"""
+    return os.environ.get('PHOTO_EDITOR_JOURNAL_DIR') or os.path.join(
+        os.path.expanduser('~'), '.basic_photo_editor', 'sessions')
+
+
+def journaled(method):
+    """Log a processor operation to its journal when it succeeds.
+
+    Only the outermost call is logged (apply_transform('crop') calls crop,
+    filters commit pending transforms), since replaying it repeats the rest.
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        journal = getattr(self, 'journal', None)
+        if journal is None or journal.replaying:
+            return method(self, *args, **kwargs)
+
+        journal.depth += 1
+        try:
+            result = method(self, *args, **kwargs)
+        finally:
+            journal.depth -= 1
+        if result and journal.depth == 0:
+            journal.record(name, args, kwargs, self)
+        return result
+
+    return wrapper
+
+
+def _lower_thread_priority():
+    """Best effort: nice the calling thread (Linux applies setpriority per thread)"""
+    if not sys.platform.startswith('linux'):
+        return
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+    except (AttributeError, OSError):
+        pass
+
+
+def _try_lock(f):
+    """Lock f without blocking: True if locked, False if another process holds it, None if unsupported"""
+    try:
+        if os.name == 'nt':
+            import msvcrt
+
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except ImportError:
+        return None
+    except OSError:
+        return False
+
+
+def _pid_alive(pid):
+    """True or False when it can be told, None when it cannot"""
+    if pid == os.getpid():
+        return True
+    if os.name != 'posix':
+        # os.kill(pid, 0) would terminate the process on Windows
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _owner_alive(session_dir, pid):
+    """Whether the editor that wrote a journal may still be running (unknown counts as running)"""
+    lock_path = os.path.join(session_dir, LOCK_FILE)
+    if os.path.exists(lock_path):
+        try:
+            with open(lock_path, 'a+b') as f:
+                locked = _try_lock(f)
+        except OSError:
+            return True
+        if locked is not None:
+            # Closing the file drops the lock we just took
+            return not locked
+    return _pid_alive(pid) is not False
+
+
+class SessionJournal:
+    """Append-only log of editing operations for crash recovery.
+
+    Every successful operation is appended as one JSON line. Every
+    ``keyframe_interval`` operations (and after non-deterministic filters)
+    the processor state is captured - history entries are immutable, so
+    that is only a few references - and a compressed snapshot is written
+    by a low-priority background thread. Each undo-stack image is written
+    once and shared by later keyframes. Recovery loads the newest keyframe
+    with its undo stack and replays the operations logged after it.
+    """
+
+    def __init__(self, directory=None, keyframe_interval=20):
+        base = directory or default_journal_dir()
+        self.directory = os.path.join(base, f"session-{os.getpid()}-{int(time.time() * 1000)}")
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, OWNER_FILE), 'w', encoding='utf-8') as f:
+            json.dump({'pid': os.getpid(), 'started': time.time()}, f)
+        # Kept open (and locked) for the whole session
+        self._owner_lock = open(os.path.join(self.directory, LOCK_FILE), 'a+b')
+        _try_lock(self._owner_lock)
+
+        self.keyframe_interval = keyframe_interval
+        self.seq = 0
+        self.since_keyframe = 0
+        self.depth = 0
+        self.replaying = False
+        # id -> (weak reference, file) of undo-stack images already on disk (writer thread only)
+        self._entry_files = {}
+        self._entry_count = 0
+        self._log = open(os.path.join(self.directory, JOURNAL_FILE), 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+        self._tasks = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="session-journal", daemon=True)
+        self._worker.start()
+
+    def record(self, operation, args, kwargs, processor):
+        """Append an operation; schedule a keyframe when one is due"""
+        self.seq += 1
+        seq = self.seq
+        entry = {
+            'seq': seq,
+            'time': round(time.time(), 3),
+            'op': operation,
+            'args': [self._encode(seq, index, value) for index, value in enumerate(args)],
+            'kwargs': {key: self._encode(seq, key, value) for key, value in kwargs.items()},
+        }
+        self._append(entry)
+
+        if operation == 'load_image':
+            # A load is a restart point of its own
+            self.since_keyframe = 0
+            return
+        self.since_keyframe += 1
+        nondeterministic = operation == 'apply_filter' and args and args[0] in NON_CACHEABLE
+        if nondeterministic or self.since_keyframe >= self.keyframe_interval:
+            self.keyframe(processor)
+
+    def keyframe(self, processor):
+        """Capture the processor state now and compress it in the background"""
+        snapshot = processor.snapshot()
+        if snapshot is None:
+            return
+        self.since_keyframe = 0
+        self._tasks.put(('keyframe', self.seq, snapshot))
+
+    def _encode(self, seq, key, value):
+        """JSON values stay inline; images, layers and masks go to blob files"""
+        try:
+            json.dumps(value)
+            return value
+        except (TypeError, ValueError):
+            name = f"blob-{seq:06d}-{key}.bin"
+            self._tasks.put(('blob', name, value))
+            return {'$blob': name}
+
+    def _append(self, entry):
+        with self._lock:
+            if self._log.closed:
+                return
+            self._log.write(json.dumps(entry) + '\n')
+            self._log.flush()
+
+    def _run(self):
+        _lower_thread_priority()
+        while True:
+            task = self._tasks.get()
+            try:
+                if task is None:
+                    return
+                kind, name, value = task
+                if kind == 'blob':
+                    write_compressed(os.path.join(self.directory, name), value)
+                else:
+                    self._write_keyframe(name, value)
+            except Exception as e:
+                print(f"Error writing session journal: {e}")
+            finally:
+                self._tasks.task_done()
+
+    def _entry_file(self, image, written):
+        """File holding an undo-stack image, written the first time the image is seen"""
+        from .crop_view import materialize
+
+        known = written.get(id(image)) or self._entry_files.get(id(image))
+        if known is None or known[0]() is not image:
+            self._entry_count += 1
+            filename = f"{ENTRY_PREFIX}{self._entry_count:06d}.bin"
+            write_compressed(os.path.join(self.directory, filename), materialize(image))
+            known = (weakref.ref(image), filename)
+        written[id(image)] = known
+        return known[1]
+
+    def _write_keyframe(self, seq, snapshot):
+        written = {}
+        snapshot = dict(snapshot,
+                        image=self._entry_file(snapshot['image'], written),
+                        history=[self._entry_file(image, written) for image in snapshot.get('history', ())])
+        name = f"keyframe-{seq:06d}.bin"
+        write_compressed(os.path.join(self.directory, name), snapshot)
+        self._append({'seq': seq, 'keyframe': name})
+
+        # Images that left the undo stack are no longer needed either
+        self._entry_files = written
+        referenced = {filename for _, filename in written.values()}
+        for filename in os.listdir(self.directory):
+            if filename.startswith(ENTRY_PREFIX) and filename not in referenced:
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except OSError:
+                    pass
+
+        # Older keyframes and the blobs they cover are no longer needed
+        for filename in os.listdir(self.directory):
+            prefix = filename.split('-', 1)[0]
+            if prefix in ('keyframe', 'blob') and filename != name:
+                try:
+                    if int(filename.split('-')[1].split('.')[0]) <= seq:
+                        os.remove(os.path.join(self.directory, filename))
+                except (ValueError, OSError):
+                    pass
+
+    def flush(self):
+        """Wait until queued keyframes and blobs are on disk"""
+        self._tasks.join()
+
+    def close(self, discard=True):
+        """Stop the writer; a clean exit removes the journal"""
+        self._tasks.put(None)
+        self._worker.join(timeout=10)
+        with self._lock:
+            self._log.close()
+        self._owner_lock.close()
+        if discard:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    @staticmethod
+    def find_recoverable(directory=None):
+        """Journals left by editors that did not exit cleanly, newest first"""
+        base = directory or default_journal_dir()
+        if not os.path.isdir(base):
+            return []
+
+        sessions = []
+        for name in os.listdir(base):
+            path = os.path.join(base, name)
+            journal_path = os.path.join(path, JOURNAL_FILE)
+            try:
+                with open(os.path.join(path, OWNER_FILE), encoding='utf-8') as f:
+                    owner = json.load(f)
+                if _owner_alive(path, int(owner.get('pid', 0))):
+                    continue
+                if os.path.getsize(journal_path) > 0:
+                    sessions.append((os.path.getmtime(journal_path), path))
+            except (OSError, ValueError):
+                continue
+        return [path for _, path in sorted(sessions, reverse=True)]
+
+    @staticmethod
+    def read_entries(session_dir):
+        """Parse the log, ignoring a torn last line"""
+        entries = []
+        with open(os.path.join(session_dir, JOURNAL_FILE), encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    break
+        return entries
+
+    @staticmethod
+    def recover(session_dir, processor):
+        """Restore processor from the newest keyframe plus the operations after it"""
+        entries = SessionJournal.read_entries(session_dir)
+        operations = [entry for entry in entries if 'op' in entry]
+
+        # Restart point: newest keyframe on disk or newest load, whichever is later
+        start_seq, keyframe = 0, None
+        for entry in entries:
+            if 'keyframe' in entry and entry['seq'] >= start_seq and \
+                    os.path.exists(os.path.join(session_dir, entry['keyframe'])):
+                start_seq, keyframe = entry['seq'], entry['keyframe']
+        for entry in operations:
+            if entry['op'] == 'load_image' and entry['seq'] > start_seq:
+                start_seq, keyframe = entry['seq'] - 1, None
+
+        journal, processor.journal = processor.journal, None
+        restored = False
+        try:
+            if keyframe is not None:
+                processor.restore_snapshot(SessionJournal._read_keyframe(session_dir, keyframe))
+                restored = True
+            for entry in operations:
+                if entry['seq'] <= start_seq:
+                    continue
+                try:
+                    args = [SessionJournal._decode(session_dir, value) for value in entry['args']]
+                    kwargs = {key: SessionJournal._decode(session_dir, value)
+                              for key, value in entry['kwargs'].items()}
+                except OSError:
+                    # The blob never reached the disk; stop at the last complete step
+                    break
+                getattr(processor, entry['op'])(*args, **kwargs)
+                restored = True
+        except Exception as e:
+            print(f"Error recovering session: {e}")
+        finally:
+            processor.journal = journal
+        return restored and processor.current_image is not None
+
+    @staticmethod
+    def _read_keyframe(session_dir, keyframe):
+        """Load a keyframe with its undo-stack images (each file is read once)"""
+        snapshot = read_compressed(os.path.join(session_dir, keyframe))
+        images = {}
+
+        def load(filename):
+            if filename not in images:
+                images[filename] = read_compressed(os.path.join(session_dir, filename))
+            return images[filename]
+
+        snapshot['image'] = load(snapshot['image'])
+        snapshot['history'] = [load(filename) for filename in snapshot.get('history', ())]
+        return snapshot
+
+    @staticmethod
+    def _decode(session_dir, value):
+        if isinstance(value, dict) and set(value) == {'$blob'}:
+            return read_compressed(os.path.join(session_dir, value['$blob']))
+        return value
+
+    @staticmethod
+    def discard(session_dir):
+        shutil.rmtree(session_dir, ignore_errors=True)
@@ -0,0 +1,162 @@
+import os
+from typing import Optional
+
+from PIL import Image, ImageDraw, ImageFont
+
+from .layers import Layer, offset_box
+
+
+def _font_manager():
+    """matplotlib.font_manager, imported lazily (None if unavailable)"""
+    try:
+        # Optional but recommended for resolving system font paths by family name
+        import matplotlib.font_manager as fm  # type: ignore
+        return fm
+    except Exception:  # pragma: no cover
+        return None
+
+
+def resolve_font_path(name: str) -> Optional[str]:
+    """Try to resolve a TTF/OTF font path from a family or filename."""
+    if not name:
+        return None
+
+    # If user passed a direct path
+    if os.path.sep in name or name.lower().endswith((".ttf", ".otf")):
+        return name if os.path.exists(name) else None
+
+    # Common Windows fonts location
+    windows_fonts = os.path.join(os.environ.get("WINDIR", "C:\\Windows"), "Fonts")
+    candidates = [
+        os.path.join(windows_fonts, f"{name}.ttf"),
+        os.path.join(windows_fonts, f"{name}.otf"),
+        os.path.join(windows_fonts, f"{name.lower()}.ttf"),
+        os.path.join(windows_fonts, f"{name.lower()}.otf"),
+    ]
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+
+    # Try relative to cwd
+    for ext in (".ttf", ".otf"):
+        local_path = f"{name}{ext}"
+        if os.path.exists(local_path):
+            return local_path
+
+    # Try matplotlib's font lookup if available
+    fm = _font_manager()
+    if fm is not None:
+        try:
+            prop = fm.FontProperties(family=name)
+            font_path = fm.findfont(prop, fallback_to_default=True)
+            if font_path and os.path.exists(font_path):
+                return font_path
+        except Exception:
+            pass
+
+    return None
+
+
+def load_font(font_name, font_size):
+    """Load a scalable font so size is respected, falling back to Pillow's default"""
+    resolved_path = resolve_font_path(font_name)
+    if resolved_path:
+        try:
+            return ImageFont.truetype(resolved_path, int(font_size))
+        except Exception:
+            pass
+
+    # Try a very common bundled font in Pillow
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", int(font_size))
+    except Exception:
+        pass
+
+    # Last resort (bitmap, ignores size but prevents crash)
+    return ImageFont.load_default()
+
+
+class TextLayer(Layer):
+    """Editable text drawn over the image.
+
+    The text is rendered once (outline via ``stroke_width``) into a sprite
+    the size of its bounding box; compositing touches only that region.
+    """
+
+    kind = 'text'
+
+    def __init__(self, text, x, y, font_name="arial", font_size=40, color="#FFFFFF",
+                 outline_color="black", stroke_width=1, **options):
+        options.setdefault('name', text)
+        super().__init__(**options)
+        self.text = text
+        self.x = int(x)
+        self.y = int(y)
+        self.font_name = font_name
+        self.font_size = font_size
+        self.color = color
+        self.outline_color = outline_color
+        self.stroke_width = int(stroke_width)
+        self._reset()
+
+    def _reset(self):
+        self._sprite = None
+        self._bbox = None
+
+    def __getstate__(self):
+        # The sprite is re-rendered on demand
+        state = dict(self.__dict__)
+        state['_sprite'] = state['_bbox'] = None
+        return state
+
+    def params(self):
+        """Text attributes as a dict (round-trips through TextLayer(**params))"""
+        return {
+            'text': self.text, 'x': self.x, 'y': self.y,
+            'font_name': self.font_name, 'font_size': self.font_size,
+            'color': self.color, 'outline_color': self.outline_color,
+            'stroke_width': self.stroke_width,
+        }
+
+    def render_sprite(self):
+        """Render the sprite once: colour image plus coverage mask of the text bounding box"""
+        if self._sprite is not None:
+            return self._sprite
+
+        font = load_font(self.font_name, self.font_size)
+        left, top, right, bottom = font.getbbox(self.text, stroke_width=self.stroke_width)
+        size = (max(1, right - left), max(1, bottom - top))
+        origin = (-left, -top)
+
+        # Coverage of fill plus outline, and of the fill alone
+        mask = Image.new('L', size, 0)
+        ImageDraw.Draw(mask).text(origin, self.text, fill=255, font=font,
+                                  stroke_width=self.stroke_width, stroke_fill=255)
+        fill_mask = Image.new('L', size, 0)
+        ImageDraw.Draw(fill_mask).text(origin, self.text, fill=255, font=font)
+
+        colors = Image.new('RGB', size, self.outline_color)
+        colors.paste(self.color, mask=fill_mask)
+
+        self._bbox = (self.x + left, self.y + top, self.x + left + size[0], self.y + top + size[1])
+        self._sprite = (colors, mask)
+        return self._sprite
+
+    @property
+    def bbox(self):
+        """Canvas (left, top, right, bottom) covered by the text"""
+        self.render_sprite()
+        return self._bbox
+
+    def content_bounds(self, canvas_size):
+        return self.bbox
+
+    def render(self, image, region, origin):
+        colors, mask = self.render_sprite()
+        local = offset_box(region, -self._bbox[0], -self._bbox[1])
+        if local == (0, 0) + colors.size:
+            return colors, mask
+        return colors.crop(local), mask.crop(local)
+
+    def __repr__(self):
+        return f"<TextLayer {self.text!r} at {self.bbox}>"
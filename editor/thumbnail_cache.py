@@ -0,0 +1,113 @@
+import hashlib
+import os
+import threading
+
+from PIL import Image
+
+from .alpha import flatten_alpha
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def default_thumbnail_dir():
+    """Where thumbnails are cached (PHOTO_EDITOR_THUMBNAIL_DIR overrides)"""
+    return os.environ.get('PHOTO_EDITOR_THUMBNAIL_DIR') or os.path.join(
+        os.path.expanduser('~'), '.basic_photo_editor', 'thumbnails')
+
+
+def make_thumbnail(path, max_size):
+    """Thumbnail of an image file, decoding as little as the format allows"""
+    with Image.open(path) as image:
+        # JPEG decodes at 1/2, 1/4 or 1/8 scale straight from the DCT
+        image.draft('RGB', (max_size, max_size))
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        else:
+            image.load()
+        image.thumbnail((max_size, max_size), Image.Resampling.BILINEAR, reducing_gap=2.0)
+    # Cached as JPEG
+    return flatten_alpha(image)
+
+
+class ThumbnailCache:
+    """Thumbnails stored on disk, keyed by path, mtime, file size and thumbnail size.
+
+    An edited or replaced file gets a new key, so stale thumbnails are never
+    served; they age out when the cache grows past ``max_bytes``.
+    """
+
+    def __init__(self, directory=None, max_size=128, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or default_thumbnail_dir()
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def key(self, path):
+        stat = os.stat(path)
+        text = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{self.max_size}"
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.jpg')
+
+    def get(self, path):
+        """Cached thumbnail of path, or None"""
+        try:
+            cached = self._path(self.key(path))
+            thumbnail = Image.open(cached)
+            thumbnail.load()
+            # Mark as recently used for pruning
+            os.utime(cached)
+            return thumbnail
+        except (OSError, ValueError):
+            return None
+
+    def get_or_create(self, path):
+        """Thumbnail of path, generated and stored if it is not cached"""
+        thumbnail = self.get(path)
+        if thumbnail is not None:
+            return thumbnail
+        key = self.key(path)
+        thumbnail = make_thumbnail(path, self.max_size)
+        self.put(key, thumbnail)
+        return thumbnail
+
+    def put(self, key, thumbnail):
+        target = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            temporary = f"{target}.{threading.get_ident()}.part"
+            thumbnail.save(temporary, 'JPEG', quality=85)
+            os.replace(temporary, target)
+        except OSError as e:
+            print(f"Error caching thumbnail: {e}")
+
+    def prune(self):
+        """Delete least recently used thumbnails until the cache fits max_bytes"""
+        with self._lock:
+            files = []
+            total = 0
+            for root, _, names in os.walk(self.directory):
+                for name in names:
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+                    total += stat.st_size
+            removed = 0
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    removed += 1
+                except OSError:
+                    pass
+            return removed
+
+
+# Shared by the filmstrip and anything else that lists images
+thumbnail_cache = ThumbnailCache()
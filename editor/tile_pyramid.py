@@ -0,0 +1,312 @@
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageFile
+
+from .recipe import FORMATS, to_working_mode
+
+LAYOUTS = ('dzi', 'xyz')
+# Bytes per pixel of raw layouts whose rows can be addressed directly
+RAW_BYTES_PER_PIXEL = {
+    'L': 1, 'P': 1, 'RGB': 3, 'BGR': 3, 'RGBA': 4, 'RGBX': 4, 'BGRX': 4, 'BGRA': 4,
+    'I;16': 2, 'I;16B': 2, 'LA': 2,
+}
+
+
+def open_large(path):
+    """Open without the decompression-bomb limit (gigapixel scans exceed it)"""
+    limit = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        return Image.open(path)
+    finally:
+        Image.MAX_IMAGE_PIXELS = limit
+
+
+def _raw_layout(image):
+    """(offset, stride, orientation, rawmode) if rows can be read on their own"""
+    if len(image.tile) != 1:
+        return None
+    tile = image.tile[0]
+    if tile[0] != 'raw' or tuple(tile[1]) != (0, 0) + image.size:
+        return None
+    args = tile[3]
+    if isinstance(args, str):
+        args = (args, 0, 1)
+    rawmode = args[0]
+    stride = args[1] if len(args) > 1 else 0
+    orientation = args[2] if len(args) > 2 else 1
+    if not stride:
+        if rawmode not in RAW_BYTES_PER_PIXEL:
+            return None
+        stride = image.width * RAW_BYTES_PER_PIXEL[rawmode]
+    return tile[2], stride, orientation, rawmode
+
+
+def _read_rows(path, top, bottom, layout):
+    """Decode rows top..bottom of an uncompressed image"""
+    offset, stride, orientation, rawmode = layout
+    image = open_large(path)
+    height = image.height
+    start = offset + (top if orientation >= 0 else height - bottom) * stride
+    image._size = (image.width, bottom - top)
+    if hasattr(image, '_tile_size'):
+        # TIFF allocates its buffer from _tile_size
+        image._tile_size = image._size
+    image.tile = [ImageFile._Tile('raw', (0, 0, image.width, bottom - top), start,
+                                  (rawmode, stride, orientation))]
+    image.load()
+    return image
+
+
+def iter_strips(source, rows=1024):
+    """Yield (top, strip) in working mode, top to bottom.
+
+    Uncompressed TIFF, BMP and PPM files are read strip by strip, so the full
+    image is never in memory. Other formats (JPEG, PNG, compressed TIFF) are
+    single compressed streams that Pillow can only decode whole; they are
+    decoded once and sliced.
+    """
+    if isinstance(source, Image.Image):
+        image = source
+        layout = None
+    else:
+        image = open_large(source)
+        layout = _raw_layout(image)
+    width, height = image.size
+
+    if layout is not None:
+        for top in range(0, height, rows):
+            bottom = min(height, top + rows)
+            yield top, to_working_mode(_read_rows(source, top, bottom, layout), keep_alpha=False)
+        return
+
+    image = to_working_mode(image, keep_alpha=False)
+    for top in range(0, height, rows):
+        yield top, image.crop((0, top, width, min(height, top + rows)))
+
+
+def image_size(source):
+    if isinstance(source, Image.Image):
+        return source.size
+    with open_large(source) as image:
+        return image.size
+
+
+def _vstack(upper, lower):
+    if upper is None:
+        return lower
+    stacked = Image.new(lower.mode, (lower.width, upper.height + lower.height))
+    stacked.paste(upper, (0, 0))
+    stacked.paste(lower, (0, upper.height))
+    return stacked
+
+
+class _Level:
+    """Rows of one pyramid level as they stream in.
+
+    Cuts a row of tiles as soon as its rows (plus overlap) have arrived, and
+    halves received rows two at a time into the next level.
+    """
+
+    def __init__(self, exporter, level, size, smaller):
+        self.exporter = exporter
+        self.level = level
+        self.width, self.height = size
+        self.smaller = smaller
+        self.buffer = None
+        self.buffer_top = 0
+        self.received = 0
+        self.next_row = 0
+        self.pending_half = None
+
+    def feed(self, strip):
+        self.received += strip.height
+        self.buffer = _vstack(self.buffer, strip)
+        self._emit_rows(final=self.received >= self.height)
+
+        if self.smaller is not None:
+            rows = _vstack(self.pending_half, strip)
+            even = rows.height - rows.height % 2
+            final = self.received >= self.height
+            if final:
+                even = rows.height
+            if even:
+                self.smaller.feed(rows.crop((0, 0, rows.width, even)).reduce(2))
+            self.pending_half = rows.crop((0, even, rows.width, rows.height)) if even < rows.height else None
+
+    def _emit_rows(self, final):
+        size, overlap = self.exporter.tile_size, self.exporter.overlap
+        rows = math.ceil(self.height / size)
+        while self.next_row < rows:
+            top = self.next_row * size
+            bottom = min(self.height, top + size)
+            need_bottom = min(self.height, bottom + overlap)
+            if self.received < need_bottom and not final:
+                return
+            read_top = max(0, top - overlap)
+            band = self.buffer.crop((0, read_top - self.buffer_top, self.width, need_bottom - self.buffer_top))
+            self.exporter.cut_row(self.level, self.next_row, band, read_top, top)
+            self.next_row += 1
+            # Rows above the next band's overlap are done with
+            keep_from = max(0, bottom - overlap)
+            if keep_from > self.buffer_top:
+                self.buffer = self.buffer.crop((0, keep_from - self.buffer_top, self.width, self.buffer.height))
+                self.buffer_top = keep_from
+
+
+class TilePyramidExporter:
+    """Deep Zoom (DZI) or XYZ tile pyramid written from streamed strips.
+
+    dzi: <name>.dzi plus <name>_files/<level>/<col>_<row>.<ext>, level 0
+         being 1x1 pixel; edge tiles are cropped and tiles overlap by
+         ``overlap`` pixels as the format allows.
+    xyz: <name>/<z>/<x>/<y>.<ext>, z 0 being the level that fits one tile;
+         edge tiles are padded with the background colour.
+
+    Full-resolution strips are cut into tiles and halved into the next level
+    as they arrive, so memory holds a few strips per level rather than the
+    image. Tiles are encoded on a thread pool with a bounded number in flight,
+    and tiles that are entirely ``background`` are not written (a viewer
+    shows its background there).
+    """
+
+    def __init__(self, output_dir, name='image', layout='dzi', tile_size=256, overlap=None,
+                 format_name='jpg', quality=85, background=(255, 255, 255), workers=None,
+                 strip_rows=1024):
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown tile layout '{layout}', expected one of {LAYOUTS}")
+        self.output_dir = output_dir
+        self.name = name
+        self.layout = layout
+        self.tile_size = tile_size
+        self.overlap = (1 if layout == 'dzi' else 0) if overlap is None else overlap
+        if layout == 'xyz':
+            self.overlap = 0
+        self.extension = format_name.lower().lstrip('.')
+        self.format_name = FORMATS[self.extension]
+        self.quality = quality
+        self.background = tuple(background) if background is not None else None
+        self.workers = workers or os.cpu_count() or 2
+        # Rows per decoded strip, a whole number of tiles
+        self.strip_rows = max(tile_size, strip_rows // tile_size * tile_size)
+        self.stats = {'tiles': 0, 'skipped': 0, 'levels': 0}
+        self._slots = threading.BoundedSemaphore(self.workers * 4)
+        self._executor = None
+        self._errors = []
+
+    def export(self, source):
+        start = time.perf_counter()
+        width, height = image_size(source)
+        sizes = self.level_sizes(width, height)
+        self.stats['levels'] = len(sizes)
+        self._prepare(width, height, sizes)
+
+        levels = {}
+        smaller = None
+        for level in sorted(sizes):
+            levels[level] = smaller = _Level(self, level, sizes[level], smaller)
+        top_level = levels[max(sizes)]
+
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="tile-encode")
+        try:
+            for _, strip in iter_strips(source, self.strip_rows):
+                top_level.feed(strip)
+        finally:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._errors:
+            raise self._errors[0]
+
+        self.stats['seconds'] = round(time.perf_counter() - start, 3)
+        self.stats.update(width=width, height=height)
+        return dict(self.stats)
+
+    def level_sizes(self, width, height):
+        """{level: (width, height)}, the largest level being full resolution"""
+        if self.layout == 'dzi':
+            top = max(0, math.ceil(math.log2(max(width, height))))
+        else:
+            top = max(0, math.ceil(math.log2(max(width, height) / self.tile_size)))
+        return {level: (math.ceil(width / 2 ** (top - level)), math.ceil(height / 2 ** (top - level)))
+                for level in range(top + 1)}
+
+    def _root(self):
+        if self.layout == 'dzi':
+            return os.path.join(self.output_dir, f"{self.name}_files")
+        return os.path.join(self.output_dir, self.name)
+
+    def _prepare(self, width, height, sizes):
+        os.makedirs(self.output_dir, exist_ok=True)
+        for level, (level_width, _) in sizes.items():
+            level_dir = os.path.join(self._root(), str(level))
+            os.makedirs(level_dir, exist_ok=True)
+            if self.layout == 'xyz':
+                for column in range(math.ceil(level_width / self.tile_size)):
+                    os.makedirs(os.path.join(level_dir, str(column)), exist_ok=True)
+
+        if self.layout == 'dzi':
+            descriptor = (
+                '<?xml version="1.0" encoding="UTF-8"?>\n'
+                f'<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" Format="{self.extension}" '
+                f'Overlap="{self.overlap}" TileSize="{self.tile_size}">\n'
+                f'  <Size Width="{width}" Height="{height}"/>\n'
+                '</Image>\n')
+            with open(os.path.join(self.output_dir, f"{self.name}.dzi"), 'w', encoding='utf-8') as f:
+                f.write(descriptor)
+        else:
+            metadata = {'width': width, 'height': height, 'tile_size': self.tile_size,
+                        'min_zoom': min(sizes), 'max_zoom': max(sizes), 'format': self.extension}
+            with open(os.path.join(self._root(), 'metadata.json'), 'w', encoding='utf-8') as f:
+                json.dump(metadata, f, indent=2)
+
+    def cut_row(self, level, row, band, band_top, row_top):
+        """Split one band of rows into tiles and queue them for encoding"""
+        size, overlap = self.tile_size, self.overlap
+        for column in range(math.ceil(band.width / size)):
+            left = column * size
+            box = (max(0, left - overlap), 0, min(band.width, left + size + overlap), band.height)
+            tile = band.crop(box)
+            if self.layout == 'xyz' and tile.size != (size, size):
+                padded = Image.new(tile.mode, (size, size), self.background or (255, 255, 255))
+                padded.paste(tile, (0, 0))
+                tile = padded
+            if self._is_background(tile):
+                self.stats['skipped'] += 1
+                continue
+            if self.layout == 'dzi':
+                path = os.path.join(self._root(), str(level), f"{column}_{row}.{self.extension}")
+            else:
+                path = os.path.join(self._root(), str(level), str(column), f"{row}.{self.extension}")
+            # Blocks once enough tiles are waiting, so encoding paces decoding
+            self._slots.acquire()
+            self._executor.submit(self._write, tile, path).add_done_callback(self._written)
+            self.stats['tiles'] += 1
+
+    def _written(self, future):
+        self._slots.release()
+        if future.exception() is not None:
+            self._errors.append(future.exception())
+
+    def _is_background(self, tile):
+        if self.background is None:
+            return False
+        extrema = tile.getextrema()
+        if tile.mode == 'L':
+            extrema = (extrema,)
+        return all(low == high == value for (low, high), value in zip(extrema, self.background))
+
+    def _write(self, tile, path):
+        options = {'quality': self.quality} if self.format_name in ('JPEG', 'WEBP') else {}
+        tile.save(path, self.format_name, **options)
+
+
+def export_tile_pyramid(source, output_dir, name=None, **options):
+    """Write a DZI or XYZ pyramid of source (a path or an image); returns stats"""
+    if name is None:
+        name = os.path.splitext(os.path.basename(source))[0] if isinstance(source, str) else 'image'
+    return TilePyramidExporter(output_dir, name, **options).export(source)
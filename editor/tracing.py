@@ -0,0 +1,135 @@
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+TRACE_ENV_VAR = 'PHOTO_EDITOR_TRACE'
+
+
+class ChromeTracer:
+    """Opt-in span recorder writing Chrome Trace Event JSON.
+
+    Enable with the PHOTO_EDITOR_TRACE environment variable or the --trace
+    command line flag; open the output in chrome://tracing or ui.perfetto.dev.
+    When disabled, spans cost one attribute check.
+    """
+
+    def __init__(self, max_events=1000000):
+        self.enabled = False
+        self.output_path = None
+        self.max_events = max_events
+        self.events = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+        self._named_threads = set()
+        self._registered_exit = False
+
+    def enable(self, output_path):
+        """Start recording; the trace is written to output_path on exit"""
+        self.output_path = output_path
+        self.enabled = True
+        if not self._registered_exit:
+            atexit.register(self.write)
+            self._registered_exit = True
+
+    def disable(self):
+        self.enabled = False
+
+    def _timestamp(self):
+        return (time.perf_counter() - self._origin) * 1e6
+
+    def _thread_id(self):
+        tid = threading.get_ident()
+        if tid not in self._named_threads:
+            self._named_threads.add(tid)
+            self.events.append({
+                'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': tid,
+                'args': {'name': threading.current_thread().name},
+            })
+        return tid
+
+    def _emit(self, event):
+        with self._lock:
+            if len(self.events) < self.max_events:
+                event['tid'] = self._thread_id()
+                self.events.append(event)
+
+    @contextmanager
+    def span(self, name, category='editor', args=None):
+        """Record the enclosed block as a complete ('X') event"""
+        if not self.enabled:
+            yield
+            return
+        start = self._timestamp()
+        try:
+            yield
+        finally:
+            event = {'name': name, 'cat': category, 'ph': 'X', 'pid': self._pid,
+                     'ts': start, 'dur': self._timestamp() - start}
+            if args:
+                event['args'] = args
+            self._emit(event)
+
+    def instant(self, name, category='editor', args=None):
+        """Record a zero-duration marker"""
+        if not self.enabled:
+            return
+        event = {'name': name, 'cat': category, 'ph': 'i', 's': 't',
+                 'pid': self._pid, 'ts': self._timestamp()}
+        if args:
+            event['args'] = args
+        self._emit(event)
+
+    def write(self, output_path=None):
+        """Write collected events as Chrome Trace Event JSON"""
+        output_path = output_path or self.output_path
+        if not output_path:
+            return False
+        with self._lock:
+            events = list(self.events)
+        try:
+            with open(output_path, 'w', encoding='utf-8') as handle:
+                json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, handle)
+            return True
+        except Exception as e:
+            print(f"Error writing trace: {e}")
+            return False
+
+
+# Shared tracer for the editor and the UI
+tracer = ChromeTracer()
+
+
+def configure_tracing(output_path=None):
+    """Enable tracing from an explicit path or the PHOTO_EDITOR_TRACE variable"""
+    output_path = output_path or os.environ.get(TRACE_ENV_VAR)
+    if output_path:
+        tracer.enable(output_path)
+    return tracer.enabled
+
+
+def traced(category='editor', name=None):
+    """Decorator recording each call of the wrapped function as a span.
+
+    The wrapper keeps the wrapped signature's positional arity so Qt still
+    drops extra signal arguments (e.g. clicked(bool)) for decorated slots.
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+        arg_count = func.__code__.co_argcount
+        has_varargs = bool(func.__code__.co_flags & 0x04)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not has_varargs and len(args) > arg_count:
+                args = args[:arg_count]
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(span_name, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,32 @@
+import importlib
+import threading
+import time
+
+# Modules deferred at startup, in the order they are likely to be needed
+WARMUP_MODULES = (
+    'numpy',
+    'editor.enhanced_adjustments',
+    'editor.enhanced_filters',
+    'matplotlib.font_manager',
+)
+
+
+def warm_up_modules(modules=WARMUP_MODULES):
+    """Import deferred modules; returns {module: seconds or error string}"""
+    timings = {}
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+            timings[name] = time.perf_counter() - start
+        except Exception as e:
+            timings[name] = f"{type(e).__name__}: {e}"
+    return timings
+
+
+def start_background_warmup(modules=WARMUP_MODULES):
+    """Warm deferred modules on a daemon thread after the window is visible"""
+    thread = threading.Thread(target=warm_up_modules, args=(modules,),
+                              name="module-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,332 @@
+import json
+import os
+import select
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from .image_metadata import metadata_cache
+from .instrumentation import current_rss
+from .recipe import FORMATS, RecipeError, apply_recipe, encode, output_format, recipe_key, to_working_mode
+
+INDEX_FILE = '.processed.jsonl'
+# Bytes per pixel held while one file is processed: source, intermediate and result (RGBX)
+BYTES_PER_PIXEL = 3 * 4
+IGNORED_SUFFIXES = ('.tmp', '.part', '.partial', '.crdownload', '.download')
+# Seconds before a file that failed for a possibly transient reason is tried again
+RETRY_SECONDS = 60.0
+
+
+class _InotifyWaker:
+    """Wake the poll loop early when a file in the directory is written (Linux).
+
+    Only a hint: the directory is still scanned, so missed or unavailable
+    events just mean waiting for the next poll.
+    """
+
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_NONBLOCK = 0o4000
+
+    def __init__(self, directory):
+        self.fd = None
+        if not sys.platform.startswith('linux'):
+            return
+        try:
+            import ctypes
+            import ctypes.util
+
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(self.IN_NONBLOCK)
+            if fd < 0:
+                return
+            mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+            if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+                os.close(fd)
+                return
+            self.fd = fd
+        except (OSError, AttributeError):
+            self.fd = None
+
+    def wait(self, timeout):
+        if self.fd is None:
+            time.sleep(timeout)
+            return
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if ready:
+            try:
+                while os.read(self.fd, 65536):
+                    pass
+            except (BlockingIOError, OSError):
+                pass
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class ProcessedIndex:
+    """Append-only record of processed files, keyed by name, size, mtime and recipe"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.entries[entry['key']] = entry
+                    except (ValueError, KeyError):
+                        # Torn last line from an interrupted run
+                        continue
+
+    @staticmethod
+    def key(name, stat, recipe):
+        return f"{name}|{stat.st_size}|{stat.st_mtime_ns}|{recipe}"
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def add(self, key, **fields):
+        entry = dict(fields, key=key, time=round(time.time(), 3))
+        with self._lock:
+            self.entries[key] = entry
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+
+class MemoryGate:
+    """Admit jobs while their estimated memory fits under a ceiling.
+
+    A job is always admitted when nothing else is running, so an image larger
+    than the ceiling is processed on its own rather than never.
+    """
+
+    def __init__(self, limit_bytes):
+        self.limit_bytes = limit_bytes
+        self.reserved = 0
+        self.running = 0
+        self._condition = threading.Condition()
+
+    def _fits(self, nbytes):
+        if self.limit_bytes is None or self.running == 0:
+            return True
+        if self.reserved + nbytes > self.limit_bytes:
+            return False
+        rss = current_rss()
+        # RSS already includes reserved jobs that have started allocating
+        return rss is None or rss + nbytes <= self.limit_bytes
+
+    def acquire(self, nbytes, stop=None):
+        with self._condition:
+            while not self._fits(nbytes):
+                if stop is not None and stop.is_set():
+                    return False
+                self._condition.wait(0.5)
+            self.reserved += nbytes
+            self.running += 1
+            return True
+
+    def release(self, nbytes):
+        with self._condition:
+            self.reserved -= nbytes
+            self.running -= 1
+            self._condition.notify_all()
+
+
+class WatchFolder:
+    """Apply a recipe to every new image dropped into a directory.
+
+    The directory is scanned every ``poll_interval`` seconds (inotify wakes
+    the scan early on Linux). A file is processed once its size and mtime
+    have not changed for ``stable_seconds``; outputs are written atomically
+    to ``output_dir`` by at most ``workers`` threads, admitted only while
+    their estimated memory fits under ``memory_limit``. Finished files go to
+    a processed-file index, so restarting skips work already done - a file
+    is processed again only if it changes or the recipe does. Failures are
+    indexed only when the recipe itself is at fault; anything else (an
+    unreadable or half-written file, a full disk) is retried after
+    ``retry_seconds``.
+    """
+
+    def __init__(self, input_dir, output_dir, steps, format_name=None, quality=None,
+                 workers=2, memory_limit=None, poll_interval=1.0, stable_seconds=2.0,
+                 retry_seconds=RETRY_SECONDS):
+        self.input_dir = os.path.abspath(input_dir)
+        self.output_dir = os.path.abspath(output_dir)
+        if self.output_dir == self.input_dir:
+            raise ValueError("Output directory must differ from the watched directory")
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        self.steps = steps
+        self.recipe = recipe_key(steps)
+        self.format_name = format_name
+        self.quality = quality
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.stable_seconds = stable_seconds
+        self.retry_seconds = retry_seconds
+        self.index = ProcessedIndex(os.path.join(self.output_dir, INDEX_FILE))
+        self.gate = MemoryGate(memory_limit)
+        # name -> (size, mtime_ns, first seen unchanged at)
+        self.candidates = {}
+        self.queued = set()
+        # name -> (size, mtime_ns, monotonic time before which it is not retried)
+        self.retry_after = {}
+        self.stats = {'processed': 0, 'failed': 0, 'skipped': 0}
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="watch-folder")
+
+    def scan(self, now=None):
+        """Names of files that are new to the index and have stopped changing"""
+        now = time.monotonic() if now is None else now
+        ready = []
+        seen = set()
+        try:
+            entries = list(os.scandir(self.input_dir))
+        except OSError as e:
+            print(f"Error scanning {self.input_dir}: {e}")
+            return ready
+
+        for entry in entries:
+            name = entry.name
+            if name.startswith('.') or name.lower().endswith(IGNORED_SUFFIXES):
+                continue
+            if os.path.splitext(name)[1].lower().lstrip('.') not in FORMATS:
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+            except OSError:
+                continue
+            seen.add(name)
+            if name in self.queued:
+                continue
+            key = ProcessedIndex.key(name, stat, self.recipe)
+            if key in self.index:
+                continue
+
+            signature = (stat.st_size, stat.st_mtime_ns)
+            with self._lock:
+                retry = self.retry_after.get(name)
+                if retry is not None and (retry[:2] != signature or now >= retry[2]):
+                    del self.retry_after[name]
+                    retry = None
+            if retry is not None:
+                continue
+            previous = self.candidates.get(name)
+            if previous is None or previous[:2] != signature:
+                # New or still being written: start the stability clock
+                self.candidates[name] = signature + (now,)
+            elif now - previous[2] >= self.stable_seconds and stat.st_size > 0:
+                ready.append((name, key))
+
+        # Files that disappeared before becoming stable
+        for name in list(self.candidates):
+            if name not in seen:
+                del self.candidates[name]
+        with self._lock:
+            for name in list(self.retry_after):
+                if name not in seen:
+                    del self.retry_after[name]
+        return ready
+
+    def submit(self, name, key):
+        with self._lock:
+            self.queued.add(name)
+            self.candidates.pop(name, None)
+        return self._executor.submit(self._process, name, key)
+
+    def _process(self, name, key):
+        source = os.path.join(self.input_dir, name)
+        estimate = 0
+        admitted = False
+        try:
+            metadata = metadata_cache.get(source)
+            if metadata is None:
+                raise ValueError(f"cannot identify image file '{source}'")
+            estimate = metadata.pixels * BYTES_PER_PIXEL
+            admitted = self.gate.acquire(estimate, self._stop)
+            if not admitted:
+                return False
+
+            format_name = self.format_name or output_format(os.path.splitext(name)[1])
+            extension = next(ext for ext, fmt in FORMATS.items() if fmt == format_name)
+            output_name = os.path.splitext(name)[0] + '.' + extension
+            image = apply_recipe(to_working_mode(Image.open(source)), self.steps)
+            data = encode(image, format_name, self.quality)
+            del image
+
+            target = os.path.join(self.output_dir, output_name)
+            temporary = target + '.part'
+            with open(temporary, 'wb') as f:
+                f.write(data)
+            os.replace(temporary, target)
+            self.index.add(key, source=name, output=output_name, status='ok')
+            self._count('processed')
+            print(f"Processed {name} -> {output_name}")
+            return True
+        except RecipeError as e:
+            # The recipe cannot apply to this file; recorded so it is not retried until either changes
+            self.index.add(key, source=name, status='error', error=str(e))
+            self._count('failed')
+            print(f"Error processing {name}: {e}")
+            return False
+        except Exception as e:
+            # Possibly transient (file still being written, disk full, worker killed): retry later
+            try:
+                stat = os.stat(source)
+                with self._lock:
+                    self.retry_after[name] = (stat.st_size, stat.st_mtime_ns, time.monotonic() + self.retry_seconds)
+            except OSError:
+                pass
+            self._count('failed')
+            print(f"Error processing {name} (retrying in {self.retry_seconds:.0f} s): {e}")
+            return False
+        finally:
+            if admitted:
+                self.gate.release(estimate)
+            with self._lock:
+                self.queued.discard(name)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def run(self, once=False):
+        """Watch until stop() (or, with once=True, until existing files are done)"""
+        waker = _InotifyWaker(self.input_dir)
+        print(f"Watching {self.input_dir} -> {self.output_dir} "
+              f"({self.workers} workers{', inotify' if waker.fd is not None else ''})")
+        try:
+            while not self._stop.is_set():
+                futures = [self.submit(name, key) for name, key in self.scan()]
+                if once:
+                    for future in futures:
+                        future.result()
+                    if not self.candidates:
+                        break
+                    # Wait for files still settling
+                    time.sleep(min(self.poll_interval, self.stable_seconds))
+                    continue
+                waker.wait(self.poll_interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            waker.close()
+            self.stop()
+
+    def stop(self):
+        self._stop.set()
+        self._executor.shutdown(wait=True, cancel_futures=True)
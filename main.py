@@ -1,13 +1,198 @@
+import argparse
 import sys
-from PyQt6.QtWidgets import QApplication
-from PyQt6.QtCore import Qt
-from ui.enhanced_main_window import EnhancedMainWindow
+from editor.tracing import configure_tracing
+from editor.memory_manager import memory_manager
+
+def parse_args(argv):
+    """Parse editor options; unknown arguments are left for Qt"""
+    parser = argparse.ArgumentParser(description="Enhanced Photo Editor")
+    parser.add_argument('--trace', metavar='PATH',
+                        help="Record a Chrome trace (JSON) of the session to PATH "
+                             "(or set PHOTO_EDITOR_TRACE)")
+    parser.add_argument('--memory-budget', type=int, metavar='MB',
+                        help="Memory for open documents before idle ones are moved to a "
+                             "scratch cache (or set PHOTO_EDITOR_MEMORY_BUDGET_MB)")
+    parser.add_argument('--no-journal', action='store_true',
+                        help="Disable the crash-recovery session journal")
+    parser.add_argument('--serve', type=int, nargs='?', const=8765, metavar='PORT',
+                        help="Run the HTTP render service on localhost (default port 8765) "
+                             "instead of the editor")
+    parser.add_argument('--workers', type=int, metavar='N',
+                        help="Render service worker processes (default: one per CPU) "
+                             "or watch-folder worker threads (default 2)")
+    parser.add_argument('--watch', metavar='DIR',
+                        help="Process every new image dropped into DIR with --recipe "
+                             "instead of opening the editor")
+    parser.add_argument('--output', metavar='DIR', help="Where --watch writes results")
+    parser.add_argument('--recipe', metavar='FILE',
+                        help="JSON list of filter/adjustment/transform steps for --watch")
+    parser.add_argument('--format', metavar='EXT',
+                        help="Output format for --watch/--batch (default: same as the input) "
+                             "or --tiles (default jpg)")
+    parser.add_argument('--memory-limit', type=int, metavar='MB',
+                        help="Memory ceiling for --watch; files wait until they fit")
+    parser.add_argument('--batch', metavar='DIR',
+                        help="Apply --recipe to every image in DIR through a decode/process/encode "
+                             "pipeline, writing to --output")
+    parser.add_argument('--stage-workers', metavar='D,P,E',
+                        help="Decode, process and encode workers for --batch (default 2,CPUs,2)")
+    parser.add_argument('--renditions', nargs='+', metavar='FILE',
+                        help="Export each FILE at several sizes to --output, decoding it once")
+    parser.add_argument('--sizes', default='full,2048,1024,512,256',
+                        help="Long-edge sizes for --renditions (default full,2048,1024,512,256)")
+    parser.add_argument('--formats', default='jpg,webp',
+                        help="Formats for --renditions (default jpg,webp)")
+    parser.add_argument('--tiles', metavar='FILE',
+                        help="Write a zoomable tile pyramid of FILE to --output without "
+                             "loading the whole image (uncompressed TIFF/BMP/PPM are streamed)")
+    parser.add_argument('--tile-layout', choices=('dzi', 'xyz'), default='dzi',
+                        help="Deep Zoom (<name>.dzi + <name>_files/) or <name>/z/x/y tiles")
+    parser.add_argument('--tile-size', type=int, default=256, metavar='PX')
+    parser.add_argument('--once', action='store_true',
+                        help="With --watch, process the files present and exit")
+    return parser.parse_known_args(argv[1:])
+
+def run_watch_folder(args):
+    """Headless watch-folder mode"""
+    from editor.recipe import RecipeError, load_recipe, output_format
+    from editor.watch_folder import WatchFolder
+    
+    if not args.output or not args.recipe:
+        print("Error: --watch needs --output and --recipe")
+        return 2
+    try:
+        steps = load_recipe(args.recipe)
+        format_name = output_format(args.format, default=None)
+        watcher = WatchFolder(args.watch, args.output, steps, format_name,
+                              workers=args.workers or 2,
+                              memory_limit=args.memory_limit * 1024 * 1024 if args.memory_limit else None)
+    except (OSError, RecipeError, ValueError) as e:
+        print(f"Error starting watch folder: {e}")
+        return 2
+    watcher.run(once=args.once)
+    return 0
+
+def run_batch(args):
+    """Headless batch mode"""
+    import os
+    from editor.recipe import FORMATS, RecipeError, load_recipe, output_format
+    from editor.pipeline import recipe_pipeline
+    
+    if not args.output or not args.recipe:
+        print("Error: --batch needs --output and --recipe")
+        return 2
+    try:
+        steps = load_recipe(args.recipe)
+        format_name = output_format(args.format, default=None)
+        workers = (2, None, 2)
+        if args.stage_workers:
+            workers = tuple(int(value) for value in args.stage_workers.split(','))
+            if len(workers) != 3:
+                raise ValueError("--stage-workers takes three numbers, e.g. 2,4,2")
+        os.makedirs(args.output, exist_ok=True)
+        names = sorted(name for name in os.listdir(args.batch)
+                       if os.path.splitext(name)[1].lower().lstrip('.') in FORMATS)
+    except (OSError, RecipeError, ValueError) as e:
+        print(f"Error starting batch: {e}")
+        return 2
+    
+    jobs = []
+    for name in names:
+        extension = os.path.splitext(name)[1]
+        if format_name:
+            extension = '.' + next(ext for ext, fmt in FORMATS.items() if fmt == format_name)
+        jobs.append((os.path.join(args.batch, name),
+                     os.path.join(args.output, os.path.splitext(name)[0] + extension)))
+    
+    # Largest images first so a big one does not finish the batch alone
+    from editor.image_metadata import metadata_cache
+    jobs.sort(key=lambda job: -(metadata_cache.get(job[0]).pixels if metadata_cache.get(job[0]) else 0))
+    
+    pipeline = recipe_pipeline(steps, format_name, workers=workers)
+    failed = 0
+    for (source, _), _, error in pipeline.run(jobs):
+        if error is not None:
+            failed += 1
+            print(f"Error processing {source}: {error}")
+    print(pipeline.summary())
+    return 1 if failed else 0
+
+def run_renditions(args):
+    """Headless multi-size export"""
+    from editor.recipe import RecipeError, load_recipe
+    from editor.renditions import export_renditions
+    
+    if not args.output:
+        print("Error: --renditions needs --output")
+        return 2
+    try:
+        sizes = [None if value == 'full' else int(value) for value in args.sizes.split(',')]
+        formats = args.formats.split(',')
+        steps = load_recipe(args.recipe) if args.recipe else None
+    except (OSError, RecipeError, ValueError) as e:
+        print(f"Error starting export: {e}")
+        return 2
+    
+    failed = 0
+    for path in args.renditions:
+        try:
+            manifest = export_renditions(path, args.output, sizes, formats, steps=steps,
+                                         workers=args.workers)
+            timings = ", ".join(f"{key[:-3]} {value:.0f} ms" for key, value in manifest['timings'].items())
+            print(f"{path}: {len(manifest['outputs'])} files ({timings})")
+        except Exception as e:
+            failed += 1
+            print(f"Error exporting {path}: {e}")
+    return 1 if failed else 0
+
+def run_tiles(args):
+    """Headless tile pyramid export"""
+    from editor.tile_pyramid import export_tile_pyramid
+    
+    if not args.output:
+        print("Error: --tiles needs --output")
+        return 2
+    try:
+        stats = export_tile_pyramid(args.tiles, args.output, layout=args.tile_layout,
+                                    tile_size=args.tile_size, format_name=args.format or 'jpg',
+                                    workers=args.workers)
+    except Exception as e:
+        print(f"Error exporting tiles: {e}")
+        return 1
+    print(f"{stats['width']}x{stats['height']}: {stats['levels']} levels, {stats['tiles']} tiles written, "
+          f"{stats['skipped']} background tiles skipped in {stats['seconds']:.2f} s")
+    return 0
 
 def main():
     # Enable high DPI support (PyQt6 handles this automatically)
     # The old attributes are deprecated in PyQt6
     
-    app = QApplication(sys.argv)
+    args, qt_args = parse_args(sys.argv)
+    configure_tracing(args.trace)
+    if args.memory_budget:
+        memory_manager.budget_bytes = args.memory_budget * 1024 * 1024
+    
+    if args.serve is not None:
+        # Headless: no Qt needed
+        from editor.render_service import run_service
+        run_service(port=args.serve, workers=args.workers)
+        return
+    
+    if args.watch:
+        sys.exit(run_watch_folder(args))
+    if args.batch:
+        sys.exit(run_batch(args))
+    if args.renditions:
+        sys.exit(run_renditions(args))
+    if args.tiles:
+        sys.exit(run_tiles(args))
+    
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtCore import QTimer
+    from editor.warmup import start_background_warmup
+    from ui.enhanced_main_window import EnhancedMainWindow
+    
+    app = QApplication(sys.argv[:1] + qt_args)
     
     # Set application properties
     app.setApplicationName("Enhanced Photo Editor")
@@ -18,6 +203,13 @@ def main():
     window = EnhancedMainWindow()
     window.show()
     
+    # Offer crash recovery and start journaling once the window is up
+    if not args.no_journal:
+        QTimer.singleShot(0, window.start_session_journal)
+    
+    # Import heavy modules (NumPy, filters, matplotlib) once the window is up
+    QTimer.singleShot(0, start_background_warmup)
+    
     # Start event loop
     sys.exit(app.exec())
 
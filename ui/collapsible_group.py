@@ -0,0 +1,56 @@
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QToolButton
+from PyQt6.QtCore import Qt, pyqtSignal
+
+
+class CollapsibleGroup(QWidget):
+    """Group header whose content widget is built on first expand"""
+
+    # Emitted once with the freshly built content widget
+    content_created = pyqtSignal(QWidget)
+
+    def __init__(self, title, factory, expanded=False, parent=None):
+        super().__init__(parent)
+        self.factory = factory
+        self.content = None
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+
+        self.header = QToolButton()
+        self.header.setText(title)
+        self.header.setCheckable(True)
+        self.header.setToolButtonStyle(Qt.ToolButtonStyle.ToolButtonTextBesideIcon)
+        self.header.setStyleSheet("QToolButton { border: none; font-weight: bold; }")
+        self.header.toggled.connect(self.set_expanded)
+        layout.addWidget(self.header)
+
+        self.set_expanded(expanded)
+
+    def is_created(self):
+        """Check if the content widget exists yet"""
+        return self.content is not None
+
+    def is_expanded(self):
+        return self.header.isChecked()
+
+    def ensure_created(self):
+        """Build the content widget if needed and return it"""
+        if self.content is None:
+            self.content = self.factory()
+            self.layout().addWidget(self.content)
+            self.content.setVisible(self.header.isChecked())
+            self.content_created.emit(self.content)
+        return self.content
+
+    def set_expanded(self, expanded):
+        """Expand (creating content on first use) or collapse the group"""
+        if self.header.isChecked() != expanded:
+            # Re-enters through toggled
+            self.header.setChecked(expanded)
+            return
+        self.header.setArrowType(Qt.ArrowType.DownArrow if expanded else Qt.ArrowType.RightArrow)
+        if expanded:
+            self.ensure_created().setVisible(True)
+        elif self.content is not None:
+            self.content.setVisible(False)
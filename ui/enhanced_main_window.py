@@ -1,14 +1,31 @@
+import os
 import sys
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QSplitter, QStatusBar, QMessageBox, QFileDialog,
-                             QPushButton, QSlider, QLabel)
-from PyQt6.QtCore import Qt, QRect, QPoint
+                             QPushButton, QSlider, QLabel, QDockWidget, QTabBar,
+                             QInputDialog, QColorDialog)
+from PyQt6.QtCore import Qt, QRect, QPoint, QTimer
 from PyQt6.QtGui import QPixmap, QPainter, QPen, QColor, QImage
+from PIL import Image
 
 from .menu_bar import MenuBar
 from .enhanced_tool_panel import EnhancedToolPanel
 from .status_bar import StatusBar
+from .performance_dialog import PerformanceLogDialog
+from .qt_image import pil_to_pixmap, orientation_transform
+from .filter_gallery import FilterGallery
+from .filmstrip import Filmstrip
+from .layers_panel import LayersPanel
 from editor.enhanced_image_processor import EnhancedImageProcessor
+from editor.crop_view import CropView
+from editor.selection_masks import SelectionMask
+from editor.image_metadata import TRANSPOSED_ORIENTATIONS
+from editor.instrumentation import performance_monitor
+from editor.tracing import traced, tracer
+from editor.session_journal import SessionJournal
+from editor.memory_manager import memory_manager
+from editor.memory_governor import memory_governor
+from editor.prefetch import image_prefetcher
 
 class EnhancedImageViewer(QWidget):
     def __init__(self, parent=None):
@@ -20,6 +37,11 @@ class EnhancedImageViewer(QWidget):
         self.pixmap = None
         self.scaled_pixmap = None
         self.image_rect = None
+        # Lazy crops are drawn as a source rectangle of the parent pixmap
+        self.source_image = None
+        self.source_rect = None
+        # EXIF orientation applied when drawing (the pixmap keeps the stored pixels)
+        self.orientation = 1
         # zoom_factor is relative to 'fit' (1.0 = fit to canvas)
         self.zoom_factor = 1.0
         self.fit_scale = 1.0
@@ -33,20 +55,18 @@ class EnhancedImageViewer(QWidget):
         self.crop_mode = False
         self.text_start_point = None
         self.pending_text = None
+        # Mask tool: shape being drawn, brush radius in image pixels, stroke in canvas coordinates
+        self.mask_mode = None
+        self.mask_radius = 0
+        self.mask_points = []
         
         # Mouse tracking
         self.setMouseTracking(True)
         
-    def set_image(self, pil_image):
+    def set_image(self, pil_image, orientation=1):
         if pil_image:
-            # Convert PIL image to QPixmap
-            if pil_image.mode == "RGBA":
-                pil_image = pil_image.convert("RGB")
-            
-            # Convert PIL image to QImage
-            data = pil_image.convert("RGBA").tobytes("raw", "RGBA")
-            qimage = QImage(data, pil_image.size[0], pil_image.size[1], QImage.Format.Format_RGBA8888)
-            self.pixmap = QPixmap.fromImage(qimage)
+            self.orientation = orientation
+            self._set_source(pil_image)
             # Reset zoom to fit on new image
             self.zoom_factor = 1.0
             self.scale_image()
@@ -54,26 +74,68 @@ class EnhancedImageViewer(QWidget):
             self.pixmap = None
             self.scaled_pixmap = None
             self.image_rect = None
+            self.source_image = None
+            self.source_rect = None
         self.update()
     
-    def set_preview_image(self, pil_image):
+    def set_preview_image(self, pil_image, orientation=1):
         """Set preview image without affecting zoom"""
         if pil_image:
-            if pil_image.mode == "RGBA":
-                pil_image = pil_image.convert("RGB")
-            
-            data = pil_image.convert("RGBA").tobytes("raw", "RGBA")
-            qimage = QImage(data, pil_image.size[0], pil_image.size[1], QImage.Format.Format_RGBA8888)
-            self.pixmap = QPixmap.fromImage(qimage)
+            self.orientation = orientation
+            self._set_source(pil_image)
             self.scale_image()
             self.update()
     
+    @traced('viewer')
+    def _set_source(self, pil_image):
+        """Convert to QPixmap, reusing the parent pixmap for lazy crop views"""
+        box = None
+        if isinstance(pil_image, CropView):
+            box = pil_image.box
+            pil_image = pil_image.parent
+        
+        # Plain images may be composites updated in place, so only views reuse the pixmap
+        if box is None or pil_image is not self.source_image or self.pixmap is None:
+            self.pixmap = self.pil_to_pixmap(pil_image)
+            self.source_image = pil_image
+        self.source_rect = QRect(box[0], box[1], box[2] - box[0], box[3] - box[1]) if box else None
+    
+    @traced('viewer')
+    def update_tiles(self, pil_image, boxes):
+        """Repaint only the given tiles of the image already on display"""
+        if pil_image is not self.source_image or self.pixmap is None or self.source_rect is not None:
+            self.set_image(pil_image)
+            return
+        if not boxes:
+            return
+        
+        painter = QPainter(self.pixmap)
+        for box in boxes:
+            painter.drawPixmap(box[0], box[1], self.pil_to_pixmap(pil_image.crop(box)))
+        painter.end()
+        self.scale_image()
+        self.update()
+    
+    pil_to_pixmap = staticmethod(pil_to_pixmap)
+    
+    def source_size(self):
+        """Size of the displayed image (the crop rectangle for lazy views), upright"""
+        if self.source_rect is not None:
+            width, height = self.source_rect.width(), self.source_rect.height()
+        else:
+            width, height = self.pixmap.width(), self.pixmap.height()
+        if self.orientation in TRANSPOSED_ORIENTATIONS:
+            return height, width
+        return width, height
+    
+    @traced('viewer')
     def scale_image(self):
         if self.pixmap:
             # Calculate scaled size based on zoom relative to fit
             canvas_size = self.size()
-            img_w = max(1, self.pixmap.width())
-            img_h = max(1, self.pixmap.height())
+            src_w, src_h = self.source_size()
+            img_w = max(1, src_w)
+            img_h = max(1, src_h)
 
             # Compute fit scale to keep entire image visible
             self.fit_scale = min(canvas_size.width() / img_w, canvas_size.height() / img_h)
@@ -86,11 +148,18 @@ class EnhancedImageViewer(QWidget):
             scaled_width = max(1, int(img_w * composite_scale))
             scaled_height = max(1, int(img_h * composite_scale))
 
-            scaled_pixmap = self.pixmap.scaled(
+            source_pixmap = self.pixmap.copy(self.source_rect) if self.source_rect is not None else self.pixmap
+            if self.orientation in TRANSPOSED_ORIENTATIONS:
+                scaled_width, scaled_height = scaled_height, scaled_width
+            scaled_pixmap = source_pixmap.scaled(
                 scaled_width, scaled_height,
                 Qt.AspectRatioMode.KeepAspectRatio,
                 Qt.TransformationMode.SmoothTransformation
             )
+            transform = orientation_transform(self.orientation)
+            if transform is not None:
+                # Rotate the screen-sized pixmap rather than the full image
+                scaled_pixmap = scaled_pixmap.transformed(transform)
 
             self.scaled_pixmap = scaled_pixmap
 
@@ -103,6 +172,7 @@ class EnhancedImageViewer(QWidget):
         super().resizeEvent(event)
         self.scale_image()
     
+    @traced('viewer')
     def paintEvent(self, event):
         super().paintEvent(event)
         painter = QPainter(self)
@@ -115,6 +185,32 @@ class EnhancedImageViewer(QWidget):
             pen = QPen(QColor("red") if not self.text_mode else QColor("green"), 2)
             painter.setPen(pen)
             painter.drawRect(self.current_rect)
+        
+        if self.mask_mode and self.mask_points:
+            self.paint_mask_stroke(painter)
+    
+    def paint_mask_stroke(self, painter):
+        """Outline of the mask being drawn"""
+        start, end = self.mask_points[0], self.mask_points[-1]
+        painter.setPen(QPen(QColor("yellow"), 2))
+        if self.mask_mode == 'rectangle':
+            painter.drawRect(QRect(start, end).normalized())
+        elif self.mask_mode == 'ellipse':
+            painter.drawEllipse(QRect(start, end).normalized())
+        elif self.mask_mode == 'gradient':
+            # Fully selected at the start, fading out towards the end
+            painter.drawLine(start, end)
+            painter.drawEllipse(start, 4, 4)
+        else:
+            scale = self.image_rect.width() / max(1, self.source_size()[0])
+            pen = QPen(QColor(255, 255, 0, 96), max(1, int(self.mask_radius * 2 * scale)))
+            pen.setCapStyle(Qt.PenCapStyle.RoundCap)
+            pen.setJoinStyle(Qt.PenJoinStyle.RoundJoin)
+            painter.setPen(pen)
+            if len(self.mask_points) == 1:
+                painter.drawPoint(start)
+            else:
+                painter.drawPolyline(*self.mask_points)
     
     def mousePressEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton and self.image_rect:
@@ -137,10 +233,19 @@ class EnhancedImageViewer(QWidget):
                 elif self.crop_mode:
                     # Only start crop selection if crop mode is active
                     self.start_point = pos
+                elif self.mask_mode:
+                    self.mask_points = [pos]
                 self.current_rect = None
                 self.update()
     
     def mouseMoveEvent(self, event):
+        if self.mask_mode and self.mask_points:
+            if self.mask_mode == 'brush':
+                self.mask_points.append(event.pos())
+            else:
+                self.mask_points[1:] = [event.pos()]
+            self.update()
+            return
         if self.start_point and self.image_rect and self.crop_mode:
             pos = event.pos()
             if self.image_rect.contains(pos):
@@ -148,6 +253,14 @@ class EnhancedImageViewer(QWidget):
                 self.update()
     
     def mouseReleaseEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton and self.mask_mode and self.mask_points:
+            points = [self.get_image_coordinates(point) for point in self.mask_points]
+            self.mask_points = []
+            self.update()
+            main_window = self.window()
+            if hasattr(main_window, 'apply_mask_stroke'):
+                main_window.apply_mask_stroke([(point.x(), point.y()) for point in points])
+            return
         if event.button() == Qt.MouseButton.LeftButton and self.image_rect and self.start_point and self.crop_mode:
             pos = event.pos()
             if self.image_rect.contains(pos):
@@ -173,8 +286,9 @@ class EnhancedImageViewer(QWidget):
         rel_y = (canvas_pos.y() - self.image_rect.y()) / self.image_rect.height()
         
         # Convert to original image coordinates
-        img_x = int(rel_x * self.pixmap.width())
-        img_y = int(rel_y * self.pixmap.height())
+        src_w, src_h = self.source_size()
+        img_x = int(rel_x * src_w)
+        img_y = int(rel_y * src_h)
         
         return QPoint(img_x, img_y)
     
@@ -182,6 +296,7 @@ class EnhancedImageViewer(QWidget):
         """Set text mode with pending text information"""
         self.text_mode = True
         self.crop_mode = False
+        self.set_mask_mode(None)
         self.pending_text = text_info
         self.setCursor(Qt.CursorShape.CrossCursor)
     
@@ -190,6 +305,7 @@ class EnhancedImageViewer(QWidget):
         self.crop_mode = enabled
         self.text_mode = False
         if enabled:
+            self.set_mask_mode(None)
             self.setCursor(Qt.CursorShape.CrossCursor)
         else:
             self.setCursor(Qt.CursorShape.ArrowCursor)
@@ -197,6 +313,21 @@ class EnhancedImageViewer(QWidget):
             self.current_rect = None
             self.update()
     
+    def set_mask_mode(self, shape, radius=0):
+        """Draw a 'rectangle', 'ellipse', 'gradient' or 'brush' mask (None to stop)"""
+        self.mask_mode = shape
+        self.mask_radius = radius
+        self.mask_points = []
+        if shape:
+            self.crop_mode = False
+            self.text_mode = False
+            self.start_point = None
+            self.current_rect = None
+            self.setCursor(Qt.CursorShape.CrossCursor)
+        elif not self.crop_mode and not self.text_mode:
+            self.setCursor(Qt.CursorShape.ArrowCursor)
+        self.update()
+    
     def wheelEvent(self, event):
         """Handle mouse wheel events for zooming"""
         if event.modifiers() == Qt.KeyboardModifier.ControlModifier:
@@ -248,6 +379,20 @@ class EnhancedMainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.image_processor = EnhancedImageProcessor()
+        # Open documents, one per tab; image_processor is the active one
+        self.documents = [self.image_processor]
+        memory_manager.register(self.image_processor)
+        # Created on first use
+        self.filter_gallery = None
+        self.filter_gallery_dock = None
+        self.filmstrip = None
+        self.filmstrip_dock = None
+        # Crash-recovery journal, started by start_session_journal()
+        self.journal = None
+        # (shape, size, callback) waiting for a mask to be drawn on the canvas
+        self.pending_mask = None
+        self.layers_panel = None
+        self.layers_panel_dock = None
         self.init_ui()
         self.connect_signals()
         
@@ -280,6 +425,14 @@ class EnhancedMainWindow(QMainWindow):
         right_layout = QVBoxLayout(right_container)
         right_layout.setContentsMargins(0, 0, 0, 0)
         
+        # Document tabs share the viewer below
+        self.document_tabs = QTabBar()
+        self.document_tabs.setTabsClosable(True)
+        self.document_tabs.setDocumentMode(True)
+        self.document_tabs.setExpanding(False)
+        self.document_tabs.addTab("Untitled")
+        right_layout.addWidget(self.document_tabs)
+        
         # Zoom controls at the top
         self.zoom_controls = self.create_zoom_controls()
         right_layout.addWidget(self.zoom_controls)
@@ -363,6 +516,7 @@ class EnhancedMainWindow(QMainWindow):
         
         return zoom_widget
     
+    @traced('ui')
     def on_zoom_slider_changed(self, value):
         """Handle zoom slider changes"""
         self.zoom_percentage_label.setText(f"{value}%")
@@ -373,25 +527,54 @@ class EnhancedMainWindow(QMainWindow):
         # Menu bar signals
         self.menu_bar.open_image.connect(self.open_image)
         self.menu_bar.save_image.connect(self.save_image)
+        self.menu_bar.export_renditions.connect(self.export_renditions)
+        self.menu_bar.next_image.connect(lambda: self.step_image(1))
+        self.menu_bar.previous_image.connect(lambda: self.step_image(-1))
         self.menu_bar.reset_image.connect(self.reset_image)
+        self.menu_bar.show_performance_log.connect(self.show_performance_log)
+        
+        # Latest operation timing in the status bar
+        performance_monitor.add_listener(self.status_bar.report_performance)
         
         # Tool panel signals
         self.tool_panel.filter_applied.connect(self.apply_filter)
         self.tool_panel.adjustment_applied.connect(self.apply_adjustment)
         self.tool_panel.adjustment_preview.connect(self.preview_adjustments)
         self.tool_panel.transform_applied.connect(self.apply_transform)
+        self.tool_panel.straighten_preview.connect(self.preview_straighten)
+        self.tool_panel.transforms_commit_requested.connect(self.commit_transforms)
         self.tool_panel.text_added.connect(self.start_add_text)
+        self.tool_panel.text_edit_requested.connect(self.edit_text_layer)
+        self.tool_panel.text_remove_requested.connect(self.remove_text_layer)
+        self.tool_panel.local_adjustment_requested.connect(self.start_local_adjustment)
+        self.tool_panel.layers_panel_requested.connect(self.show_layers_panel)
         self.tool_panel.file_open_requested.connect(lambda: self.open_image())
         self.tool_panel.file_save_requested.connect(lambda: self.save_image())
         self.tool_panel.file_reset_requested.connect(self.reset_image)
         self.tool_panel.crop_requested.connect(self.start_crop)
+        self.tool_panel.filter_gallery_requested.connect(self.show_filter_gallery)
+        
+        # Memory governor: poll periodically and after every edit
+        memory_governor.add_listener(self.status_bar.update_memory)
+        self.memory_timer = QTimer(self)
+        self.memory_timer.setInterval(2000)
+        self.memory_timer.timeout.connect(memory_governor.check)
+        self.memory_timer.start()
+        
+        # Document tabs
+        self.document_tabs.currentChanged.connect(self.switch_document)
+        self.document_tabs.tabCloseRequested.connect(self.close_document)
         # Zoom signals (now connected to the zoom controls at the top)
         # Note: Zoom controls are now in the main window, not tool panel
         
         # Remove legacy direct method assignments; signals are used instead
         
-    def open_image(self, file_path=None):
-        """Open image file"""
+    @traced('ui')
+    def open_image(self, file_path=None, browse=False):
+        """Open image file
+        
+        browse: stepping through a folder; replaces the current document if it has no edits
+        """
         if file_path is None:
             file_path, _ = QFileDialog.getOpenFileName(
                 self, "Open Image", "", 
@@ -400,29 +583,147 @@ class EnhancedMainWindow(QMainWindow):
         
         if file_path:
             try:
-                if self.image_processor.load_image(file_path):
-                    self.image_viewer.set_image(self.image_processor.get_current_image())
+                # Keep the current document open unless it is still empty
+                processor = self.image_processor
+                unedited = processor.history_index <= 0 and not processor.layers
+                if processor.get_current_view() is not None and not (browse and unedited):
+                    processor = EnhancedImageProcessor()
+                if processor.load_image(file_path):
+                    title = os.path.basename(file_path)
+                    if processor is self.image_processor:
+                        self.document_tabs.setTabText(self.document_tabs.currentIndex(), title)
+                        self.tool_panel.reset_straighten()
+                        self.show_current_image()
+                        self.update_image_info()
+                    else:
+                        self.documents.append(processor)
+                        self.document_tabs.setCurrentIndex(self.document_tabs.addTab(title))
+                    self.document_tabs.setTabToolTip(self.document_tabs.currentIndex(), file_path)
+                    self.show_filmstrip(file_path)
                     self.status_bar.update_status(f"Loaded: {file_path}")
-                    
-                    # Update image info in status bar
-                    image_info = self.image_processor.get_image_info()
-                    if image_info:
-                        zoom_percent = self.image_viewer.get_zoom_percentage()
-                        self.status_bar.update_image_info(image_info, zoom_percent)
                 else:
                     QMessageBox.critical(self, "Error", "Could not load image file.")
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Error loading image:\n{e}")
     
+    def show_filmstrip(self, file_path):
+        """Show the folder of file_path in the filmstrip dock, creating it on first use"""
+        if self.filmstrip is None:
+            self.filmstrip = Filmstrip(self)
+            self.filmstrip.image_selected.connect(lambda path: self.open_image(path, browse=True))
+            self.filmstrip_dock = QDockWidget("Filmstrip", self)
+            self.filmstrip_dock.setWidget(self.filmstrip)
+            self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.filmstrip_dock)
+        self.filmstrip_dock.show()
+        self.filmstrip.show_file(file_path)
+    
+    def step_image(self, step):
+        """Open the next (step=1) or previous (step=-1) image of the filmstrip folder"""
+        if self.filmstrip is None:
+            return
+        file_path = self.filmstrip.neighbour(step)
+        if file_path is not None:
+            self.open_image(file_path, browse=True)
+    
+    def update_image_info(self):
+        """Show the active document's size/mode/format in the status bar"""
+        image_info = self.image_processor.get_image_info()
+        zoom_percent = self.image_viewer.get_zoom_percentage() if image_info else None
+        self.status_bar.update_image_info(image_info, zoom_percent)
+    
+    @traced('ui')
+    def switch_document(self, index):
+        """Make the document of a tab active, restoring it from the scratch cache if needed"""
+        if not 0 <= index < len(self.documents):
+            return
+        processor = self.documents[index]
+        switching = processor is not self.image_processor
+        if switching:
+            self.image_processor.cancel_transforms()
+            self.image_processor.journal = None
+        
+        # Restore a spilled document before a keyframe captures it
+        spilled = memory_manager.activate(processor)
+        if switching:
+            if self.journal is not None:
+                # The journal follows the active document; a keyframe marks the switch
+                processor.journal = self.journal
+                self.journal.keyframe(processor)
+            self.image_processor = processor
+        self.tool_panel.reset_straighten()
+        self.show_current_image()
+        self.update_image_info()
+        if spilled:
+            self.status_bar.update_status(f"Moved {len(spilled)} idle document(s) to the scratch cache")
+    
+    @traced('ui')
+    def close_document(self, index):
+        """Close a tab and free its document"""
+        if not 0 <= index < len(self.documents):
+            return
+        processor = self.documents.pop(index)
+        memory_manager.unregister(processor)
+        processor.journal = None
+        if not self.documents:
+            # Always keep one (empty) document
+            self.documents.append(EnhancedImageProcessor())
+            self.document_tabs.addTab("Untitled")
+        self.document_tabs.removeTab(index)
+        if processor is self.image_processor:
+            self.switch_document(self.document_tabs.currentIndex())
+    
+    def show_current_image(self):
+        """Display the processor's current image and refresh dependent views"""
+        current = self.image_processor.get_current_view()
+        tiles = self.image_processor.take_display_updates()
+        if tiles is not None and current is self.image_viewer.source_image:
+            # Only layer tiles changed; keep the pixmap and the zoom
+            self.image_viewer.update_tiles(current, tiles)
+        else:
+            self.image_viewer.set_image(current, self.image_processor.get_view_orientation())
+        if self.filter_gallery_dock is not None and self.filter_gallery_dock.isVisible():
+            self.filter_gallery.set_base_image(current, self.image_processor.get_view_orientation())
+        if self.layers_panel is not None:
+            self.layers_panel.set_layers(self.image_processor.get_layers())
+        # Edits grow the active document; idle ones give way if over budget
+        memory_governor.check()
+        spilled = memory_manager.enforce()
+        if spilled:
+            self.status_bar.update_status(f"Moved {len(spilled)} idle document(s) to the scratch cache")
+    
+    @traced('ui')
+    def show_filter_gallery(self):
+        """Show the filter gallery dock, creating it on first use"""
+        if self.filter_gallery is None:
+            self.filter_gallery = FilterGallery(self)
+            self.filter_gallery.filter_selected.connect(lambda name: self.apply_filter(name, {}))
+            self.filter_gallery_dock = QDockWidget("Filter Gallery", self)
+            self.filter_gallery_dock.setWidget(self.filter_gallery)
+            self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.filter_gallery_dock)
+        self.filter_gallery_dock.show()
+        self.filter_gallery.set_base_image(self.image_processor.get_current_view(),
+                                           self.image_processor.get_view_orientation())
+    
+    @traced('ui')
     def save_image(self, file_path=None):
         """Save current image"""
         if file_path is None:
             file_path, _ = QFileDialog.getSaveFileName(
                 self, "Save Image", "", 
-                "PNG files (*.png);;JPEG files (*.jpg);;BMP files (*.bmp);;All files (*.*)"
+                "PNG files (*.png);;JPEG files (*.jpg);;BMP files (*.bmp);;"
+                "GIF files (*.gif);;WebP files (*.webp);;TIFF files (*.tif *.tiff);;All files (*.*)"
             )
         
         if file_path:
+            if self.image_processor.saves_single_frame(file_path):
+                reply = QMessageBox.question(
+                    self, "Save Animation",
+                    f"This image has {self.image_processor.frame_count()} frames, but "
+                    f"{self.image_processor.replay_blocker()} cannot be applied to every frame.\n"
+                    "Save only the current frame?",
+                    QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+                if reply != QMessageBox.StandardButton.Yes:
+                    return
             try:
                 if self.image_processor.save_image(file_path):
                     self.status_bar.update_status(f"Saved: {file_path}")
@@ -431,45 +732,88 @@ class EnhancedMainWindow(QMainWindow):
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Error saving image:\n{e}")
     
+    @traced('ui')
+    def export_renditions(self, directory):
+        """Export the current image at every rendition size"""
+        from editor.renditions import export_renditions
+        
+        image = self.image_processor.get_current_image()
+        if image is None:
+            return
+        basename = os.path.splitext(os.path.basename(self.image_processor.source_path or 'image'))[0]
+        try:
+            manifest = export_renditions(image, directory, basename=basename)
+            self.status_bar.update_status(
+                f"Exported {len(manifest['outputs'])} renditions to {directory} "
+                f"in {sum(manifest['timings'].values()):.0f} ms")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Error exporting renditions:\n{e}")
+    
+    @traced('ui')
     def reset_image(self):
         """Reset to original image"""
         if self.image_processor.reset_to_original():
-            self.image_viewer.set_image(self.image_processor.get_current_image())
+            self.tool_panel.reset_straighten()
+            self.show_current_image()
             self.status_bar.update_status("Reset to original image")
     
+    @traced('ui')
     def apply_filter(self, filter_name, params=None):
         """Apply filter to current image"""
         if self.image_processor.apply_filter(filter_name, params):
-            self.image_viewer.set_image(self.image_processor.get_current_image())
+            self.show_current_image()
             self.status_bar.update_status(f"Applied filter: {filter_name}")
     
+    @traced('ui')
     def apply_adjustment(self, adjustment_name, value):
         """Apply adjustment to current image"""
         if self.image_processor.apply_adjustment(adjustment_name, value):
-            self.image_viewer.set_image(self.image_processor.get_current_image())
+            self.show_current_image()
             self.status_bar.update_status(f"Applied adjustment: {adjustment_name}")
     
+    @traced('ui')
     def preview_adjustments(self, adjustments):
         """Preview adjustments without modifying the actual image"""
-        if self.image_processor.get_current_image():
+        if self.image_processor.get_current_view():
             preview_image = self.image_processor.get_preview_with_adjustments(adjustments)
             if preview_image:
-                self.image_viewer.set_preview_image(preview_image)
+                self.image_viewer.set_preview_image(preview_image, self.image_processor.get_view_orientation())
     
+    @traced('ui')
     def apply_transform(self, transform_name, params):
-        """Apply transform to current image"""
-        if self.image_processor.apply_transform(transform_name, params):
-            self.image_viewer.set_image(self.image_processor.get_current_image())
-            self.status_bar.update_status(f"Applied transform: {transform_name}")
+        """Queue transform and show a proxy preview until it is committed"""
+        if self.image_processor.queue_transform(transform_name, params):
+            preview_image = self.image_processor.get_transform_preview(
+                self.tool_panel.straighten_angle())
+            if preview_image:
+                self.image_viewer.set_preview_image(preview_image)
+            self.status_bar.update_status(f"Queued transform: {transform_name} (Apply Transforms to commit)")
+    
+    @traced('ui')
+    def preview_straighten(self, angle):
+        """Live proxy preview of the straighten angle on top of queued transforms"""
+        preview_image = self.image_processor.get_transform_preview(angle)
+        if preview_image:
+            self.image_viewer.set_preview_image(preview_image)
     
+    @traced('ui')
+    def commit_transforms(self):
+        """Resample all queued transforms once"""
+        if self.image_processor.commit_transforms():
+            self.show_current_image()
+            self.status_bar.update_status("Applied transforms")
+    
+    @traced('ui')
     def start_crop(self):
         """Start crop tool"""
-        if self.image_processor.get_current_image():
+        if self.image_processor.get_current_view():
+            self.tool_panel.commit_transforms()
             self.image_viewer.set_crop_mode(True)
             self.status_bar.update_status("Crop tool activated - click and drag to select area")
         else:
             QMessageBox.warning(self, "Warning", "Please open an image first!")
     
+    @traced('ui')
     def crop_image(self, start_point, end_point):
         """Crop image based on selected area"""
         left = min(start_point.x(), end_point.x())
@@ -477,38 +821,245 @@ class EnhancedMainWindow(QMainWindow):
         right = max(start_point.x(), end_point.x())
         bottom = max(start_point.y(), end_point.y())
         
-        if self.image_processor.apply_transform('crop', {'box': [left, top, right, bottom]}):
-            self.image_viewer.set_image(self.image_processor.get_current_image())
+        if self.image_processor.crop([left, top, right, bottom]):
+            self.show_current_image()
             self.image_viewer.set_crop_mode(False)  # Exit crop mode after cropping
             self.status_bar.update_status("Image cropped")
     
+    @traced('ui')
     def start_add_text(self, text, x, y, font_name, font_size, color):
         """Start text addition mode"""
-        if self.image_processor.get_current_image():
+        if self.image_processor.get_current_view():
+            self.tool_panel.commit_transforms()
             self.image_viewer.set_crop_mode(False)  # Exit crop mode when starting text tool
             self.image_viewer.set_text_mode((text, font_name, font_size, color))
             self.status_bar.update_status("Text tool activated - click where you want to place text")
         else:
             QMessageBox.warning(self, "Warning", "Please open an image first!")
     
+    @traced('ui')
     def add_text_at_position(self, text, x, y, font_name, font_size, color):
         """Add text at specific position"""
         if self.image_processor.add_text(text, x, y, font_name, font_size, color):
-            self.image_viewer.set_image(self.image_processor.get_current_image())
+            self.show_current_image()
             self.status_bar.update_status("Text added to image")
     
+    def start_mask(self, shape, size, on_mask, action):
+        """Let the user draw a mask on the canvas; on_mask(selection) runs when the stroke ends"""
+        if not self.image_processor.get_current_view():
+            QMessageBox.warning(self, "Warning", "Please open an image first!")
+            return
+        self.tool_panel.commit_transforms()
+        self.pending_mask = (shape, size, on_mask)
+        self.image_viewer.set_mask_mode(shape, size)
+        hint = "click and paint" if shape == 'brush' else "click and drag"
+        self.status_bar.update_status(f"{action}: {hint} to draw the {shape} mask")
+    
+    @traced('ui')
+    def start_local_adjustment(self, shape, size, adjustment_name, value):
+        """Start drawing a mask; the adjustment is applied when the stroke ends"""
+        self.start_mask(shape, size,
+                        lambda selection: self.apply_local_adjustment(adjustment_name, value, selection),
+                        f"Local {adjustment_name}")
+    
+    @traced('ui')
+    def apply_mask_stroke(self, points):
+        """Build the mask from a stroke in image coordinates and hand it on"""
+        self.image_viewer.set_mask_mode(None)
+        if self.pending_mask is None:
+            return
+        shape, size, on_mask = self.pending_mask
+        self.pending_mask = None
+        
+        (x0, y0), (x1, y1) = points[0], points[-1]
+        box = (min(x0, x1), min(y0, y1), max(x0, x1) + 1, max(y0, y1) + 1)
+        if shape == 'brush':
+            selection = SelectionMask.brush(points, size, hardness=0.5)
+        elif shape == 'gradient':
+            selection = SelectionMask.gradient(self.image_processor.get_view_size(), points[0], points[-1])
+        elif shape == 'ellipse':
+            selection = SelectionMask.ellipse(box, size)
+        else:
+            selection = SelectionMask.rectangle(box, size)
+        
+        selection = selection.clipped(self.image_processor.get_view_size())
+        if selection.is_empty():
+            self.status_bar.update_status("The mask is empty - nothing was changed")
+            return
+        on_mask(selection)
+    
+    def apply_local_adjustment(self, adjustment_name, value, selection):
+        """Apply an adjustment inside a selection"""
+        if self.image_processor.apply_local_adjustment(adjustment_name, value, selection):
+            self.show_current_image()
+            self.status_bar.update_status(f"Applied local {adjustment_name}")
+    
+    @traced('ui')
+    def show_layers_panel(self):
+        """Show the layers dock, creating it on first use"""
+        if self.layers_panel is None:
+            self.layers_panel = LayersPanel(self)
+            self.layers_panel.add_adjustment_requested.connect(self.add_adjustment_layer)
+            self.layers_panel.add_pixel_requested.connect(self.add_pixel_layer)
+            self.layers_panel.layer_changed.connect(self.update_layer)
+            self.layers_panel.layer_moved.connect(self.move_layer)
+            self.layers_panel.layer_removed.connect(self.remove_layer)
+            self.layers_panel.mask_requested.connect(self.start_layer_mask)
+            self.layers_panel_dock = QDockWidget("Layers", self)
+            self.layers_panel_dock.setWidget(self.layers_panel)
+            self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.layers_panel_dock)
+        self.layers_panel_dock.show()
+        self.layers_panel.set_layers(self.image_processor.get_layers())
+    
+    @traced('ui')
+    def add_adjustment_layer(self):
+        """Ask for an adjustment and its value and add it as a layer"""
+        if not self.image_processor.get_current_view():
+            QMessageBox.warning(self, "Warning", "Please open an image first!")
+            return
+        names = list(EnhancedToolPanel.LOCAL_ADJUSTMENTS)
+        adjustment_name, ok = QInputDialog.getItem(self, "Add Adjustment Layer", "Adjustment:", names, 0, False)
+        if not ok:
+            return
+        minimum, maximum, default = EnhancedToolPanel.LOCAL_ADJUSTMENTS[adjustment_name]
+        value, ok = QInputDialog.getDouble(self, "Add Adjustment Layer", f"{adjustment_name}:",
+                                           default, minimum, maximum, 2)
+        if ok and self.image_processor.add_adjustment_layer(adjustment_name, value):
+            self.show_current_image()
+            self.status_bar.update_status(f"Added {adjustment_name} layer")
+    
+    @traced('ui')
+    def add_pixel_layer(self):
+        """Place an image file as a pixel layer at the top left"""
+        if not self.image_processor.get_current_view():
+            QMessageBox.warning(self, "Warning", "Please open an image first!")
+            return
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Add Image Layer", "",
+            "Image files (*.png *.jpg *.jpeg *.bmp *.gif *.tiff *.webp);;All files (*.*)"
+        )
+        if not file_path:
+            return
+        try:
+            with Image.open(file_path) as image:
+                image = image.convert('RGBA' if image.mode not in ('RGB', 'RGBA') else image.mode)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Error opening image:\n{e}")
+            return
+        if self.image_processor.add_pixel_layer(image, name=os.path.basename(file_path)):
+            self.show_current_image()
+            self.status_bar.update_status(f"Added layer: {os.path.basename(file_path)}")
+    
+    @traced('ui')
+    def update_layer(self, index, changes):
+        """Change a layer's visibility, blend mode, opacity or mask"""
+        if self.image_processor.update_layer(index, **changes):
+            self.show_current_image()
+            self.status_bar.update_status(f"Layer changed: {', '.join(changes)}")
+    
+    @traced('ui')
+    def move_layer(self, index, new_index):
+        """Move a layer within the stack, keeping it selected"""
+        if self.image_processor.move_layer(index, new_index):
+            self.show_current_image()
+            self.layers_panel.select_layer(new_index)
+            self.status_bar.update_status("Layer moved")
+    
+    @traced('ui')
+    def remove_layer(self, index):
+        """Delete a layer"""
+        if self.image_processor.remove_layer(index):
+            self.show_current_image()
+            self.status_bar.update_status("Layer removed")
+    
+    @traced('ui')
+    def start_layer_mask(self, index):
+        """Ask for a mask shape, then limit the layer to the mask drawn on the canvas"""
+        shapes = list(EnhancedToolPanel.MASK_SHAPES)
+        shape, ok = QInputDialog.getItem(self, "Layer Mask", "Mask shape:", shapes, 0, False)
+        if not ok:
+            return
+        shape = shape.lower()
+        size = 0
+        if shape != 'gradient':
+            label = "Brush radius:" if shape == 'brush' else "Edge feather:"
+            size, ok = QInputDialog.getInt(self, "Layer Mask", label, 40 if shape == 'brush' else 0, 0, 500)
+            if not ok:
+                return
+        self.start_mask(shape, size,
+                        lambda selection: self.update_layer(index, {'mask': selection.mask,
+                                                                    'mask_offset': selection.box[:2]}),
+                        "Layer mask")
+    
+    def choose_text_layer(self, title):
+        """Index of a text layer picked by the user (asked only if there are several), or None"""
+        layers = self.image_processor.get_layers()
+        indices = [index for index, layer in enumerate(layers) if layer.kind == 'text']
+        if not indices:
+            QMessageBox.information(self, title, "There is no editable text. Text becomes part of the "
+                                    "image after the next filter, adjustment or transform.")
+            return None
+        if len(indices) == 1:
+            return indices[0]
+        # Topmost first, as they appear on the image
+        indices.reverse()
+        labels = [f"{position + 1}. {layers[index].text}" for position, index in enumerate(indices)]
+        label, ok = QInputDialog.getItem(self, title, "Text layer:", labels, 0, False)
+        return indices[labels.index(label)] if ok else None
+    
+    @traced('ui')
+    def edit_text_layer(self):
+        """Change the text, font, size or colour of a text layer"""
+        index = self.choose_text_layer("Edit Text")
+        if index is None:
+            return
+        layer = self.image_processor.get_layers()[index]
+        text, ok = QInputDialog.getText(self, "Edit Text", "Enter text:", text=layer.text)
+        if not ok or not text:
+            return
+        font_name, ok = QInputDialog.getText(self, "Edit Text", "Font:", text=layer.font_name)
+        if not ok:
+            return
+        font_size, ok = QInputDialog.getInt(self, "Font Size", "Font size:", int(layer.font_size), 10, 200)
+        if not ok:
+            return
+        color = QColorDialog.getColor(QColor(layer.color), self)
+        if not color.isValid():
+            return
+        
+        changes = {'text': text, 'font_name': font_name or layer.font_name,
+                   'font_size': font_size, 'color': color.name()}
+        if layer.name == layer.text:
+            changes['name'] = text
+        if self.image_processor.update_layer(index, **changes):
+            self.show_current_image()
+            self.status_bar.update_status("Text updated")
+    
+    @traced('ui')
+    def remove_text_layer(self):
+        """Delete a text layer"""
+        index = self.choose_text_layer("Remove Text")
+        if index is not None and self.image_processor.remove_layer(index):
+            self.show_current_image()
+            self.status_bar.update_status("Text removed")
+    
+    @traced('ui')
     def undo(self):
         """Undo last operation"""
         if self.image_processor.undo():
-            self.image_viewer.set_image(self.image_processor.get_current_image())
+            self.tool_panel.reset_straighten()
+            self.show_current_image()
             self.status_bar.update_status("Undo completed")
     
+    @traced('ui')
     def redo(self):
         """Redo last undone operation"""
         if self.image_processor.redo():
-            self.image_viewer.set_image(self.image_processor.get_current_image())
+            self.tool_panel.reset_straighten()
+            self.show_current_image()
             self.status_bar.update_status("Redo completed")
     
+    @traced('ui')
     def zoom_in(self):
         """Zoom in the image viewer"""
         self.image_viewer.zoom_in()
@@ -521,6 +1072,7 @@ class EnhancedMainWindow(QMainWindow):
         # Update zoom slider
         self.update_zoom_slider(zoom_percent)
     
+    @traced('ui')
     def zoom_out(self):
         """Zoom out the image viewer"""
         self.image_viewer.zoom_out()
@@ -533,6 +1085,7 @@ class EnhancedMainWindow(QMainWindow):
         # Update zoom slider
         self.update_zoom_slider(zoom_percent)
     
+    @traced('ui')
     def zoom_to_fit(self):
         """Zoom to fit image in canvas"""
         self.image_viewer.zoom_to_fit()
@@ -545,6 +1098,7 @@ class EnhancedMainWindow(QMainWindow):
         # Update zoom slider
         self.update_zoom_slider(zoom_percent)
     
+    @traced('ui')
     def zoom_to_100(self):
         """Zoom to 100% (actual pixel size)"""
         self.image_viewer.zoom_to_100()
@@ -557,6 +1111,7 @@ class EnhancedMainWindow(QMainWindow):
         # Update zoom slider
         self.update_zoom_slider(100)
     
+    @traced('ui')
     def zoom_to_percentage(self, percentage):
         """Zoom to specific percentage"""
         if self.image_viewer.pixmap:
@@ -572,6 +1127,58 @@ class EnhancedMainWindow(QMainWindow):
             if image_info:
                 self.status_bar.update_image_info(image_info, percentage)
     
+    def show_performance_log(self):
+        """Show per-operation timing and memory log"""
+        dialog = PerformanceLogDialog(performance_monitor, self)
+        dialog.exec()
+    
+    def start_session_journal(self, directory=None):
+        """Offer to restore a crashed session, then start journaling this one"""
+        sessions = SessionJournal.find_recoverable(directory)
+        recovered = False
+        if sessions:
+            reply = QMessageBox.question(
+                self, "Restore Session",
+                "The editor did not close properly last time.\nRestore the unsaved session?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+            if reply == QMessageBox.StandardButton.Yes:
+                recovered = SessionJournal.recover(sessions[0], self.image_processor)
+                if recovered:
+                    self.tool_panel.reset_straighten()
+                    self.show_current_image()
+                    self.status_bar.update_status("Previous session restored")
+                else:
+                    QMessageBox.warning(self, "Restore Session", "The previous session could not be restored.")
+            for session in sessions:
+                SessionJournal.discard(session)
+        
+        try:
+            self.journal = SessionJournal(directory)
+        except OSError as e:
+            print(f"Error starting session journal: {e}")
+            return
+        self.image_processor.journal = self.journal
+        if recovered:
+            # Restart point for the new journal
+            self.journal.keyframe(self.image_processor)
+    
+    def closeEvent(self, event):
+        performance_monitor.remove_listener(self.status_bar.report_performance)
+        memory_governor.remove_listener(self.status_bar.update_memory)
+        self.memory_timer.stop()
+        if self.journal is not None:
+            self.image_processor.journal = None
+            self.journal.close()
+        memory_manager.shutdown()
+        if self.filter_gallery is not None:
+            self.filter_gallery.shutdown()
+        if self.filmstrip is not None:
+            self.filmstrip.shutdown()
+        image_prefetcher.shutdown()
+        if tracer.enabled:
+            tracer.write()
+        super().closeEvent(event)
+    
     def update_zoom_slider(self, percentage):
         """Update zoom slider without triggering zoom change"""
         if hasattr(self, 'zoom_slider'):
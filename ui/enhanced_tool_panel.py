@@ -1,30 +1,55 @@
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, 
                              QLabel, QSlider, QGroupBox, QScrollArea, QFrame,
-                             QSpinBox, QComboBox, QColorDialog, QInputDialog)
+                             QSpinBox, QDoubleSpinBox, QComboBox, QColorDialog, QInputDialog)
 from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QColor
 
+from .collapsible_group import CollapsibleGroup
+
 class EnhancedToolPanel(QWidget):
+    # Adjustments that can run inside a mask: (minimum, maximum, default)
+    LOCAL_ADJUSTMENTS = {
+        'brightness': (0.0, 3.0, 1.2),
+        'exposure': (-3.0, 3.0, 0.5),
+        'gamma': (0.1, 3.0, 1.2),
+        'saturation': (0.0, 3.0, 1.3),
+        'temperature': (-100.0, 100.0, 20.0),
+        'hue': (-180.0, 180.0, 10.0),
+        'sharpness': (0.0, 3.0, 1.5),
+    }
+    MASK_SHAPES = ('Brush', 'Gradient', 'Rectangle', 'Ellipse')
+    
     # Signals
     filter_applied = pyqtSignal(str, dict)  # filter_name, params
     adjustment_applied = pyqtSignal(str, float)  # adjustment_name, value
     adjustment_preview = pyqtSignal(dict)  # adjustments dict
     transform_applied = pyqtSignal(str, dict)  # transform_name, params
+    straighten_preview = pyqtSignal(float)  # angle in degrees
+    transforms_commit_requested = pyqtSignal()
     text_added = pyqtSignal(str, int, int, str, int, str)  # text, x, y, font, size, color
+    text_edit_requested = pyqtSignal()
+    text_remove_requested = pyqtSignal()
+    local_adjustment_requested = pyqtSignal(str, int, str, float)  # mask shape, brush/feather size, adjustment, value
+    layers_panel_requested = pyqtSignal()
     # File/tool requests
     file_open_requested = pyqtSignal()
     file_save_requested = pyqtSignal()
     file_reset_requested = pyqtSignal()
     crop_requested = pyqtSignal()
+    filter_gallery_requested = pyqtSignal()
 
     
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.init_ui()
-        self.connect_signals()
-        
         # Store current adjustment values for preview
         self.current_adjustments = {}
+        
+        # Lazily built groups and the wiring to run once each group exists
+        self.groups = {}
+        self.group_hooks = {}
+        
+        self.init_ui()
+        self.connect_signals()
     
     def init_ui(self):
         """Initialize user interface"""
@@ -41,29 +66,21 @@ class EnhancedToolPanel(QWidget):
         content_widget = QWidget()
         content_layout = QVBoxLayout(content_widget)
         
-        # File operations group
-        file_group = self.create_file_group()
-        content_layout.addWidget(file_group)
-        
-        # Basic adjustments group
-        basic_group = self.create_basic_adjustments_group()
-        content_layout.addWidget(basic_group)
-        
-        # Advanced adjustments group
-        advanced_group = self.create_advanced_adjustments_group()
-        content_layout.addWidget(advanced_group)
-        
-        # Filters group
-        filters_group = self.create_filters_group()
-        content_layout.addWidget(filters_group)
-        
-        # Transforms group
-        transforms_group = self.create_transforms_group()
-        content_layout.addWidget(transforms_group)
-        
-        # Tools group
-        tools_group = self.create_tools_group()
-        content_layout.addWidget(tools_group)
+        # Groups are collapsible; widgets are created on first expand
+        group_specs = [
+            ('file', "File Operations", self.create_file_group, True),
+            ('basic', "Basic Adjustments", self.create_basic_adjustments_group, True),
+            ('advanced', "Advanced Adjustments", self.create_advanced_adjustments_group, False),
+            ('filters', "Filters", self.create_filters_group, False),
+            ('transforms', "Transforms", self.create_transforms_group, False),
+            ('tools', "Tools", self.create_tools_group, False),
+        ]
+        for name, title, factory, expanded in group_specs:
+            group = CollapsibleGroup(title, factory)
+            group.content_created.connect(lambda _content, name=name: self.run_group_hooks(name))
+            self.groups[name] = group
+            content_layout.addWidget(group)
+            group.set_expanded(expanded)
         
         # Add stretch to push everything to the top
         content_layout.addStretch()
@@ -74,7 +91,7 @@ class EnhancedToolPanel(QWidget):
     
     def create_file_group(self):
         """Create file operations group"""
-        group = QGroupBox("File Operations")
+        group = QGroupBox()  # Title is shown by the collapsible header
         layout = QVBoxLayout(group)
         
         # Open button
@@ -96,7 +113,7 @@ class EnhancedToolPanel(QWidget):
     
     def create_basic_adjustments_group(self):
         """Create basic adjustments group"""
-        group = QGroupBox("Basic Adjustments")
+        group = QGroupBox()  # Title is shown by the collapsible header
         layout = QVBoxLayout(group)
         
         # Brightness
@@ -139,7 +156,7 @@ class EnhancedToolPanel(QWidget):
     
     def create_advanced_adjustments_group(self):
         """Create advanced adjustments group"""
-        group = QGroupBox("Advanced Adjustments")
+        group = QGroupBox()  # Title is shown by the collapsible header
         layout = QVBoxLayout(group)
         
         # Gamma
@@ -194,7 +211,7 @@ class EnhancedToolPanel(QWidget):
     
     def create_filters_group(self):
         """Create filters group"""
-        group = QGroupBox("Filters")
+        group = QGroupBox()  # Title is shown by the collapsible header
         layout = QVBoxLayout(group)
         
         # Basic filters
@@ -262,11 +279,17 @@ class EnhancedToolPanel(QWidget):
         
         layout.addLayout(effects_layout)
         
+        # Thumbnail previews of every filter
+        gallery_btn = QPushButton("Filter Gallery...")
+        gallery_btn.setToolTip("Preview every filter on a thumbnail")
+        gallery_btn.clicked.connect(self.filter_gallery_requested.emit)
+        layout.addWidget(gallery_btn)
+        
         return group
     
     def create_transforms_group(self):
         """Create transforms group"""
-        group = QGroupBox("Transforms")
+        group = QGroupBox()  # Title is shown by the collapsible header
         layout = QVBoxLayout(group)
         
         # Rotation
@@ -309,11 +332,26 @@ class EnhancedToolPanel(QWidget):
         
         layout.addLayout(scale_layout)
         
+        # Straighten (previewed live, resampled together with the queued transforms)
+        straighten_label = QLabel("Straighten")
+        layout.addWidget(straighten_label)
+        self.straighten_slider = QSlider(Qt.Orientation.Horizontal)
+        self.straighten_slider.setRange(-450, 450)
+        self.straighten_slider.setValue(0)
+        self.straighten_slider.setToolTip("-45° to +45°")
+        layout.addWidget(self.straighten_slider)
+        
+        # Commit queued transforms with a single resample
+        commit_btn = QPushButton("Apply Transforms")
+        commit_btn.setToolTip("Resample rotate/flip/scale/straighten in one pass")
+        commit_btn.clicked.connect(self.commit_transforms)
+        layout.addWidget(commit_btn)
+        
         return group
     
     def create_tools_group(self):
         """Create tools group"""
-        group = QGroupBox("Tools")
+        group = QGroupBox()  # Title is shown by the collapsible header
         layout = QVBoxLayout(group)
         
         # Crop tool
@@ -326,11 +364,72 @@ class EnhancedToolPanel(QWidget):
         text_btn.clicked.connect(self.add_text)
         layout.addWidget(text_btn)
         
+        # Text stays editable until the next pixel operation flattens it
+        text_row = QHBoxLayout()
+        edit_text_btn = QPushButton("Edit Text")
+        edit_text_btn.setToolTip("Change the text, font, size or colour of a text layer")
+        edit_text_btn.clicked.connect(self.text_edit_requested.emit)
+        text_row.addWidget(edit_text_btn)
+        remove_text_btn = QPushButton("Remove Text")
+        remove_text_btn.clicked.connect(self.text_remove_requested.emit)
+        text_row.addWidget(remove_text_btn)
+        layout.addLayout(text_row)
+        
+        # Pixel and adjustment layers, blend modes, opacity and masks
+        layers_btn = QPushButton("Layers...")
+        layers_btn.clicked.connect(self.layers_panel_requested.emit)
+        layout.addWidget(layers_btn)
+        
+        # Local adjustment: draw a mask on the image, the adjustment runs inside it
+        layout.addWidget(QLabel("Local Adjustment"))
+        mask_row = QHBoxLayout()
+        self.mask_shape_combo = QComboBox()
+        self.mask_shape_combo.addItems(self.MASK_SHAPES)
+        mask_row.addWidget(self.mask_shape_combo)
+        self.mask_size_spin = QSpinBox()
+        self.mask_size_spin.setRange(0, 500)
+        self.mask_size_spin.setValue(40)
+        self.mask_size_spin.setToolTip("Brush radius, or edge feather for rectangles and ellipses (pixels)")
+        mask_row.addWidget(self.mask_size_spin)
+        layout.addLayout(mask_row)
+        
+        local_row = QHBoxLayout()
+        self.local_adjustment_combo = QComboBox()
+        self.local_adjustment_combo.addItems(list(self.LOCAL_ADJUSTMENTS))
+        self.local_adjustment_combo.currentTextChanged.connect(self.on_local_adjustment_changed)
+        local_row.addWidget(self.local_adjustment_combo)
+        self.local_value_spin = QDoubleSpinBox()
+        self.local_value_spin.setSingleStep(0.1)
+        local_row.addWidget(self.local_value_spin)
+        layout.addLayout(local_row)
+        self.on_local_adjustment_changed(self.local_adjustment_combo.currentText())
+        
+        mask_btn = QPushButton("Draw Mask")
+        mask_btn.setToolTip("Drag on the image; only the masked area is adjusted")
+        mask_btn.clicked.connect(self.request_local_adjustment)
+        layout.addWidget(mask_btn)
+        
         return group
     
+    def on_group_created(self, group_name, callback):
+        """Run callback once the named group's widgets exist (immediately if they already do)"""
+        self.group_hooks.setdefault(group_name, []).append(callback)
+        if self.groups[group_name].is_created():
+            callback()
+    
+    def run_group_hooks(self, group_name):
+        """Run the wiring registered for a group that was just created"""
+        for callback in self.group_hooks.get(group_name, []):
+            callback()
+    
     def connect_signals(self):
-        """Connect slider signals for real-time preview"""
-        # Connect basic adjustment sliders
+        """Connect slider signals for real-time preview (deferred until each group exists)"""
+        self.on_group_created('basic', self.connect_basic_adjustment_signals)
+        self.on_group_created('advanced', self.connect_advanced_adjustment_signals)
+        self.on_group_created('transforms', self.connect_transform_signals)
+    
+    def connect_basic_adjustment_signals(self):
+        """Connect basic adjustment sliders"""
         self.brightness_slider.valueChanged.connect(
             lambda v: self.on_adjustment_changed('brightness', v / 100.0))
         self.contrast_slider.valueChanged.connect(
@@ -339,8 +438,9 @@ class EnhancedToolPanel(QWidget):
             lambda v: self.on_adjustment_changed('saturation', v / 100.0))
         self.sharpness_slider.valueChanged.connect(
             lambda v: self.on_adjustment_changed('sharpness', v / 100.0))
-        
-        # Connect advanced adjustment sliders
+    
+    def connect_advanced_adjustment_signals(self):
+        """Connect advanced adjustment sliders"""
         self.gamma_slider.valueChanged.connect(
             lambda v: self.on_adjustment_changed('gamma', v / 100.0))
         self.exposure_slider.valueChanged.connect(
@@ -350,6 +450,11 @@ class EnhancedToolPanel(QWidget):
         self.temp_slider.valueChanged.connect(
             lambda v: self.on_adjustment_changed('temperature', v))
     
+    def connect_transform_signals(self):
+        """Connect straighten slider for live transform preview"""
+        self.straighten_slider.valueChanged.connect(
+            lambda v: self.straighten_preview.emit(v / 10.0))
+    
     def on_adjustment_changed(self, adjustment_name, value):
         """Handle adjustment slider changes"""
         self.current_adjustments[adjustment_name] = value
@@ -376,6 +481,40 @@ class EnhancedToolPanel(QWidget):
         """Apply transform"""
         self.transform_applied.emit(transform_name, params)
     
+    def straighten_angle(self):
+        """Current straighten angle in degrees (0 until the transforms group exists)"""
+        if not self.groups['transforms'].is_created():
+            return 0.0
+        return self.straighten_slider.value() / 10.0
+    
+    def commit_transforms(self):
+        """Queue the straighten angle and commit all pending transforms"""
+        angle = self.straighten_angle()
+        if angle:
+            self.apply_transform('rotate', {'angle': angle})
+        self.reset_straighten()
+        self.transforms_commit_requested.emit()
+    
+    def reset_straighten(self):
+        """Reset straighten slider without emitting a preview"""
+        if not self.groups['transforms'].is_created():
+            return
+        self.straighten_slider.blockSignals(True)
+        self.straighten_slider.setValue(0)
+        self.straighten_slider.blockSignals(False)
+    
+    def on_local_adjustment_changed(self, adjustment_name):
+        """Set the value range and default of the chosen local adjustment"""
+        minimum, maximum, default = self.LOCAL_ADJUSTMENTS[adjustment_name]
+        self.local_value_spin.setRange(minimum, maximum)
+        self.local_value_spin.setValue(default)
+    
+    def request_local_adjustment(self):
+        """Start drawing a mask for the chosen local adjustment"""
+        self.local_adjustment_requested.emit(
+            self.mask_shape_combo.currentText().lower(), self.mask_size_spin.value(),
+            self.local_adjustment_combo.currentText(), self.local_value_spin.value())
+    
     def apply_auto_adjustment(self, adjustment_name):
         """Apply auto adjustment"""
         self.adjustment_applied.emit(adjustment_name, 0.0)
@@ -0,0 +1,160 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+from PyQt6.QtWidgets import QListWidget, QListWidgetItem, QListView, QAbstractItemView
+from PyQt6.QtCore import Qt, QSize, pyqtSignal
+from PyQt6.QtGui import QIcon
+
+from editor.image_metadata import metadata_cache
+from editor.prefetch import image_prefetcher
+from editor.recipe import FORMATS
+from editor.thumbnail_cache import thumbnail_cache
+from .qt_image import pil_to_pixmap
+
+PATH_ROLE = Qt.ItemDataRole.UserRole
+
+
+class Filmstrip(QListWidget):
+    """Horizontal strip of the images in a folder.
+
+    Thumbnails come from the on-disk thumbnail cache or are generated on a
+    thread pool, nearest to the current image first. Selecting an image
+    prefetches the decode of its neighbours so stepping through the folder
+    does not wait on the disk.
+    """
+
+    image_selected = pyqtSignal(str)
+    # generation, row, PIL thumbnail or None, tooltip (emitted from worker threads)
+    thumbnail_ready = pyqtSignal(int, int, object, str)
+
+    def __init__(self, parent=None, thumbnail_size=None, max_workers=None):
+        super().__init__(parent)
+        self.thumbnail_size = thumbnail_size or thumbnail_cache.max_size
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or min(4, os.cpu_count() or 2),
+                                           thread_name_prefix="filmstrip")
+        self.folder = None
+        self.paths = []
+        self.generation = 0
+        self.pending = []
+
+        self.setViewMode(QListView.ViewMode.IconMode)
+        self.setFlow(QListView.Flow.LeftToRight)
+        self.setWrapping(False)
+        self.setMovement(QListView.Movement.Static)
+        self.setUniformItemSizes(True)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.setHorizontalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setIconSize(QSize(self.thumbnail_size, self.thumbnail_size))
+        self.setGridSize(QSize(self.thumbnail_size + 16, self.thumbnail_size + 28))
+        self.setFixedHeight(self.thumbnail_size + 48)
+
+        self.thumbnail_ready.connect(self.on_thumbnail_ready)
+        # Clicks and arrow keys; programmatic selection blocks signals
+        self.currentRowChanged.connect(self._emit_selected)
+
+    @staticmethod
+    def list_images(folder):
+        """Image files in folder, sorted by name"""
+        try:
+            names = os.listdir(folder)
+        except OSError:
+            return []
+        return [os.path.join(folder, name) for name in sorted(names, key=str.lower)
+                if not name.startswith('.') and os.path.splitext(name)[1].lower().lstrip('.') in FORMATS]
+
+    def show_file(self, path):
+        """Show path's folder (listing it if it changed) and select path"""
+        folder = os.path.dirname(os.path.abspath(path))
+        if folder != self.folder or os.path.abspath(path) not in self.paths:
+            self.set_folder(folder)
+        self.select_path(os.path.abspath(path))
+
+    def set_folder(self, folder):
+        self.folder = folder
+        self.paths = [os.path.abspath(path) for path in self.list_images(folder)]
+        self.generation += 1
+        for future in self.pending:
+            future.cancel()
+        self.pending = []
+
+        self.clear()
+        # Old thumbnails age out in the background
+        self.executor.submit(thumbnail_cache.prune)
+        for path in self.paths:
+            item = QListWidgetItem(os.path.basename(path))
+            item.setData(PATH_ROLE, path)
+            item.setSizeHint(self.gridSize())
+            self.addItem(item)
+
+    def select_path(self, path):
+        if path not in self.paths:
+            return
+        row = self.paths.index(path)
+        self.blockSignals(True)
+        self.setCurrentRow(row)
+        self.blockSignals(False)
+        self.scrollToItem(self.item(row), QAbstractItemView.ScrollHint.PositionAtCenter)
+        self._request_thumbnails(row)
+        self.prefetch_neighbours(row)
+
+    def neighbour(self, step):
+        """Path step images away from the current one, or None"""
+        row = self.currentRow() + step
+        if self.currentRow() < 0 or not 0 <= row < len(self.paths):
+            return None
+        return self.paths[row]
+
+    def prefetch_neighbours(self, row):
+        """Decode next and previous images in the background"""
+        candidates = [row + 1, row - 1]
+        image_prefetcher.prefetch([self.paths[index] for index in candidates if 0 <= index < len(self.paths)])
+
+    def _request_thumbnails(self, center):
+        """Queue thumbnails outward from center (current image first)"""
+        if self.pending:
+            return
+        order = sorted(range(len(self.paths)), key=lambda row: abs(row - center))
+        generation = self.generation
+        for row in order:
+            future = self.executor.submit(self.load_thumbnail, self.paths[row])
+            future.add_done_callback(
+                lambda done, row=row, generation=generation: self._deliver(done, row, generation))
+            self.pending.append(future)
+
+    @staticmethod
+    def load_thumbnail(path):
+        """(thumbnail, tooltip) for path (runs on a worker thread)"""
+        tooltip = os.path.basename(path)
+        metadata = metadata_cache.get(path)
+        if metadata is not None:
+            width, height = metadata.oriented_size
+            tooltip += f"\n{width} x {height} {metadata.format} {metadata.mode}"
+        return thumbnail_cache.get_or_create(path), tooltip
+
+    def _deliver(self, future, row, generation):
+        if future.cancelled():
+            return
+        try:
+            thumbnail, tooltip = future.result()
+        except Exception as e:
+            thumbnail, tooltip = None, f"Cannot read image: {e}"
+        # Queued to the GUI thread
+        self.thumbnail_ready.emit(generation, row, thumbnail, tooltip)
+
+    def on_thumbnail_ready(self, generation, row, thumbnail, tooltip):
+        if generation != self.generation or row >= self.count():
+            return
+        item = self.item(row)
+        if thumbnail is not None:
+            item.setIcon(QIcon(pil_to_pixmap(thumbnail)))
+        item.setToolTip(tooltip)
+
+    def _emit_selected(self, row):
+        if 0 <= row < len(self.paths):
+            self.image_selected.emit(self.paths[row])
+
+    def shutdown(self):
+        """Stop worker threads"""
+        for future in self.pending:
+            future.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
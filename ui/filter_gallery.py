@@ -0,0 +1,141 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QGridLayout, QToolButton,
+                             QScrollArea, QLabel)
+from PyQt6.QtCore import Qt, QSize, pyqtSignal
+from PyQt6.QtGui import QIcon
+
+from editor.affine_transform import AffineTransformAccumulator
+from editor.crop_view import materialize
+from editor.resize_engine import ResizeEngine
+from editor.result_cache import result_cache, fingerprint, NON_CACHEABLE
+from .qt_image import pil_to_pixmap
+
+
+class FilterGallery(QWidget):
+    """Clickable thumbnails of every filter rendered on a small proxy.
+
+    Thumbnails are rendered in parallel on a thread pool (Pillow releases
+    the GIL inside its filters) and go through the shared result cache, so
+    switching back to an image whose proxy was already rendered is instant.
+    When the base image changes, the old thumbnails stay visible until each
+    new one arrives.
+    """
+
+    filter_selected = pyqtSignal(str)
+    # generation, filter name, PIL thumbnail (emitted from worker threads)
+    thumbnail_ready = pyqtSignal(int, str, object)
+
+    def __init__(self, parent=None, thumbnail_size=96, columns=2, max_workers=None):
+        super().__init__(parent)
+        self.thumbnail_size = thumbnail_size
+        self.columns = columns
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or min(8, os.cpu_count() or 2),
+                                           thread_name_prefix="filter-gallery")
+        self.generation = 0
+        self.base_fingerprint = None
+        self.pending = []
+        self.remaining = 0
+        self.buttons = {}
+        self.thumbnail_ready.connect(self.on_thumbnail_ready)
+        self.init_ui()
+
+    def filter_names(self):
+        """Filters shown in the gallery (non-deterministic ones are skipped)"""
+        from editor.enhanced_filters import EnhancedFilters
+        return [name for name in EnhancedFilters.names() if name not in NON_CACHEABLE]
+
+    def init_ui(self):
+        """Initialize gallery layout"""
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+
+        self.status_label = QLabel("Open an image to preview filters")
+        layout.addWidget(self.status_label)
+
+        scroll_area = QScrollArea()
+        scroll_area.setWidgetResizable(True)
+        content = QWidget()
+        grid = QGridLayout(content)
+
+        for index, name in enumerate(self.filter_names()):
+            button = QToolButton()
+            button.setText(name.replace('_', ' ').title())
+            button.setToolButtonStyle(Qt.ToolButtonStyle.ToolButtonTextUnderIcon)
+            button.setIconSize(QSize(self.thumbnail_size, self.thumbnail_size))
+            button.setMinimumWidth(self.thumbnail_size + 16)
+            button.setEnabled(False)
+            button.clicked.connect(lambda _checked=False, name=name: self.filter_selected.emit(name))
+            grid.addWidget(button, index // self.columns, index % self.columns)
+            self.buttons[name] = button
+
+        scroll_area.setWidget(content)
+        layout.addWidget(scroll_area)
+
+    def set_base_image(self, image, orientation=1):
+        """Re-render thumbnails for a new base image (no-op if the proxy is unchanged)"""
+        if image is None:
+            return
+
+        ratio = min(1.0, self.thumbnail_size / max(image.size))
+        proxy = materialize(ResizeEngine.scale(image, ratio, 'fast'))
+        if orientation != 1:
+            # Upright proxy, so directional filters preview as they will apply
+            upright = AffineTransformAccumulator(proxy.size)
+            upright.orient(orientation)
+            proxy = upright.apply(proxy)
+        proxy_fingerprint = fingerprint(proxy)
+        if proxy_fingerprint == self.base_fingerprint:
+            return
+
+        self.base_fingerprint = proxy_fingerprint
+        self.generation += 1
+        for future in self.pending:
+            future.cancel()
+        self.pending = []
+
+        self.remaining = len(self.buttons)
+        self.status_label.setText("Rendering previews...")
+        for name in self.buttons:
+            future = self.executor.submit(self.render_thumbnail, proxy, name)
+            future.add_done_callback(
+                lambda done, name=name, generation=self.generation: self._deliver(done, name, generation))
+            self.pending.append(future)
+
+    @staticmethod
+    def render_thumbnail(proxy, filter_name):
+        """Apply a filter to the proxy (runs on a worker thread)"""
+        from editor.enhanced_filters import EnhancedFilters
+        return result_cache.get_or_compute(
+            proxy, f"filter:{filter_name}", {},
+            lambda image: EnhancedFilters.apply(image, filter_name))
+
+    def _deliver(self, future, filter_name, generation):
+        if future.cancelled():
+            return
+        try:
+            thumbnail = future.result()
+        except Exception as e:
+            print(f"Error rendering {filter_name} preview: {e}")
+            thumbnail = None
+        # Queued to the GUI thread
+        self.thumbnail_ready.emit(generation, filter_name, thumbnail)
+
+    def on_thumbnail_ready(self, generation, filter_name, thumbnail):
+        """Swap in a finished thumbnail if it belongs to the current base image"""
+        if generation != self.generation:
+            return
+        button = self.buttons[filter_name]
+        if thumbnail is not None:
+            button.setIcon(QIcon(pil_to_pixmap(thumbnail)))
+        button.setEnabled(True)
+        self.remaining -= 1
+        if self.remaining <= 0:
+            self.status_label.setText("Click a preview to apply it")
+
+    def shutdown(self):
+        """Stop worker threads"""
+        for future in self.pending:
+            future.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
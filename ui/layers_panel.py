@@ -0,0 +1,174 @@
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListWidget, QListWidgetItem,
+                             QPushButton, QComboBox, QSlider, QLabel)
+from PyQt6.QtCore import Qt, pyqtSignal
+
+from editor.layers import BLEND_MODES
+
+
+class LayersPanel(QWidget):
+    """The active document's layer stack, topmost first.
+
+    Every change goes through the processor (update_layer, move_layer,
+    remove_layer), so each one is an undoable history entry; the panel
+    only mirrors ``get_layers()``. Rows hold the layer's stack index.
+    """
+
+    add_adjustment_requested = pyqtSignal()
+    add_pixel_requested = pyqtSignal()
+    layer_changed = pyqtSignal(int, dict)  # index, attribute changes
+    layer_moved = pyqtSignal(int, int)  # index, new index
+    layer_removed = pyqtSignal(int)
+    mask_requested = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.layers = []
+        self.init_ui()
+
+    def init_ui(self):
+        """Initialize panel layout"""
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+
+        add_row = QHBoxLayout()
+        add_adjustment_btn = QPushButton("Add Adjustment")
+        add_adjustment_btn.setToolTip("Non-destructive adjustment of everything below")
+        add_adjustment_btn.clicked.connect(self.add_adjustment_requested.emit)
+        add_row.addWidget(add_adjustment_btn)
+        add_pixel_btn = QPushButton("Add Image")
+        add_pixel_btn.setToolTip("Place an image file as a pixel layer")
+        add_pixel_btn.clicked.connect(self.add_pixel_requested.emit)
+        add_row.addWidget(add_pixel_btn)
+        layout.addLayout(add_row)
+
+        # Checked rows are visible
+        self.layer_list = QListWidget()
+        self.layer_list.currentRowChanged.connect(self.on_current_changed)
+        self.layer_list.itemChanged.connect(self.on_item_changed)
+        layout.addWidget(self.layer_list)
+
+        blend_row = QHBoxLayout()
+        blend_row.addWidget(QLabel("Blend:"))
+        self.blend_combo = QComboBox()
+        self.blend_combo.addItems(list(BLEND_MODES))
+        self.blend_combo.activated.connect(
+            lambda _index: self.emit_change(blend_mode=self.blend_combo.currentText()))
+        blend_row.addWidget(self.blend_combo)
+        layout.addLayout(blend_row)
+
+        opacity_row = QHBoxLayout()
+        opacity_row.addWidget(QLabel("Opacity:"))
+        self.opacity_slider = QSlider(Qt.Orientation.Horizontal)
+        self.opacity_slider.setRange(0, 100)
+        self.opacity_slider.setToolTip("0-100%")
+        # One history entry per drag, not per step
+        self.opacity_slider.sliderReleased.connect(self.emit_opacity)
+        self.opacity_slider.valueChanged.connect(
+            lambda _value: None if self.opacity_slider.isSliderDown() else self.emit_opacity())
+        opacity_row.addWidget(self.opacity_slider)
+        layout.addLayout(opacity_row)
+
+        order_row = QHBoxLayout()
+        up_btn = QPushButton("Up")
+        up_btn.clicked.connect(lambda: self.move_selected(1))
+        order_row.addWidget(up_btn)
+        down_btn = QPushButton("Down")
+        down_btn.clicked.connect(lambda: self.move_selected(-1))
+        order_row.addWidget(down_btn)
+        remove_btn = QPushButton("Remove")
+        remove_btn.clicked.connect(self.remove_selected)
+        order_row.addWidget(remove_btn)
+        layout.addLayout(order_row)
+
+        mask_row = QHBoxLayout()
+        mask_btn = QPushButton("Draw Mask")
+        mask_btn.setToolTip("Limit the layer to a mask drawn on the image")
+        mask_btn.clicked.connect(self.request_mask)
+        mask_row.addWidget(mask_btn)
+        clear_mask_btn = QPushButton("Clear Mask")
+        clear_mask_btn.clicked.connect(lambda: self.emit_change(mask=None, mask_offset=(0, 0)))
+        mask_row.addWidget(clear_mask_btn)
+        layout.addLayout(mask_row)
+
+        self.on_current_changed(-1)
+
+    def set_layers(self, layers):
+        """Show a layer stack (bottom to top), keeping the selection; a new layer is selected"""
+        selected = self.selected_index()
+        if len(layers) > len(self.layers):
+            selected = None
+        self.layers = list(layers)
+        self.layer_list.blockSignals(True)
+        self.layer_list.clear()
+        for index in reversed(range(len(self.layers))):
+            layer = self.layers[index]
+            mask = ", masked" if layer.mask is not None else ""
+            item = QListWidgetItem(f"{layer.name} ({layer.kind}{mask})")
+            item.setData(Qt.ItemDataRole.UserRole, index)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(Qt.CheckState.Checked if layer.visible else Qt.CheckState.Unchecked)
+            self.layer_list.addItem(item)
+        if self.layers:
+            if selected is None or selected >= len(self.layers):
+                selected = len(self.layers) - 1
+            self.layer_list.setCurrentRow(len(self.layers) - 1 - selected)
+        self.layer_list.blockSignals(False)
+        self.on_current_changed(self.layer_list.currentRow())
+
+    def select_layer(self, index):
+        """Select a layer by stack index"""
+        if 0 <= index < len(self.layers):
+            self.layer_list.setCurrentRow(len(self.layers) - 1 - index)
+
+    def selected_index(self):
+        """Stack index of the selected layer, or None"""
+        item = self.layer_list.currentItem()
+        return None if item is None else item.data(Qt.ItemDataRole.UserRole)
+
+    def on_current_changed(self, _row):
+        """Show the selected layer's blend mode and opacity"""
+        index = self.selected_index()
+        enabled = index is not None
+        self.blend_combo.setEnabled(enabled)
+        self.opacity_slider.setEnabled(enabled)
+        if not enabled:
+            return
+        layer = self.layers[index]
+        self.blend_combo.setCurrentText(layer.blend_mode)
+        self.opacity_slider.blockSignals(True)
+        self.opacity_slider.setValue(int(round(layer.opacity * 100)))
+        self.opacity_slider.blockSignals(False)
+
+    def on_item_changed(self, item):
+        """Visibility checkbox toggled"""
+        index = item.data(Qt.ItemDataRole.UserRole)
+        visible = item.checkState() == Qt.CheckState.Checked
+        if index is not None and visible != self.layers[index].visible:
+            self.layer_changed.emit(index, {'visible': visible})
+
+    def emit_change(self, **changes):
+        index = self.selected_index()
+        if index is not None:
+            self.layer_changed.emit(index, changes)
+
+    def emit_opacity(self):
+        index = self.selected_index()
+        opacity = self.opacity_slider.value() / 100.0
+        if index is not None and abs(opacity - self.layers[index].opacity) > 1e-6:
+            self.layer_changed.emit(index, {'opacity': opacity})
+
+    def move_selected(self, step):
+        """Move the selected layer up (step 1) or down (step -1) the stack"""
+        index = self.selected_index()
+        if index is not None and 0 <= index + step < len(self.layers):
+            self.layer_moved.emit(index, index + step)
+
+    def remove_selected(self):
+        index = self.selected_index()
+        if index is not None:
+            self.layer_removed.emit(index)
+
+    def request_mask(self):
+        index = self.selected_index()
+        if index is not None:
+            self.mask_requested.emit(index)
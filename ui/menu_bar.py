@@ -1,12 +1,16 @@
 from PyQt6.QtWidgets import QMenuBar, QMenu, QFileDialog, QMessageBox
-from PyQt6.QtCore import pyqtSignal
+from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QAction, QKeySequence
 
 class MenuBar(QMenuBar):
     # Signals
     open_image = pyqtSignal(str)
     save_image = pyqtSignal(str)
+    export_renditions = pyqtSignal(str)
+    next_image = pyqtSignal()
+    previous_image = pyqtSignal()
     reset_image = pyqtSignal()
+    show_performance_log = pyqtSignal()
     
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -31,6 +35,28 @@ class MenuBar(QMenuBar):
         save_action.triggered.connect(self.save_file)
         file_menu.addAction(save_action)
         
+        # Export sizes action
+        export_action = QAction("Export &Sizes...", self)
+        export_action.setStatusTip("Export the image at several sizes (full, 2048, 1024, 512, 256 px) "
+                                   "as JPEG and WebP")
+        export_action.triggered.connect(self.export_sizes)
+        file_menu.addAction(export_action)
+        
+        file_menu.addSeparator()
+        
+        # Folder browsing (filmstrip)
+        next_action = QAction("&Next Image", self)
+        next_action.setShortcut(QKeySequence(Qt.Key.Key_PageDown))
+        next_action.setStatusTip("Open the next image in the folder")
+        next_action.triggered.connect(self.next_image.emit)
+        file_menu.addAction(next_action)
+        
+        previous_action = QAction("&Previous Image", self)
+        previous_action.setShortcut(QKeySequence(Qt.Key.Key_PageUp))
+        previous_action.setStatusTip("Open the previous image in the folder")
+        previous_action.triggered.connect(self.previous_image.emit)
+        file_menu.addAction(previous_action)
+        
         file_menu.addSeparator()
         
         # Reset action
@@ -68,6 +94,12 @@ class MenuBar(QMenuBar):
         # Help menu
         help_menu = self.addMenu("&Help")
         
+        # Performance log action
+        performance_action = QAction("&Performance Log...", self)
+        performance_action.setStatusTip("Show timing and memory of recent operations")
+        performance_action.triggered.connect(self.show_performance_log.emit)
+        help_menu.addAction(performance_action)
+        
         # About action
         about_action = QAction("&About", self)
         about_action.setStatusTip("About this application")
@@ -92,6 +124,12 @@ class MenuBar(QMenuBar):
         if file_path:
             self.save_image.emit(file_path)
     
+    def export_sizes(self):
+        """Choose a folder for the size renditions"""
+        directory = QFileDialog.getExistingDirectory(self, "Export Sizes To")
+        if directory:
+            self.export_renditions.emit(directory)
+    
     def undo_action(self):
         """Undo action"""
         # This will be connected to the main window's undo method
@@ -0,0 +1,69 @@
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPlainTextEdit,
+                             QPushButton, QFileDialog, QMessageBox, QCheckBox)
+from PyQt6.QtGui import QFont
+
+
+class PerformanceLogDialog(QDialog):
+    """Shows the performance monitor's ring buffer and lets the user save it"""
+
+    def __init__(self, monitor, parent=None):
+        super().__init__(parent)
+        self.monitor = monitor
+        self.init_ui()
+        self.refresh()
+
+    def init_ui(self):
+        """Initialize dialog components"""
+        self.setWindowTitle("Performance Log")
+        self.resize(720, 420)
+        layout = QVBoxLayout(self)
+
+        self.log_view = QPlainTextEdit()
+        self.log_view.setReadOnly(True)
+        self.log_view.setFont(QFont("Monospace"))
+        layout.addWidget(self.log_view)
+
+        self.track_memory_check = QCheckBox("Measure peak Python allocations (slows operations down)")
+        self.track_memory_check.setChecked(self.monitor.track_memory)
+        self.track_memory_check.toggled.connect(self.monitor.set_track_memory)
+        layout.addWidget(self.track_memory_check)
+
+        button_layout = QHBoxLayout()
+        refresh_btn = QPushButton("Refresh")
+        refresh_btn.clicked.connect(self.refresh)
+        button_layout.addWidget(refresh_btn)
+
+        clear_btn = QPushButton("Clear")
+        clear_btn.clicked.connect(self.clear)
+        button_layout.addWidget(clear_btn)
+
+        save_btn = QPushButton("Save...")
+        save_btn.clicked.connect(self.save)
+        button_layout.addWidget(save_btn)
+
+        button_layout.addStretch()
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.accept)
+        button_layout.addWidget(close_btn)
+        layout.addLayout(button_layout)
+
+    def refresh(self):
+        """Reload the log text"""
+        self.log_view.setPlainText(self.monitor.format_log())
+
+    def clear(self):
+        """Clear recorded operations"""
+        self.monitor.clear()
+        self.refresh()
+
+    def save(self):
+        """Dump the log to a text file"""
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Save Performance Log", "performance_log.txt",
+            "Text files (*.txt);;All files (*.*)"
+        )
+        if file_path:
+            try:
+                self.monitor.dump(file_path)
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"Error saving performance log:\n{e}")
@@ -0,0 +1,32 @@
+from PyQt6.QtGui import QPixmap, QImage, QTransform
+
+from editor.tracing import traced
+
+
+@traced('convert', 'PIL -> QPixmap')
+def pil_to_pixmap(pil_image):
+    """Convert PIL image to QPixmap (transparency is kept)"""
+    # Convert PIL image to QImage
+    if pil_image.mode != "RGBA":
+        pil_image = pil_image.convert("RGBA")
+    data = pil_image.tobytes("raw", "RGBA")
+    qimage = QImage(data, pil_image.size[0], pil_image.size[1], QImage.Format.Format_RGBA8888)
+    return QPixmap.fromImage(qimage)
+
+
+# EXIF orientation -> QTransform drawing stored pixels upright (m11, m12, m21, m22)
+_ORIENTATION_MATRICES = {
+    2: (-1, 0, 0, 1),
+    3: (-1, 0, 0, -1),
+    4: (1, 0, 0, -1),
+    5: (0, 1, 1, 0),
+    6: (0, 1, -1, 0),
+    7: (0, -1, -1, 0),
+    8: (0, -1, 1, 0),
+}
+
+
+def orientation_transform(orientation):
+    """QTransform applying an EXIF orientation, or None for upright pixels"""
+    matrix = _ORIENTATION_MATRICES.get(orientation)
+    return QTransform(*matrix, 0, 0) if matrix else None
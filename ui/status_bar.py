@@ -1,10 +1,15 @@
 from PyQt6.QtWidgets import QStatusBar, QLabel, QProgressBar
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, pyqtSignal
 
 class StatusBar(QStatusBar):
+    # Operation records arrive from whichever thread ran the operation
+    performance_recorded = pyqtSignal(object)
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         self.init_ui()
+        # Queued across threads, so the label is only touched on the GUI thread
+        self.performance_recorded.connect(self.update_performance)
     
     def init_ui(self):
         """Initialize status bar components"""
@@ -16,6 +21,16 @@ class StatusBar(QStatusBar):
         self.image_info_label = QLabel("")
         self.addPermanentWidget(self.image_info_label)
         
+        # Timing of the last operation
+        self.performance_label = QLabel("")
+        self.performance_label.setToolTip("Last operation timing (Help → Performance Log for details)")
+        self.addPermanentWidget(self.performance_label)
+        
+        # Memory governor state (empty while memory is plentiful)
+        self.memory_label = QLabel("")
+        self.memory_label.setToolTip("Measures taken to stay within available memory")
+        self.addPermanentWidget(self.memory_label)
+        
         # Progress bar (hidden by default)
         self.progress_bar = QProgressBar()
         self.progress_bar.setVisible(False)
@@ -33,12 +48,39 @@ class StatusBar(QStatusBar):
             format_name = info.get('format', 'Unknown')
             
             info_text = f"Size: {size[0]}x{size[1]} | Mode: {mode} | Format: {format_name}"
+            if info.get('dpi'):
+                info_text += f" | {info['dpi'][0]} dpi"
+            if info.get('frames', 1) > 1:
+                info_text += f" | {info['frames']} frames"
             if zoom_percent is not None:
                 info_text += f" | Zoom: {zoom_percent}%"
             self.image_info_label.setText(info_text)
         else:
             self.image_info_label.setText("")
     
+    def report_performance(self, record):
+        """Performance monitor listener, safe to call from any thread"""
+        self.performance_recorded.emit(record)
+    
+    def update_performance(self, record):
+        """Show wall time, CPU time and peak memory of the last operation"""
+        if record:
+            self.performance_label.setText(record.summary())
+        else:
+            self.performance_label.setText("")
+    
+    def update_memory(self, level, step, sample=None):
+        """Report a memory governor level change"""
+        details = f" ({sample.summary()})" if sample is not None and sample.summary() else ""
+        if level:
+            self.memory_label.setText(f"Low memory: {step}")
+            self.memory_label.setStyleSheet("QLabel { color: #d08000; }")
+            self.update_status(f"Memory pressure level {level}: {step}{details}")
+        else:
+            self.memory_label.setText("")
+            self.memory_label.setStyleSheet("")
+            self.update_status(f"Memory back to normal{details}")
+    
     def show_progress(self, visible=True):
         """Show or hide progress bar"""
         self.progress_bar.setVisible(visible)